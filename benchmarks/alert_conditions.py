@@ -0,0 +1,103 @@
+""" Benchmark of the alert condition evaluation of :class:`AlertProcedure <spherexlabtools.procedures.AlertProcedure>`.
+
+A set of conditions over simulated housekeeping channels is evaluated with:
+
+    - the per-value eval() of '%f' templates that AlertProcedure used before conditions were compiled, for the
+      single-value conditions only.
+    - ConditionSet.check(), one sample at a time, as in the alert monitoring loop.
+    - ConditionSet.evaluate(), on batches of samples.
+
+The rate is reported in conditions evaluated per second. Run with:
+
+    python benchmarks/alert_conditions.py [conditions] [channels]
+"""
+import os
+import sys
+import time
+import importlib.util
+
+import numpy as np
+
+# - load the conditions module alone, so that the benchmark does not need the gui dependencies - #
+_path = os.path.join(os.path.dirname(__file__), "..", "spherexlabtools", "conditions.py")
+_spec = importlib.util.spec_from_file_location("conditions", _path)
+conditions = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(conditions)
+
+SAMPLES = 2000
+BATCH = 500
+SEED = 0
+
+
+def make_conditions(n_conditions, channels, rng):
+    """ Return a dictionary of n_conditions conditions over channels. Half are single-value thresholds, and the rest
+    are split between multi-channel, rate-of-change and sustained conditions.
+    """
+    out = {}
+    for i in range(n_conditions):
+        a, b = rng.choice(channels, 2, replace=False)
+        kind = i % 8
+        if kind < 4:
+            out["c%d" % i] = "%s > %.1f" % (a, rng.uniform(300, 400))
+        elif kind < 6:
+            out["c%d" % i] = "abs(%s - %s) > %.1f and %s > 0" % (a, b, rng.uniform(20, 40), b)
+        elif kind == 6:
+            out["c%d" % i] = "rate(%s) > %.1f" % (a, rng.uniform(5, 10))
+        else:
+            out["c%d" % i] = "sustained(%s > %.1f, %d)" % (a, rng.uniform(300, 320), rng.integers(2, 10))
+    return out
+
+
+def bench_eval(conds, samples):
+    """ Evaluate the single-value conditions with a '%f' template and eval() per value.
+    """
+    thresholds = [expr.split(" ", 1) for expr in conds.values() if expr.count(" ") == 2 and "(" not in expr]
+    templates = [(channel, "%f " + rest) for channel, rest in thresholds]
+    t0 = time.perf_counter()
+    for sample in samples:
+        for channel, template in templates:
+            eval(template % sample[channel])
+    return len(templates) * len(samples) / (time.perf_counter() - t0)
+
+
+def bench_check(cs, samples, times):
+    """ Evaluate every condition on one sample dictionary at a time.
+    """
+    t0 = time.perf_counter()
+    for sample, t in zip(samples, times):
+        cs.check(sample, t)
+    return len(cs.names) * len(samples) / (time.perf_counter() - t0)
+
+
+def bench_evaluate(cs, values, times):
+    """ Evaluate every condition on batches of rows of an array of the channel values.
+    """
+    t0 = time.perf_counter()
+    for i in range(0, len(values), BATCH):
+        cs.evaluate(values[i:i + BATCH], times[i:i + BATCH])
+    return len(cs.names) * len(values) / (time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    n_conditions = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    n_channels = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    rng = np.random.default_rng(SEED)
+    channels = ["ch%d" % i for i in range(n_channels)]
+    conds = make_conditions(n_conditions, channels, rng)
+
+    t0 = time.perf_counter()
+    cs = conditions.ConditionSet(conds)
+    compile_time = time.perf_counter() - t0
+
+    values = 300 + rng.normal(0, 10, (SAMPLES, n_channels))
+    times = np.arange(SAMPLES, dtype=np.float64)
+    samples = [dict(zip(channels, row.tolist())) for row in values]
+    columns = values[:, [channels.index(ch) for ch in cs.channels]]
+
+    print("%d conditions over %d channels, compiled in %.3f s." % (n_conditions, n_channels, compile_time))
+    print("%-40s %15s" % ("method", "conditions/s"))
+    print("%-40s %15.0f" % ("eval() of '%f' templates (thresholds)", bench_eval(conds, samples[:SAMPLES // 10])))
+    cs.reset()
+    print("%-40s %15.0f" % ("ConditionSet.check()", bench_check(cs, samples, times)))
+    cs.reset()
+    print("%-40s %15.0f" % ("ConditionSet.evaluate(), %d samples" % BATCH, bench_evaluate(cs, columns, times)))
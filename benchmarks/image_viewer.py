@@ -0,0 +1,100 @@
+""" Benchmark of the ImageViewer display pipeline at full Flea3 resolution (2048 x 2448 Mono16).
+
+Compares the frames/s of the legacy pipeline, which buffers every frame in the dataframe buffer of the base viewer,
+filters and differences the full resolution frame and lets pyqtgraph autoscale the levels on the GUI thread, with the
+current ring buffer and display-resolution pipeline. Both paths run the
+complete viewer handle() and widget update() for every frame.
+
+Run with:
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/image_viewer.py
+"""
+import time
+
+import numpy as np
+import pandas as pd
+import pyqtgraph as pg
+from scipy.ndimage import gaussian_filter
+
+from spherexlabtools.record import Record
+from spherexlabtools.viewers import Viewer, ImageViewer
+
+FRAME_SHAPE = (2048, 2448)
+FRAMES = 50
+
+
+class LegacyImageViewer(ImageViewer):
+    """ ImageViewer running the dataframe buffer and full resolution pipeline used before the ring buffer and display
+    downsampling were introduced.
+    """
+
+    def __init__(self, cfg, exp, **kwargs):
+        super().__init__(cfg, exp, **kwargs)
+        self.buffer = pd.DataFrame()
+
+    def handle(self, record):
+        """ Buffer the record with the dataframe buffer of the base viewer.
+        """
+        Viewer.handle(self, record)
+
+    def latest(self):
+        """ Return the latest frame in the dataframe buffer.
+        """
+        ind = self.buffer.index.get_level_values(0)[-1]
+        return self.buffer.loc[ind].values
+
+    def update_display_object(self):
+        scale_vals = self.scaling.getValues()
+        difference_vals = self.difference_frame.getValues()
+        gauss_filt_vals = self.gaussian_filter.getValues()
+        img = self.latest()
+        if self.reference is None:
+            self.reference = np.zeros_like(img)
+        data = img
+        if difference_vals['Image Selection'][0] == 'difference':
+            data = img - self.reference
+        if gauss_filt_vals['enabled'][0]:
+            data = gaussian_filter(data, gauss_filt_vals['sigma'][0])
+        self.display_object = {
+            'data': data,
+            'display_kwargs': {
+                'autoLevels': scale_vals['autoscale'][0],
+                'levels': (scale_vals['min'][0], scale_vals['max'][0])
+            }
+        }
+
+
+def run(viewer_cls, frames, gaussian=False, difference=False):
+    """ Push frames through a viewer and its widget and return the achieved frames/s.
+    """
+    viewer = viewer_cls({'instance_name': viewer_cls.__name__}, None)
+    viewer.gaussian_filter.child('enabled').setValue(gaussian)
+    if difference:
+        viewer.difference_frame.child('Image Selection').setValue('difference')
+    widget = viewer.widget(name=viewer.name)
+    widget.resize(800, 700)
+    widget.show()
+    app.processEvents()
+    viewer.update.connect(widget.update)
+    record = Record('frame')
+
+    t0 = time.perf_counter()
+    for frame in frames:
+        record.update(frame)
+        viewer.handle(record)
+        app.processEvents()
+    fps = len(frames) / (time.perf_counter() - t0)
+    widget.close()
+    return fps
+
+
+if __name__ == '__main__':
+    app = pg.mkQApp('ImageViewer benchmark')
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 4096, FRAME_SHAPE, dtype=np.uint16) for _ in range(FRAMES)]
+    for label, kwargs in [('plain', {}), ('difference', {'difference': True}),
+                          ('difference + gaussian', {'difference': True, 'gaussian': True})]:
+        before = run(LegacyImageViewer, frames, **kwargs)
+        after = run(ImageViewer, frames, **kwargs)
+        print('%-24s before: %6.2f frames/s   after: %6.2f frames/s   (x%.1f)' % (label, before, after,
+                                                                                   after / before))
@@ -0,0 +1,59 @@
+""" Benchmark of the import time of the spherexlabtools driver and configuration modules.
+
+Each module is imported in a fresh interpreter, so that the time includes every dependency it pulls in. The vendor
+SDKs loaded by the import are reported alongside the time. Importing a driver or an experiment configuration should
+not load a vendor SDK; SDKs are only loaded when an instrument that needs them is instantiated.
+
+Run with:
+
+    python benchmarks/import_time.py [module ...]
+"""
+import sys
+import json
+import subprocess
+
+MODULES = [
+    "spherexlabtools.instruments",
+    "spherexlabtools.instruments.flir",
+    "spherexlabtools.instruments.edmund",
+    "spherexlabtools.instruments.srs",
+    "spherexlabtools.configs.collimator.hw",
+    "spherexlabtools.experiment",
+]
+
+# - vendor SDK modules that should only be loaded when an instrument is instantiated - #
+SDK_MODULES = ["PySpin", "clr", "OptecHID_FilterWheelAPI"]
+REPEATS = 5
+
+TIMER = """
+import sys, json, time
+t0 = time.perf_counter()
+import %s
+t = time.perf_counter() - t0
+print(json.dumps({'time': t, 'sdks': [m for m in %r if m in sys.modules]}))
+"""
+
+
+def time_import(module):
+    """ Import a module in a fresh interpreter and return a dictionary of the import time in seconds and the list of
+    vendor SDKs loaded, or of the error raised by the import.
+    """
+    proc = subprocess.run([sys.executable, "-c", TIMER % (module, SDK_MODULES)], capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    modules = sys.argv[1:] if len(sys.argv) > 1 else MODULES
+    width = max(len(m) for m in modules)
+    print("%s  %10s  %s" % ("module".ljust(width), "import (s)", "vendor SDKs loaded"))
+    for module in modules:
+        results = [time_import(module) for _ in range(REPEATS)]
+        errors = [r["error"] for r in results if "error" in r]
+        if len(errors) > 0:
+            print("%s  %10s  %s" % (module.ljust(width), "error", errors[0]))
+            continue
+        best = min(r["time"] for r in results)
+        sdks = sorted(set(s for r in results for s in r["sdks"]))
+        print("%s  %10.3f  %s" % (module.ljust(width), best, ", ".join(sdks) if len(sdks) > 0 else "none"))
@@ -0,0 +1,135 @@
+""" Benchmark of a :class:`CSVRecorder <spherexlabtools.recorders.CSVRecorder>` running on a thread of the experiment
+process, and in a child process with the process option of the recorder.
+
+For each mode, the following are measured while a simulated acquisition loop runs on another thread of the
+experiment process:
+
+    - throughput: records written per second when a burst of records is queued at once.
+    - latency: time from queueing a single record to the recorder having written it, with the recorder idle.
+    - acquisition rate: iterations per second of the acquisition loop while the burst is written, relative to its rate
+      with no recorder running, and the longest gap between two of its iterations.
+
+Run with:
+
+    python benchmarks/process_recorder.py [records] [rows] [columns]
+"""
+import os
+import sys
+import time
+import datetime
+import tempfile
+import threading
+
+import numpy as np
+
+from spherexlabtools.record import Record
+from spherexlabtools.recorders import CSVRecorder
+
+LATENCY_SAMPLES = 200
+SEED = 0
+
+
+class AcquisitionLoop(threading.Thread):
+    """ Thread running a fixed amount of Python work per iteration, as a procedure sample loop would.
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.running = True
+        self.iterations = 0
+        self.max_gap = 0
+
+    def run(self):
+        t_prev = time.perf_counter()
+        while self.running:
+            sum(range(2000))
+            t = time.perf_counter()
+            self.max_gap = max(self.max_gap, t - t_prev)
+            t_prev = t
+            self.iterations += 1
+
+    def measure(self, func):
+        """ Start the loop, call func, then stop the loop and return the iterations per second.
+        """
+        self.start()
+        t0 = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - t0
+        self.running = False
+        self.join()
+        return self.iterations / elapsed
+
+
+def make_records(n, rows, columns, rng):
+    """ Return a list of n records of rows x columns random values, emitted by the same procedure run.
+    """
+    start_time = datetime.datetime.now()
+    records = []
+    for i in range(n):
+        record = Record("bench")
+        record.update(rng.normal(size=(rows, columns)), proc_params={"exposure": 1.5, "filter": "open"},
+                      meta={"timestamp": datetime.datetime.now()}, proc_start_time=start_time)
+        records.append(record)
+    return records
+
+
+def wait_idle(recorder):
+    """ Block until the recorder has written every queued record.
+    """
+    while recorder.queue.unfinished_tasks > 0 or recorder.pending() > 0:
+        time.sleep(0.0002)
+
+
+def bench(records, directory, process):
+    """ Return the throughput, median and 95th percentile latency, acquisition rate and longest acquisition gap of a
+    recorder in the given mode.
+    """
+    name = "bench_process" if process else "bench_thread"
+    recorder = CSVRecorder({"instance_name": name}, None, process=process)
+    recorder.results_path.setValue(os.path.join(directory, name))
+    recorder.start()
+
+    # - the first record opens the results file, and starts the child process' imports - #
+    recorder.queue.put(records[0])
+    wait_idle(recorder)
+
+    def burst():
+        for record in records:
+            recorder.queue.put(record)
+        wait_idle(recorder)
+
+    loop = AcquisitionLoop()
+    t0 = time.perf_counter()
+    loop_rate = loop.measure(burst)
+    throughput = len(records) / (time.perf_counter() - t0)
+
+    latencies = []
+    for record in records[:LATENCY_SAMPLES]:
+        t0 = time.perf_counter()
+        recorder.queue.put(record)
+        wait_idle(recorder)
+        latencies.append(time.perf_counter() - t0)
+
+    recorder.stop()
+    recorder.wait()
+    return throughput, np.median(latencies), np.percentile(latencies, 95), loop_rate, loop.max_gap
+
+
+if __name__ == "__main__":
+    n_records = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    columns = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+    records = make_records(n_records, rows, columns, np.random.default_rng(SEED))
+
+    idle = AcquisitionLoop()
+    idle_rate = idle.measure(lambda: time.sleep(1))
+
+    print("%d records of %d rows x %d columns." % (n_records, rows, columns))
+    print("%-8s %12s %14s %14s %18s %16s" % ("mode", "records/s", "latency [ms]", "p95 [ms]", "acquisition rate",
+                                             "max gap [ms]"))
+    with tempfile.TemporaryDirectory() as directory:
+        for process in [False, True]:
+            throughput, latency, p95, loop_rate, max_gap = bench(records, directory, process)
+            print("%-8s %12.0f %14.2f %14.2f %17.0f%% %16.1f" % ("process" if process else "thread", throughput,
+                                                                 1e3 * latency, 1e3 * p95,
+                                                                 100 * loop_rate / idle_rate, 1e3 * max_gap))
@@ -0,0 +1,149 @@
+""" This module implements the class :class:`.AlertDispatcher`, a background thread sending alert emails over persistent
+smtp connections, so that the thread raising an alert does not wait for the mail servers.
+
+One connection is kept open to each smtp server. Before each message the connection is checked with a NOOP, and if the
+server has closed it, e.g. after being idle, a new connection is opened and authenticated. A message that fails to
+send is retried on a new connection. Alerts queued when the dispatcher is stopped are still sent before its thread
+exits.
+"""
+import queue
+import logging
+import smtplib
+from email.mime.text import MIMEText
+
+import spherexlabtools.log as slt_log
+from spherexlabtools.thread import QueueThread
+
+log_name = f"{slt_log.LOGGER_NAME}.{__name__.split('.')[-1]}"
+logger = logging.getLogger(log_name)
+
+
+class AlertDispatcher(QueueThread):
+    """ Queue thread sending the alerts passed to :meth:`.send` to the recipients of each smtp server.
+    """
+
+    def __init__(self, address, password, smtp_dict, port=587, use_tls=True, sender='SPHEREx B111 Lab Alert System',
+                 retries=2, smtp_timeout=30):
+        """ Initialize an alert dispatcher.
+
+        :param address: Email address the alerts are sent from.
+        :param password: Password of the email address. No login is done if None.
+        :param smtp_dict: Dictionary of smtp servers to lists of recipients.
+        :param port: Port of the smtp servers.
+        :param use_tls: Boolean indicating if the connections are upgraded with STARTTLS.
+        :param sender: Name in the From header of the alerts.
+        :param retries: Number of times a message is retried on a new connection after failing to send.
+        :param smtp_timeout: Timeout in seconds of the smtp connections.
+        """
+        super().__init__()
+        self.address = address
+        self.password = password
+        self.smtp = smtp_dict
+        self.port = port
+        self.use_tls = use_tls
+        self.sender = sender
+        self.retries = retries
+        self.smtp_timeout = smtp_timeout
+        self.connections = {}
+        self.sent = 0
+        self.failed = 0
+
+    @property
+    def recipients(self):
+        """ List of the recipients of every smtp server.
+        """
+        return [r for recipients in self.smtp.values() for r in recipients]
+
+    def connect(self, server):
+        """ Open, secure and authenticate a connection to an smtp server, and keep it for later messages.
+        """
+        self.disconnect(server)
+        conn = smtplib.SMTP(server, self.port, timeout=self.smtp_timeout)
+        try:
+            if self.use_tls:
+                conn.starttls()
+                conn.ehlo()
+            if self.password is not None:
+                conn.login(self.address, self.password)
+        except (smtplib.SMTPException, OSError):
+            conn.close()
+            raise
+        self.connections[server] = conn
+        return conn
+
+    def disconnect(self, server):
+        """ Close the connection to an smtp server, if there is one.
+        """
+        conn = self.connections.pop(server, None)
+        if conn is not None:
+            try:
+                conn.quit()
+            except (smtplib.SMTPException, OSError):
+                conn.close()
+
+    def connection(self, server):
+        """ Return the open connection to an smtp server, reconnecting if the server has closed it.
+        """
+        conn = self.connections.get(server)
+        if conn is not None:
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except (smtplib.SMTPException, OSError):
+                pass
+        return self.connect(server)
+
+    def send(self, subject, body):
+        """ Queue an alert for sending. Returns immediately.
+
+        :param subject: Subject of the alert.
+        :param body: Plain text of the alert.
+        """
+        self.queue.put((subject, body))
+
+    def handle(self, record):
+        subject, body = record
+        msg = MIMEText(body, 'plain')
+        msg['Subject'] = subject
+        msg['From'] = self.sender
+        msg['To'] = ', '.join(self.recipients)
+        msg = msg.as_string()
+
+        for server, recipients in self.smtp.items():
+            for attempt in range(self.retries + 1):
+                try:
+                    conn = self.connection(server) if attempt == 0 else self.connect(server)
+                    conn.sendmail(from_addr=self.address, to_addrs=recipients, msg=msg)
+                    self.sent += 1
+                    break
+                except (smtplib.SMTPException, OSError) as e:
+                    logger.warning('Failed to send %s on %s (attempt %d): %s' % (subject, server, attempt + 1, e))
+                    self.disconnect(server)
+            else:
+                self.failed += 1
+                logger.error('Could not send %s to %s on %s!' % (subject, ', '.join(recipients), server))
+
+    def execute(self):
+        super().execute()
+
+        # - send the alerts queued before the stop, then close the connections - #
+        while True:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                self.handle(record)
+            finally:
+                self.queue.task_done()
+        for server in list(self.connections.keys()):
+            self.disconnect(server)
+
+    def wait_sent(self, timeout=None):
+        """ Block until every queued alert has been handled.
+
+        :param timeout: Optional timeout in seconds.
+        :return: Boolean indicating if the queue was emptied before the timeout.
+        """
+        with self.queue.all_tasks_done:
+            return self.queue.all_tasks_done.wait_for(lambda: self.queue.unfinished_tasks == 0, timeout)
@@ -0,0 +1,150 @@
+""" This module implements the in-process publish/subscribe bus of an experiment:
+
+    - :class:`.RecordBus`: Passes the records published to a topic to every subscription of the topic.
+    - :class:`.Subscription`: Bounded queue of the records of a set of topics, for a single subscriber.
+
+Records are passed by reference, so any number of subscribers share a record without copies, and subscribers should
+not modify the records they receive. Each subscription has its own maximum size and overflow policy, so a slow
+subscriber never blocks the publisher or the other subscribers, unless its policy is 'block':
+
+    - 'drop_oldest': the oldest queued record is dropped to make room. Suited to monitors that need the latest values.
+    - 'drop_newest': the published record is dropped.
+    - 'block': the publisher waits for room, up to the block_timeout of the subscription, then drops the record.
+
+A subscription to the topic '*' receives the records of every topic.
+"""
+import queue
+import logging
+import threading
+
+import spherexlabtools.log as slt_log
+
+log_name = f"{slt_log.LOGGER_NAME}.{__name__.split('.')[-1]}"
+logger = logging.getLogger(log_name)
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+OVERFLOW_POLICIES = [DROP_OLDEST, DROP_NEWEST, BLOCK]
+ALL_TOPICS = '*'
+
+
+class Subscription(queue.Queue):
+    """ Bounded queue of the records published to a set of topics. Reads use the usual queue.Queue interface, e.g.
+    get(timeout=1) or get_nowait(), so a subscription may also be used as the queue of a
+    :class:`QueueThread <spherexlabtools.thread.QueueThread>`.
+    """
+
+    def __init__(self, topics, maxsize=1000, overflow=DROP_OLDEST, block_timeout=None, name=None):
+        """ Initialize a subscription.
+
+        :param topics: List of topics.
+        :param maxsize: Maximum number of queued records. Unbounded if 0.
+        :param overflow: Policy applied when a record is published to a full queue. One of OVERFLOW_POLICIES.
+        :param block_timeout: Maximum time in seconds a publisher waits for room with the 'block' policy. Waits
+                              indefinitely if None.
+        :param name: Name of the subscriber, used in log messages.
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('Invalid overflow policy %s! Must be one of %s.' % (overflow, OVERFLOW_POLICIES))
+        super().__init__(maxsize)
+        self.topics = list(topics)
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.name = name
+        self.bus = None
+        self.dropped = 0
+
+    def put(self, item, block=True, timeout=None):
+        """ Queue a record, applying the overflow policy if the queue is full.
+
+        :return: Boolean indicating if the record was queued.
+        """
+        if self.overflow == BLOCK:
+            try:
+                super().put(item, block, timeout if timeout is not None else self.block_timeout)
+                return True
+            except queue.Full:
+                with self.mutex:
+                    self.dropped += 1
+                return False
+        with self.not_full:
+            if 0 < self.maxsize <= self._qsize():
+                self.dropped += 1
+                if self.overflow == DROP_NEWEST:
+                    return False
+                self._get()
+                self.unfinished_tasks -= 1
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+        return True
+
+    def close(self):
+        """ Stop receiving records from the bus.
+        """
+        if self.bus is not None:
+            self.bus.unsubscribe(self)
+
+    def __repr__(self):
+        return '<Subscription(name=%s, topics=%s, queued=%d, dropped=%d)>' % (self.name, self.topics, self.qsize(),
+                                                                              self.dropped)
+
+
+class RecordBus:
+    """ Topic based publish/subscribe bus. Publishing only reads an immutable tuple of the subscriptions of the topic,
+    so it takes no lock and costs one dictionary lookup for topics without subscribers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+
+    def subscribe(self, topics, maxsize=1000, overflow=DROP_OLDEST, block_timeout=None, name=None):
+        """ Subscribe to one or more topics.
+
+        :param topics: Topic string, or list of topics.
+        :return: The :class:`.Subscription`. See its initialization for the other arguments.
+        """
+        topics = [topics] if isinstance(topics, str) else list(topics)
+        subscription = Subscription(topics, maxsize=maxsize, overflow=overflow, block_timeout=block_timeout, name=name)
+        subscription.bus = self
+        with self.lock:
+            for topic in topics:
+                self.subscribers[topic] = self.subscribers.get(topic, ()) + (subscription,)
+        logger.info('%s subscribed to %s' % (name, ', '.join(topics)))
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """ Remove a subscription from all of its topics.
+        """
+        with self.lock:
+            for topic in subscription.topics:
+                subs = tuple(s for s in self.subscribers.get(topic, ()) if s is not subscription)
+                if len(subs) > 0:
+                    self.subscribers[topic] = subs
+                else:
+                    self.subscribers.pop(topic, None)
+        subscription.bus = None
+
+    def publish(self, topic, record, exclude=()):
+        """ Pass a record to every subscription of a topic and of all topics.
+
+        :param exclude: Subscriptions not to pass the record to, e.g. because the record was already put on them.
+        :return: Number of subscriptions that queued the record.
+        """
+        subs = self.subscribers.get(topic, ())
+        all_subs = self.subscribers.get(ALL_TOPICS, ())
+        if len(all_subs) > 0:
+            subs = subs + tuple(s for s in all_subs if s not in subs)
+        queued = 0
+        for sub in subs:
+            if sub not in exclude:
+                queued += sub.put(record)
+        return queued
+
+    def stats(self):
+        """ Return a dictionary of the queued and dropped record counts of each subscription, by subscriber name.
+        """
+        subs = set(s for topic_subs in self.subscribers.values() for s in topic_subs)
+        return {s.name: {'topics': s.topics, 'queued': s.qsize(), 'dropped': s.dropped} for s in subs}
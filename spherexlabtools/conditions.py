@@ -0,0 +1,249 @@
+""" This module implements the class :class:`.ConditionSet`, which compiles a set of alert conditions once and evaluates
+them all in a single pass over the channels of a sample.
+
+A condition is a Python expression in the channel names of the samples, e.g. 'ls218_1 > 300', restricted to:
+
+    - numbers, channel names and the arithmetic operators +, -, *, /, ** and %.
+    - comparisons, which may be chained, and the boolean operators and, or and not.
+    - abs(x), min(x, y, ...) and max(x, y, ...).
+    - rate(x): rate of change of x per second between the previous and the current sample.
+    - sustained(condition, n): True if condition has been True for the last n samples.
+
+The conditions are parsed and checked against these rules when the set is created, and the whole set is compiled into
+a single function. Any other syntax, e.g. attribute access or calls of other functions, raises a
+:class:`.ConditionError`, so that no code other than the arithmetic of the conditions is ever run. A scalar version of
+the function evaluates one sample at a time, and a vectorized version evaluates a batch of samples with numpy. Both
+share the state of the rate() and sustained() terms, so they may be mixed. Channels missing from a sample are NaN, and
+comparisons with them are False.
+"""
+import ast
+import math
+import time
+
+import numpy as np
+
+
+class ConditionError(Exception):
+    pass
+
+
+# - functions allowed in conditions. Values are the names used in the scalar and vectorized code - #
+FUNCTIONS = {
+    "abs": ("abs", "np.abs"),
+    "min": ("min", "np.minimum"),
+    "max": ("max", "np.maximum"),
+}
+
+BIN_OPS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/", ast.Pow: "**", ast.Mod: "%"}
+UNARY_OPS = {ast.UAdd: "+", ast.USub: "-"}
+COMPARE_OPS = {ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">=", ast.Eq: "==", ast.NotEq: "!="}
+
+
+class _CodeGenerator:
+    """ Translates the syntax tree of a condition into Python source code in the scalar or vectorized form. Channels
+    are read from the list c, and rate() and sustained() terms are evaluated once per call ahead of the conditions.
+    """
+
+    def __init__(self, channels, vector):
+        self.channels = channels
+        self.vector = vector
+        self.prelude = []
+        self.stateful = []
+
+    def channel(self, name):
+        if name not in self.channels:
+            self.channels.append(name)
+        return "c[%d]" % self.channels.index(name)
+
+    def emit(self, node, expr):
+        if isinstance(node, ast.Expression):
+            return self.emit(node.body, expr)
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float, bool):
+            return repr(node.value)
+        if isinstance(node, ast.Name):
+            return self.channel(node.id)
+        if isinstance(node, ast.BinOp) and type(node.op) in BIN_OPS:
+            return "(%s %s %s)" % (self.emit(node.left, expr), BIN_OPS[type(node.op)], self.emit(node.right, expr))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPS:
+            return "(%s%s)" % (UNARY_OPS[type(node.op)], self.emit(node.operand, expr))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            operand = self.emit(node.operand, expr)
+            return "np.logical_not(%s)" % operand if self.vector else "(not %s)" % operand
+        if isinstance(node, ast.BoolOp):
+            values = [self.emit(v, expr) for v in node.values]
+            if self.vector:
+                func = "np.logical_and" if isinstance(node.op, ast.And) else "np.logical_or"
+                return self.nest(func, values)
+            op = " and " if isinstance(node.op, ast.And) else " or "
+            return "(%s)" % op.join(values)
+        if isinstance(node, ast.Compare) and all(type(op) in COMPARE_OPS for op in node.ops):
+            operands = [self.emit(n, expr) for n in [node.left] + node.comparators]
+            terms = ["(%s %s %s)" % (operands[i], COMPARE_OPS[type(op)], operands[i + 1])
+                     for i, op in enumerate(node.ops)]
+            if self.vector:
+                return self.nest("np.logical_and", terms)
+            return "(%s)" % " and ".join(terms)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and len(node.keywords) == 0:
+            return self.emit_call(node, expr)
+        raise ConditionError("Unsupported %s expression in condition '%s'!" % (type(node).__name__, expr))
+
+    def emit_call(self, node, expr):
+        name = node.func.id
+        if name in FUNCTIONS:
+            if len(node.args) == 0 or (name == "abs" and len(node.args) != 1):
+                raise ConditionError("Invalid number of arguments to %s() in condition '%s'!" % (name, expr))
+            args = [self.emit(a, expr) for a in node.args]
+            func = FUNCTIONS[name][1 if self.vector else 0]
+            if name == "abs":
+                return "%s(%s)" % (func, args[0])
+            if len(args) == 1:
+                return args[0]
+            if self.vector:
+                return self.nest(func, args)
+            return "%s(%s)" % (func, ", ".join(args))
+
+        # - stateful terms are evaluated once ahead of the conditions, after the terms they contain - #
+        if name == "rate" and len(node.args) == 1:
+            arg = self.emit(node.args[0], expr)
+            return self.hoist("_rate", name, arg)
+        if name == "sustained" and len(node.args) == 2:
+            n = node.args[1]
+            if not (isinstance(n, ast.Constant) and type(n.value) is int and n.value > 0):
+                raise ConditionError("The number of samples of sustained() must be a positive integer in condition "
+                                     "'%s'!" % expr)
+            arg = self.emit(node.args[0], expr)
+            return self.hoist("_sustained", name, "%s, %d" % (arg, n.value))
+        raise ConditionError("Unsupported function %s() in condition '%s'!" % (name, expr))
+
+    def hoist(self, func, kind, args):
+        k = len(self.stateful)
+        self.stateful.append(kind)
+        self.prelude.append("s%d = %s(%d, %s, t)" % (k, func, k, args))
+        return "s%d" % k
+
+    @staticmethod
+    def nest(func, args):
+        out = args[0]
+        for a in args[1:]:
+            out = "%s(%s, %s)" % (func, out, a)
+        return out
+
+
+class ConditionSet:
+    """ Set of named conditions compiled into a single scalar and a single vectorized function.
+    """
+
+    def __init__(self, conditions):
+        """ Parse and compile a set of conditions.
+
+        :param conditions: Dictionary of condition names to condition expressions, or a list of expressions, in which
+                           case each expression is also its name.
+        """
+        if not isinstance(conditions, dict):
+            conditions = {c: c for c in conditions}
+        self.conditions = dict(conditions)
+        self.names = list(self.conditions.keys())
+        self.channels = []
+        self.condition_channels = {}
+
+        trees = {}
+        for name, expr in self.conditions.items():
+            try:
+                trees[name] = ast.parse(expr.strip(), mode="eval")
+            except SyntaxError as e:
+                raise ConditionError("Invalid syntax in condition '%s': %s" % (expr, e.msg))
+            self.condition_channels[name] = list(dict.fromkeys(
+                n.id for n in ast.walk(trees[name]) if isinstance(n, ast.Name) and not self._is_function(n, trees[name])
+            ))
+
+        self._scalar = self._compile(trees, vector=False)
+        self._vector = self._compile(trees, vector=True)
+        self.reset()
+
+    @staticmethod
+    def _is_function(name_node, tree):
+        """ Return True if name_node is the function name of a call in tree.
+        """
+        return any(isinstance(n, ast.Call) and n.func is name_node for n in ast.walk(tree))
+
+    def _compile(self, trees, vector):
+        """ Generate and compile the function evaluating every condition.
+        """
+        gen = _CodeGenerator(self.channels, vector)
+        lines = ["out[%d] = %s" % (i, gen.emit(tree, self.conditions[name])) for i, (name, tree) in
+                 enumerate(trees.items())]
+        src = "def _evaluate(c, t, out):\n" + "".join("    %s\n" % line for line in gen.prelude + lines) + \
+              "    return out\n"
+        namespace = {"np": np, "_rate": self._rate_vector if vector else self._rate_scalar,
+                     "_sustained": self._sustained_vector if vector else self._sustained_scalar}
+        exec(compile(src, "<conditions>", "exec"), namespace)
+        self.stateful = gen.stateful
+        return namespace["_evaluate"]
+
+    def reset(self):
+        """ Clear the state of the rate() and sustained() terms.
+        """
+        self._rate_prev = [(math.nan, math.nan)] * len(self.stateful)
+        self._runs = [0] * len(self.stateful)
+
+    # - stateful terms - #
+    def _rate_scalar(self, k, x, t):
+        x_prev, t_prev = self._rate_prev[k]
+        self._rate_prev[k] = (x, t)
+        dt = t - t_prev
+        return (x - x_prev) / dt if dt > 0 else math.nan
+
+    def _sustained_scalar(self, k, cond, n, t):
+        self._runs[k] = self._runs[k] + 1 if cond else 0
+        return self._runs[k] >= n
+
+    def _rate_vector(self, k, x, t):
+        x = np.broadcast_to(np.asarray(x, dtype=np.float64), t.shape)
+        x_prev, t_prev = self._rate_prev[k]
+        self._rate_prev[k] = (x[-1], t[-1])
+        dt = np.diff(t, prepend=t_prev)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(dt > 0, np.diff(x, prepend=x_prev) / dt, np.nan)
+
+    def _sustained_vector(self, k, cond, n, t):
+        cond = np.broadcast_to(np.asarray(cond, dtype=bool), t.shape)
+        i = np.arange(1, len(cond) + 1)
+        last_false = np.maximum.accumulate(np.where(cond, 0, i))
+        runs = i - last_false + np.where(last_false == 0, self._runs[k], 0)
+        self._runs[k] = int(runs[-1])
+        return runs >= n
+
+    # - evaluation - #
+    def check(self, sample, t=None):
+        """ Evaluate every condition on a single sample.
+
+        :param sample: Dictionary of channel names to values.
+        :param t: Time of the sample in seconds, used by rate(). Defaults to the current time.
+        :return: List of the names of the conditions that are True.
+        """
+        t = time.time() if t is None else t
+        c = [sample.get(ch, math.nan) for ch in self.channels]
+        c = [math.nan if v is None else v for v in c]
+        out = self._scalar(c, t, [False] * len(self.names))
+        return [self.names[i] for i, v in enumerate(out) if v]
+
+    def evaluate(self, samples, times=None):
+        """ Evaluate every condition on a batch of samples.
+
+        :param samples: Array of shape (samples, channels) of values ordered as the channels attribute, or a list of
+                        dictionaries of channel names to values.
+        :param times: Array of the times of the samples in seconds, used by rate(). Defaults to one sample per second
+                      ending at the current time.
+        :return: Boolean array of shape (samples, conditions).
+        """
+        if not isinstance(samples, np.ndarray):
+            samples = np.array([[s.get(ch, math.nan) for ch in self.channels] for s in samples], dtype=np.float64)
+        if samples.ndim != 2:
+            samples = samples.reshape(-1, len(self.channels))
+        if times is None:
+            times = time.time() - np.arange(len(samples))[::-1]
+        times = np.asarray(times, dtype=np.float64)
+        out = np.empty((len(self.names), len(samples)), dtype=bool)
+        if len(samples) == 0:
+            return out.T
+        return self._vector(samples.T, times, out).T
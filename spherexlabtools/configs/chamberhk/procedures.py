@@ -13,7 +13,7 @@ from spherexlabtools.procedures import Procedure, AlertProcedure
 # - Globals ----------------------------------------------- #
 LogName = '%s.%s' % (LOGGER_NAME, __name__.split('.')[-1])
 Logger = logging.getLogger(LogName)
-HkToAlert_Q = queue.Queue()
+HK_TOPIC = 'kasi_hk'
 
 
 class KasiHkLog(Procedure):
@@ -55,8 +55,8 @@ class KasiHkLog(Procedure):
                                  'kasi_vacuum_shell_pressure_low': pressure_low,
                                  'datetime': dt_now})
 
-            # - send values to the Alarm Queue - #
-            HkToAlert_Q.put(archive_dict)
+            # - publish values to the alert procedures - #
+            self.publish(HK_TOPIC, archive_dict)
 
             # - send out to viewers and recorders ------------------------------------------- #
             self.emit('pressure_view', {'kasi_vacuum_shell_pressure': pressure,
@@ -70,10 +70,17 @@ class KasiHkLog(Procedure):
 
 
 class KASIHkAlert(AlertProcedure):
-    """ Subclass the basic AlertProcedure to return values from the HkToAlert_Q queue object.
+    """ Subclass the basic AlertProcedure to return the values published by KasiHkLog to the HK_TOPIC topic of the
+    record bus. Only the latest hk_queue_size values are kept while the alert procedure is behind or not running.
     """
 
-    @staticmethod
-    def get():
-        return HkToAlert_Q.get()
+    def __init__(self, cfg, exp, hk_queue_size=100, **kwargs):
+        super().__init__(cfg, exp, **kwargs)
+        self.subscription = self.subscribe(HK_TOPIC, maxsize=hk_queue_size)
+
+    def get(self):
+        try:
+            return self.subscription.get(timeout=1)
+        except queue.Empty:
+            return None
 
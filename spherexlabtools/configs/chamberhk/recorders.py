@@ -1,38 +1,111 @@
 import os
+import time
 import datetime
+import numpy as np
 import pandas as pd
 from spherexlabtools.recorders import CSVRecorder
 
 
 class KASIHkRecorder(CSVRecorder):
+    """ CSV recorder that also archives each housekeeping channel to its own tab separated file of time stamps and
+    values, under <hk_root>/<y>/<m>/<d>/temperature or pressure.
 
-    def __init__(self, cfg, exp, **kwargs):
+    The files of the current day are kept open with buffered writes, and are flushed and synced to disk at most every
+    fsync_period seconds. They are closed, and the next day's directories created, on the first record of a new day.
+    """
+
+    def __init__(self, cfg, exp, hk_root=os.path.join('/data', 'hk'), fsync_period=10, buffer_size=65536, **kwargs):
+        """ Initialize a KASI housekeeping recorder.
+
+        :param hk_root: Root directory of the per-channel archive.
+        :param fsync_period: Minimum time in seconds between syncs of the archive files to disk. If 0, the files are
+                             synced after every record, and if None, only when they are closed.
+        :param buffer_size: Write buffer size in bytes of each archive file.
+        """
         super().__init__(cfg, exp, **kwargs)
+        self.hk_root = hk_root
+        self.fsync_period = fsync_period
+        self.buffer_size = buffer_size
+        self.hk_day = None
+        self.hk_dirs = None
+        self.hk_files = {}
+        self.last_sync = None
+
+    def open_day(self, day):
+        """ Close the archive files of the previous day and create the directories of day.
+        """
+        self.close_hk_files()
+        dir_path = os.path.join(self.hk_root, str(day.year), '%02i' % day.month, '%02i' % day.day)
+        self.hk_dirs = {
+            'temperature': os.path.join(dir_path, 'temperature'),
+            'pressure': os.path.join(dir_path, 'pressure'),
+        }
+        for path in self.hk_dirs.values():
+            os.makedirs(path, exist_ok=True)
+        self.hk_day = day
+
+    def hk_file(self, key):
+        """ Return the open archive file of a channel, or None if the channel is not archived.
+        """
+        f = self.hk_files.get(key)
+        if f is None:
+            if 'ls' in key:
+                kind = 'temperature'
+            elif 'pressure' in key:
+                kind = 'pressure'
+            else:
+                return None
+            f = open(os.path.join(self.hk_dirs[kind], key + '.txt'), 'a', buffering=self.buffer_size)
+            self.hk_files[key] = f
+        return f
+
+    def sync_hk_files(self):
+        """ Flush the archive files and sync them to disk.
+        """
+        for f in self.hk_files.values():
+            f.flush()
+            os.fsync(f.fileno())
+        self.last_sync = time.monotonic()
+
+    def close_hk_files(self):
+        """ Sync and close the archive files.
+        """
+        self.sync_hk_files()
+        for f in self.hk_files.values():
+            f.close()
+        self.hk_files = {}
 
     def update_results(self):
         # - call normal write method - #
         super().update_results()
 
-        # - create temperature/pressure directories for y/m/d - #
+        # - rotate the archive files on the first record of a new day - #
         dt = pd.Timestamp(self.data_df.datetime.values[0])
-        year = str(dt.year)
-        month = '%02i' % dt.month
-        day = '%02i' % dt.day
-        dir_path = os.path.join('/data', 'hk', year, month, day)
-        temp_path = os.path.join(dir_path, 'temperature')
-        pressure_path = os.path.join(dir_path, 'pressure')
-        os.makedirs(temp_path, exist_ok=True)
-        os.makedirs(pressure_path, exist_ok=True)
+        if dt.date() != self.hk_day:
+            self.open_day(dt.date())
 
+        # - format the lines of each channel at once, with the dtype of its own column as to_csv() did - #
         ts = round(datetime.datetime.timestamp(dt), 3)
         self.data_df.datetime = ts
-        for key in self.data_df.to_dict().keys():
-            df = self.data_df[['datetime', key]]
-            if 'ls' in key:
-                fp = os.path.join(temp_path, key+'.txt')
-            elif 'pressure' in key:
-                fp = os.path.join(pressure_path, key+'.txt')
+        prefix = '%r\t' % ts
+        for key in self.data_df.columns:
+            if key == 'datetime':
+                continue
+            f = self.hk_file(key)
+            if f is None:
+                continue
+            values = self.data_df[key]
+            text = values.to_numpy().astype(str)
+            text[values.isna().to_numpy()] = ''
+            f.write(''.join(np.char.add(np.char.add(prefix, text), '\n')))
 
-            if key != 'datetime':
-                df.to_csv(fp, sep='\t', header=False, index=False, mode='a')
+        if self.fsync_period is not None and (self.last_sync is None or
+                                              time.monotonic() - self.last_sync >= self.fsync_period):
+            self.sync_hk_files()
 
+    def execute(self):
+        # - the archive files are closed on the recorder thread, once no record is being written - #
+        try:
+            super().execute()
+        finally:
+            self.close_hk_files()
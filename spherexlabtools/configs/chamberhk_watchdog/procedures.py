@@ -1,14 +1,17 @@
-import os
+import re
 import time
 import pandas as pd
 from datetime import datetime
-import urllib.request
-from urllib.parse import urlparse
-from urllib.error import HTTPError, URLError
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
 
 from spherexlabtools.procedures import AlertProcedure
 from spherexlabtools.parameters import Parameter, FloatParameter
 
+CONTENT_RANGE_RE = re.compile(r"bytes (?:\d+-\d+|\*)/(\d+|\*)")
+
 
 class KasiHkWatchdog(AlertProcedure):
     # - temperature and pressure --------------------------------- #
@@ -43,53 +46,91 @@ class KasiHkWatchdog(AlertProcedure):
     #password = Parameter('Password', default='')
     query_period = FloatParameter('Query Period (s)', default=5)
 
-    def __init__(self, cfg, exp, **kwargs):
+    def __init__(self, cfg, exp, hk_url=None, hk_auth=('spherex', 'spherex_lab'), fetch_workers=8, **kwargs):
+        """ Initialize the housekeeping watchdog.
+
+        :param hk_url: Base url of the housekeeping data export. Defaults to _baseurl.
+        :param hk_auth: Tuple of the user name and password of the data export.
+        :param fetch_workers: Number of channels fetched concurrently, and of pooled connections.
+        """
         super().__init__(cfg, exp, **kwargs)
-        self.password_mgr = None
-        self.auth_handler = None
-        self.opener = None
+        self.baseurl = hk_url if hk_url is not None else self._baseurl
+        self.hk_auth = hk_auth
+        self.fetch_workers = fetch_workers
+        self.session = None
+        self.executor = None
+        self.lengths = None
+        self.offsets = None
+        self.today = None
         self.no_act_count = None
 
     def startup(self):
-        self.password_mgr = urllib.request.HTTPPasswordMgrWithDefaultRealm()
-        self.password_mgr.add_password(None, urlparse(self._baseurl).netloc, 'spherex', 'spherex_lab')
-        self.auth_handler = urllib.request.HTTPBasicAuthHandler(self.password_mgr)
-        self.opener = urllib.request.build_opener(self.auth_handler)
-        self.no_act_count = {
-            val: 0 for val in self._temp_lengths.keys()
-        }
-        self.no_act_count.update({
-            val: 0 for val in self._pressure_lengths.keys()
-        })
-        self.no_act_count = pd.Series(self.no_act_count)
+        # - one authenticated session, whose connections are kept alive and shared by the fetch threads - #
+        self.session = requests.Session()
+        self.session.auth = self.hk_auth
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.fetch_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix=self.name)
+        self.lengths = {key: None for key in list(self._temp_lengths.keys()) + list(self._pressure_lengths.keys())}
+        self.offsets = {}
+        self.today = None
+        self.no_act_count = pd.Series({key: 0 for key in self.lengths.keys()})
         super().startup()
 
+    def execute(self):
+        # - the fetch threads and connections are closed on this thread, once get() can no longer be running - #
+        try:
+            super().execute()
+        finally:
+            self.executor.shutdown(wait=True)
+            self.session.close()
+
+    def channel_url(self, key, today):
+        """ Return the url of today's data file of a channel.
+        """
+        kind = 'temperature' if key in self._temp_lengths else 'pressure'
+        return self.baseurl + '%s/%s/%s/%s.txt' % (kind, today, today, key)
+
+    def fetch_length(self, key, url):
+        """ Return the current length in bytes of the data file of a channel, fetching only the bytes added since the
+        last call. The first call of the day only requests the first byte, to read the length from the Content-Range.
+        """
+        offset = self.offsets.get(key)
+        headers = {'Range': 'bytes=0-0' if offset is None else 'bytes=%d-' % offset}
+        with self.session.get(url, headers=headers, timeout=max(self.query_period, 5)) as response:
+            match = CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+            total = int(match.group(1)) if match is not None and match.group(1) != '*' else None
+            if response.status_code == 206:
+                if offset is None:
+                    length = total if total is not None else len(response.content)
+                else:
+                    length = offset + len(response.content)
+            elif response.status_code == 416:
+                # - no bytes past the offset. The total is below the offset if the file has been rewritten - #
+                length = total if total is not None else offset
+            else:
+                # - the server ignored the range and returned the whole file - #
+                response.raise_for_status()
+                length = len(response.content)
+        self.offsets[key] = length
+        return length
+
     def get(self):
         today = datetime.now().strftime('%Y%m%d')
+        if today != self.today:
+            self.offsets = {}
+            self.today = today
 
         time.sleep(self.query_period)
 
-        # - temperature queries ---------------------------------------- #
-        for tkey, value in self._temp_lengths.items():
-            url_add = 'temperature/%s/%s/%s.txt' % (today, today, tkey)
-            full_url = self._baseurl + url_add
-            with self.opener.open(full_url) as response:
-                data = response.read()
-                data_len = len(data)
-                if data_len == value:
-                    self.no_act_count[tkey] += 1
-                self._temp_lengths[tkey] = data_len
-
-        # - pressure queries ------------------------------------------- #
-        for pkey, value in self._pressure_lengths.items():
-            url_add = 'pressure/%s/%s/%s.txt' % (today, today, pkey)
-            full_url = self._baseurl + url_add
-            with self.opener.open(full_url) as response:
-                data = response.read()
-                data_len = len(data)
-                if len(data) == value:
-                    self.no_act_count[pkey] += 1
-                self._pressure_lengths[pkey] = data_len
+        # - temperature and pressure queries, concurrently ------------- #
+        futures = {key: self.executor.submit(self.fetch_length, key, self.channel_url(key, today))
+                   for key in self.lengths.keys()}
+        for key, future in futures.items():
+            data_len = future.result()
+            if data_len == self.lengths[key]:
+                self.no_act_count[key] += 1
+            self.lengths[key] = data_len
 
         return {'no_activity_count': self.no_act_count.max()}
-
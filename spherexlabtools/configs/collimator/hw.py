@@ -21,36 +21,31 @@ This module provides the hardware configuration file for focus calibration. The
         4.3) lift stage
         4.4) linear stage
 """
-from spherexlabtools.instruments.flir import Flea3 as _Fl3
-
 # - 1) Camera ------------------------------------------------------------------- #
-try:
-    Camera = {
-        "instance_name": "Camera",
-        "resource_name": _Fl3.cam_list[0],
-        "manufacturer": "flir",
-        "instrument": "Flea3",
-        "params": {
-            "acquisition_frame_rate_en": True,
-            "acquisition_frame_rate_auto": "Off",
-            "gain_auto": "Off",
-            "gain": 0,
-            "blacklevel_en": False,
-            "gamma_en": False,
-            "sharpess_en": False,
-            "offset_x": 0,
-            "offset_y": 0,
-            "exposure_width": 2448,
-            "exposure_height": 2048,
-            "exposure_mode": "Timed",
-            "exposure_auto": "Off",
-            "pixel_format": "Mono16"
-        }
+# - the resource name is the index of the camera in the Spinnaker camera list, which is only queried when the camera
+# - is instantiated.
+Camera = {
+    "instance_name": "Camera",
+    "resource_name": 0,
+    "manufacturer": "flir",
+    "instrument": "Flea3",
+    "params": {
+        "acquisition_frame_rate_en": True,
+        "acquisition_frame_rate_auto": "Off",
+        "gain_auto": "Off",
+        "gain": 0,
+        "blacklevel_en": False,
+        "gamma_en": False,
+        "sharpess_en": False,
+        "offset_x": 0,
+        "offset_y": 0,
+        "exposure_width": 2448,
+        "exposure_height": 2048,
+        "exposure_mode": "Timed",
+        "exposure_auto": "Off",
+        "pixel_format": "Mono16"
     }
-except IndexError:
-    Camera = {'instance_name': 'Camera'}
-
-print(Camera)
+}
 
 # - resource names ------------------------------------------------------- #
 mscope_gauge_resource_name = 'ASRL/dev/ttyUSB0::INSTR'
@@ -1,9 +1,9 @@
 import time
 import logging
 import datetime
-import numpy as np
 from spherexlabtools.procedures import Procedure
-from spherexlabtools.parameters import FloatParameter, IntegerParameter, BooleanParameter
+from spherexlabtools.stacking import FrameStacker
+from spherexlabtools.parameters import FloatParameter, IntegerParameter, BooleanParameter, ListParameter
 
 logger = logging.getLogger(__name__)
 
@@ -87,6 +87,11 @@ class CollimatorCalProc(CamProc):
     images = IntegerParameter("Images", default=1)
     wait_time = FloatParameter("Wait Time", default=0)
     light_frame = IntegerParameter("Light Frame", default=1)
+    stack_method = ListParameter("Stack Method", default="mean", choices=list(FrameStacker.METHODS))
+    preview_period = IntegerParameter("Preview Period (frames)", default=5, minimum=0)
+
+    # - the focuser can be moved to the next position once the last frame of a step is taken - #
+    prefetch_parameters = ['focus_position']
 
     def __init__(self, cfg, exp, **kwargs):
         """
@@ -94,14 +99,22 @@ class CollimatorCalProc(CamProc):
         super().__init__(cfg, exp, **kwargs)
         self.mscope = self.hw.Mscope
         self.inst_params = {}
+        self.stacker = None
+
+    def apply_setpoints(self, params):
+        """ Start moving the focuser to the focus position of the next step.
+        """
+        self.mscope.absolute_position = params['focus_position']
 
     def startup(self):
         """ Override startup to get instrument parameters
         """
         super().startup()
-        # - move the focuser and wait for its motion to complete - #
-        self.mscope.absolute_position = self.focus_position
-        self.mscope.fstage_wait_for_completion()
+        # - move the focuser, unless already prefetched, and wait for its motion to complete - #
+        with self.hw_lock:
+            if not self.is_staged('focus_position'):
+                self.mscope.absolute_position = self.focus_position
+            self.mscope.fstage_wait_for_completion()
 
         # - set camera exposure time - #
         self.cam.acquisition_frame_rate_en = False
@@ -113,26 +126,35 @@ class CollimatorCalProc(CamProc):
         self.inst_params.update({"focus_position": self.mscope.absolute_position,
                                  "camera_gain": self.cam.gain,
                                  "camera_exposure_time": self.cam.exposure_time,
-                                 "light_frame": self.mscope.fstage_outputs})
+                                 "light_frame": self.mscope.fstage_outputs,
+                                 "stack_method": self.stack_method})
 
-    def execute(self):
+        # - reuse the stacking buffers from the previous run when the stack configuration is unchanged - #
+        if self.stacker is None or self.stacker.frames != self.frames_per_image or \
+                self.stacker.method != self.stack_method:
+            self.stacker = FrameStacker(self.frames_per_image, method=self.stack_method)
 
-        frame_width = self.cam.exposure_width
-        frame_height = self.cam.exposure_height
-
-        # take a set of images averaged over several frames #
-        for _ in range(int(self.images)):
+    def execute(self):
+        # take a set of images stacked over several frames #
+        for n in range(int(self.images)):
             if self.should_stop():
                 break
-            image = np.zeros([frame_height, frame_width], dtype=np.float64)
-            for __ in range(self.frames_per_image):
+            self.stacker.reset()
+            for i in range(self.frames_per_image):
                 if self.should_stop():
                     break
                 time.sleep(self.wait_time)
                 exp = self.cam.latest_frame
-                image = image + (exp / self.frames_per_image)
-                # write out to viewers #
-                self.emit("frame", exp)
-                self.emit("frame_avg", image)
+                self.stacker.add(exp)
+                # - write out an occasional preview to the viewers - #
+                if self.preview_period > 0 and (i + 1) % self.preview_period == 0:
+                    self.emit("frame", exp)
+                    self.emit("frame_avg", self.stacker.preview())
 
+            if self.stacker.count == 0:
+                break
+            if n == int(self.images) - 1:
+                self.acquisition_complete()
+            image = self.stacker.result()
+            self.emit("frame_avg", image)
             self.emit("image", image, meta=self.inst_params)
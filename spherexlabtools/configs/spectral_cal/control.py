@@ -89,5 +89,16 @@ NoiseProcCntrl = {
 SpecCalProcCntrl = {
     'instance_name': 'SpecCalProcCntrl',
     'type': 'ProcedureController',
-    'procedure': 'SpectralCalProcedure'
+    'procedure': 'SpectralCalProcedure',
+    # - approximate transition times in seconds used to reorder sequences. Steps are not reordered across changes
+    # - of the cryo shutter. - #
+    'sequence_optimizer': {
+        'costs': {
+            'Mono Grating': 20,
+            'Mono OSF': 5,
+            'Mono Wavelength (um)': {'change': 0.5, 'rate': 2},
+            'NDF Position': 2,
+        },
+        'ordered': ['Cryo Shutter'],
+    },
 }
@@ -14,11 +14,12 @@ mono = {
     }
 }
 
+# - set 'instrument' to 'SimulatedSR830' to run without the lockin connected - #
 sr830 = {
     'instance_name': 'sr830',
     'manufacturer': 'srs',
     'resource_name': 'GPIB0::15::INSTR',
-    'instrument': 'SR830'
+    'instrument': 'SLTSR830'
 }
 
 readout = {
@@ -63,6 +63,8 @@ NoiseProc = {
     },
 }
 
+# - settle detection is opt-in: add 'sr830' to 'hw' and set 'kwargs': {'settle_reading': 'sr830.magnitude'}. The sr830
+# is also polled by LockinLogProc, and the two must not run at the same time on the shared GPIB adapter.
 SpecCalProc = {
     'instance_name': 'SpectralCalProcedure',
     'type': 'SpectralCalProcedure',
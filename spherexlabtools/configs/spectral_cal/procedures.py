@@ -1,10 +1,17 @@
 """ SPHEREx QM FPA Testing Procedures
 """
 import time
+import queue
 import logging
 import datetime
+import threading
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from operator import attrgetter
 
+import pandas as pd
 import spherexlabtools.log as slt_log
+from spherexlabtools.settle import SettleDetector
 from spherexlabtools.procedures import Procedure, LoggingProcedure
 from spherexlabtools.parameters import IntegerParameter, FloatParameter, Parameter, ListParameter, BooleanParameter
 
@@ -35,6 +42,7 @@ class FpaTestProcedure(Procedure):
     generate_fits = IntegerParameter('Generate FITS', default=1)
     run_line_fit = IntegerParameter('Run Line Fit', default=1)
     det_idsn = Parameter('Detector ID-SN', default='04-22407')
+    pipeline_depth = IntegerParameter('Pipeline Depth', default=1)
 
     def __init__(self, cfg, exp, **kwargs):
         super().__init__(cfg, exp, **kwargs)
@@ -59,6 +67,7 @@ class FpaTestProcedure(Procedure):
         # - detector id/sn attributes - #
         self.detid = None
         self.detsn = None
+        self._exposure_error = None
 
     def startup(self):
         super().startup()
@@ -91,6 +100,9 @@ class FpaTestProcedure(Procedure):
             self.stop()
 
     def execute(self):
+        if self.pipeline_depth > 1:
+            self.execute_pipelined(self.pipeline_depth)
+            return
 
         for iExp in range(self.exposures):
 
@@ -98,61 +110,126 @@ class FpaTestProcedure(Procedure):
             if self.should_stop():
                 break
 
-            # - get a timestamp and start an exposure --------------------------------------------------------------- #
-            if not DEBUG:
-                # - note, the readout instrument driver generates a timestamp internally, and this is returned into
-                # - readout_response (along with other readout information)
-                nofits = {1: 0, 0: 1}[self.generate_fits]
-                logger.info(
-                    'starting exposure with: TIME=%s; COMMENT=%s; NOFITS=%s; DETID=%s; DETSN=%s;' %
-                    (str(self.padding_time + self.exposure_time), self.comment, nofits, self.detid, self.detsn)
-                )
-                readout_response = self.readout.start_exposure(self.padding_time + self.exposure_time, self.comment,
-                                                               nofits=nofits, pend_for_complete=True, detid=self.detid,
-                                                               detsn=self.detsn, surcnt=self.surcnt)
-                readout_response = readout_response['testcom']
-                logger.info(
-                    f'exposure complete. Received: {readout_response}'
-                )
-
-            else:
-                timestamp = datetime.datetime.now().strftime(TS_FMT)
-                nofits = {1: 0, 0: 1}[self.generate_fits]
-                logger.info(
-                    'starting exposure with: TIME=%s; COMMENT=%s; NOFITS=%s; DETID=%s; DETSN=%s;' %
-                    (str(self.padding_time + self.exposure_time), self.comment, nofits, self.detid, self.detsn)
-                )
-                readout_response = {
-                    'fileid': 'ID',
-                    'filename': 'SPXFILE',
-                    'detid': self.detid,
-                    'detsn': self.detsn,
-                    'start': 'rob1',
-                    'surcnt': 393,
-                    'exposure': 10,
-                    'comment': 'asdf',
-                    'nofits': 1,
-                    'miscval': '[393, 400, 1, 2, 3, 4]',
-                    'timestamp': timestamp
-                }
-                logger.info(
-                    f'exposure complete. Received: {readout_response}'
-                )
-                #time.sleep(self.exposure_time + self.padding_time)
-
-            # - update the data dictionary ------------------------------------ #
-            self.data['fileid'] = readout_response.pop('fileid')
-            self.data['filename'] = readout_response.pop('filename')
-            self.data['timestamp'] = readout_response.pop('timestamp')
-
-            # - update the metadata dictionary ------------------------------------ #
-            self.meta['exposure_time'] = readout_response.pop('exposure')
-            self.meta['miscval'] = str(readout_response.pop('miscval'))
-            self.meta.update(readout_response)
+            readout_response = self.start_exposure()
+            if iExp == self.exposures - 1:
+                self.acquisition_complete()
+            self.complete_exposure(readout_response)
+
+    def execute_pipelined(self, depth):
+        """ Run the exposures with up to depth exposures in flight. Each exposure is started on a pool thread once the
+        detector time of the previous one has elapsed, and the responses are emitted in order by a separate completion
+        thread as the post-processing of each exposure finishes.
+        """
+        exposure_duration = self.padding_time + self.exposure_time
+        completions = queue.Queue()
+        completer = threading.Thread(target=self._complete_exposures, args=(completions,), daemon=True)
+        self._exposure_error = None
+        completer.start()
+        pool = ThreadPoolExecutor(max_workers=depth, thread_name_prefix='%s-exposure' % self.name)
+        in_flight = []
+        try:
+            for iExp in range(self.exposures):
+
+                # - check if the 'Abort Procedure' button was pressed. ---------------------------------------------- #
+                if self.should_stop() or self._exposure_error is not None:
+                    break
+
+                # - bound the number of exposures in flight ----------------------------------------------------- #
+                in_flight = [f for f in in_flight if not f.done()]
+                if len(in_flight) >= depth:
+                    futures.wait(in_flight, return_when=futures.FIRST_COMPLETED)
+
+                t0 = time.perf_counter()
+                fut = pool.submit(self.start_exposure)
+                in_flight.append(fut)
+                completions.put(fut)
+
+                # - the detector is busy for the exposure duration, after which the next exposure can start while
+                # - this one is post-processed.
+                remaining = exposure_duration
+                while remaining > 0 and not fut.done() and not self.should_stop():
+                    futures.wait([fut], timeout=min(remaining, 0.5))
+                    remaining = exposure_duration - (time.perf_counter() - t0)
+                if iExp == self.exposures - 1:
+                    self.acquisition_complete()
+        finally:
+            pool.shutdown(wait=True)
+            completions.put(None)
+            completer.join()
+
+        if self._exposure_error is not None:
+            raise self._exposure_error
+
+    def _complete_exposures(self, completions):
+        """ Completion thread of :meth:`execute_pipelined`. Emits the exposure responses in the order the exposures
+        were started.
+        """
+        while True:
+            fut = completions.get()
+            if fut is None:
+                return
+            try:
+                self.complete_exposure(fut.result())
+            except Exception as e:
+                logger.exception('exposure failed!')
+                if self._exposure_error is None:
+                    self._exposure_error = e
+
+    def start_exposure(self):
+        """ Start an exposure and block until the readout response is received.
+
+        :return: Readout response dictionary.
+        """
+        # - get a timestamp and start an exposure --------------------------------------------------------------- #
+        nofits = {1: 0, 0: 1}[self.generate_fits]
+        logger.info(
+            'starting exposure with: TIME=%s; COMMENT=%s; NOFITS=%s; DETID=%s; DETSN=%s;' %
+            (str(self.padding_time + self.exposure_time), self.comment, nofits, self.detid, self.detsn)
+        )
+        if not DEBUG:
+            # - note, the readout instrument driver generates a timestamp internally, and this is returned into
+            # - readout_response (along with other readout information)
+            readout_response = self.readout.start_exposure(self.padding_time + self.exposure_time, self.comment,
+                                                           nofits=nofits, pend_for_complete=True, detid=self.detid,
+                                                           detsn=self.detsn, surcnt=self.surcnt)
+            readout_response = readout_response['testcom']
 
-            # - write out the exposure parameters --------------------------------- #
-            self.emit('exposure', self.data, meta=self.meta)
-            #time.sleep(0.1)
+        else:
+            timestamp = datetime.datetime.now().strftime(TS_FMT)
+            readout_response = {
+                'fileid': 'ID',
+                'filename': 'SPXFILE',
+                'detid': self.detid,
+                'detsn': self.detsn,
+                'start': 'rob1',
+                'surcnt': 393,
+                'exposure': 10,
+                'comment': 'asdf',
+                'nofits': 1,
+                'miscval': '[393, 400, 1, 2, 3, 4]',
+                'timestamp': timestamp
+            }
+            #time.sleep(self.exposure_time + self.padding_time)
+        logger.info(
+            f'exposure complete. Received: {readout_response}'
+        )
+        return readout_response
+
+    def complete_exposure(self, readout_response):
+        """ Update the data and metadata dictionaries from a readout response and emit them to the exposure record.
+        """
+        # - update the data dictionary ------------------------------------ #
+        self.data['fileid'] = readout_response.pop('fileid')
+        self.data['filename'] = readout_response.pop('filename')
+        self.data['timestamp'] = readout_response.pop('timestamp')
+
+        # - update the metadata dictionary ------------------------------------ #
+        self.meta['exposure_time'] = readout_response.pop('exposure')
+        self.meta['miscval'] = str(readout_response.pop('miscval'))
+        self.meta.update(readout_response)
+
+        # - write out the exposure parameters --------------------------------- #
+        self.emit('exposure', self.data, meta=self.meta)
 
 
 class SpectralCalProcedure(FpaTestProcedure):
@@ -176,9 +253,58 @@ class SpectralCalProcedure(FpaTestProcedure):
     mono_set_sleep = FloatParameter('Mono Set Sleep Time', default=0)
     lockin_tc_sleep = FloatParameter('Lockin TC Sleep Time', default=6)
 
-    def __init__(self, cfg, exp, **kwargs):
+    # - settle detection parameters, used in place of the sleeps when a settle reading is configured ----- #
+    settle_tolerance = FloatParameter('Settle Tolerance', default=0)
+    settle_rel_tolerance = FloatParameter('Settle Relative Tolerance', default=0.01)
+    settle_window = FloatParameter('Settle Window (s)', default=1)
+
+    # - the monochromator can be moved to the next wavelength once the last exposure of a step is complete - #
+    prefetch_parameters = ['mono_osf', 'mono_grating', 'mono_wavelength']
+
+    def __init__(self, cfg, exp, settle_reading=None, **kwargs):
+        """ Initialize the spectral cal procedure.
+
+        :param settle_reading: Optional string of the form 'instrument.attribute' naming the reading watched to detect
+                               when the signal has settled after the monochromator is set, e.g. 'sr830.magnitude'.
+                               If not provided, the fixed mono set and lockin time constant sleeps are used. The
+                               instrument is polled from the procedure thread without a lock, so no other procedure
+                               may use it while the spectral cal runs.
+        """
         super().__init__(cfg, exp, **kwargs)
         self.mono = self.hw.mono
+        self.settle_reader = None
+        if settle_reading is not None:
+            inst, attr = settle_reading.split('.', 1)
+            self.settle_reader = lambda inst=getattr(self.hw, inst), get=attrgetter(attr): get(inst)
+        self.settle_reading = settle_reading
+
+    def settle(self):
+        """ Wait for the settle reading to stabilize. The wait times out after the mono set and lockin time constant
+        sleeps it replaces.
+        """
+        detector = SettleDetector(self.settle_reader, tolerance=self.settle_tolerance,
+                                  rel_tolerance=self.settle_rel_tolerance, window=self.settle_window,
+                                  timeout=self.mono_set_sleep + self.lockin_tc_sleep)
+        settled, elapsed, value = detector.wait(self.should_stop)
+        if settled:
+            logger.info('%s settled to %s in %.2f s' % (self.settle_reading, value, elapsed))
+        else:
+            logger.warning('%s did not settle after %.2f s. Last reading: %s' % (self.settle_reading, elapsed, value))
+
+    def apply_setpoints(self, params):
+        """ Set the monochromator OSF, grating and wavelength ahead of the next step.
+        """
+        if DEBUG:
+            return
+        logger.info('prefetching mono params: %s' % str(params))
+        if 'mono_osf' in params:
+            osf = params['mono_osf']
+            self.mono.osf = osf if osf == 'Auto' else int(osf)
+        if 'mono_grating' in params:
+            grating = params['mono_grating']
+            self.mono.grating = grating if grating == 'Auto' else int(grating)
+        if 'mono_wavelength' in params:
+            self.mono.wavelength = params['mono_wavelength']
 
     def startup(self):
         super().startup()
@@ -189,13 +315,25 @@ class SpectralCalProcedure(FpaTestProcedure):
                     str(self.mono_osf), str(self.mono_grating), str(self.mono_wavelength), str(self.mono_shutter)
                 )
             )
-            self.mono.osf = self.mono_osf if self.mono_osf == 'Auto' else int(self.mono_osf)
-            self.mono.grating = self.mono_grating if self.mono_grating == 'Auto' else int(self.mono_grating)
-            self.mono.wavelength = self.mono_wavelength
-            self.mono.shutter = self.mono_shutter_map_f[self.mono_shutter]
-
-            # - sleep after setting monochromator parameters -------- #
-            time.sleep(self.mono_set_sleep)
+            with self.hw_lock:
+                # - setpoints prefetched by a procedure sequence with the current values are not set again - #
+                staged = [self.is_staged(p) for p in ('mono_osf', 'mono_grating', 'mono_wavelength')]
+                if not staged[0]:
+                    self.mono.osf = self.mono_osf if self.mono_osf == 'Auto' else int(self.mono_osf)
+                if not staged[1]:
+                    self.mono.grating = self.mono_grating if self.mono_grating == 'Auto' else int(self.mono_grating)
+                if not staged[2]:
+                    self.mono.wavelength = self.mono_wavelength
+                self.mono.shutter = self.mono_shutter_map_f[self.mono_shutter]
+
+            # - wait for the signal to settle, or sleep after setting monochromator parameters less any time elapsed
+            # - since they were prefetched - #
+            if self.settle_reader is not None:
+                self.settle()
+            elif all(staged):
+                time.sleep(max(0, self.mono_set_sleep - (time.perf_counter() - self.staged_time)))
+            else:
+                time.sleep(self.mono_set_sleep)
 
             # - query received values ------- #
             shutter = self.mono.shutter
@@ -224,20 +362,31 @@ class SpectralCalProcedure(FpaTestProcedure):
             'ndf_position': None,
         }
         self.meta.update(meta_dict)
-        time.sleep(self.lockin_tc_sleep)
+        if self.settle_reader is None:
+            time.sleep(self.lockin_tc_sleep)
 
     def shutdown(self):
-        self.mono.shutter = 0
+        with self.hw_lock:
+            self.mono.shutter = 0
         super().shutdown()
 
 
 class LockinLogging(LoggingProcedure):
     """ Subclass of the logging procedure implemented to record timestamps to associate with lockin sampling.
+
+    In buffered mode the SR830 stores X and Y in its internal data buffer at the buffer sample rate. New samples are
+    read back in bulk every block period and emitted as a single block, timestamped from the buffer start time and the
+    sample rate. The one-shot buffer is restarted shortly before it fills, leaving a gap of a single transfer. The block
+    period is shortened if needed so that at least four blocks fit in the buffer at the actual sample rate, since the
+    buffer stops once full and any further samples would be lost.
     """
 
     detector = Parameter('Reference Detector ID', default='PDA20H')
     time_constant = FloatParameter('Time Constant', default=1)
     sensitivity = FloatParameter('Sensitivity', default=0.5)
+    buffered = BooleanParameter('Buffered Acquisition', default=False)
+    buffer_rate = FloatParameter('Buffer Sample Rate', units='hz', default=64)
+    block_period = FloatParameter('Block Period', units='s', default=0.5)
 
     def __init__(self, cfg, exp, data, meta, **kwargs):
         super(LockinLogging, self).__init__(cfg, exp, data, meta, **kwargs)
@@ -249,6 +398,9 @@ class LockinLogging(LoggingProcedure):
         super().startup()
 
     def execute(self):
+        if self.buffered:
+            self.execute_buffered()
+            return
         while not self.should_stop():
             ts = datetime.datetime.now()
             self.data_dict['timestamp'] = ts
@@ -258,3 +410,44 @@ class LockinLogging(LoggingProcedure):
                 self.data_dict[param] = val
             self.emit(self.record, self.data_dict, meta=self.meta_dict)
             time.sleep(1 / self.sample_rate)
+
+    def execute_buffered(self):
+        """ Acquire X and Y through the SR830 data buffer, emitting a block of samples every block period.
+        """
+        rate = self.lockin.start_buffered(self.buffer_rate)
+        logger.info('started lockin buffer at %s hz' % rate)
+        period = min(self.block_period, 0.25 * self.lockin.BUFFER_SIZE / rate)
+        if period < self.block_period:
+            logger.warning('block period reduced from %s s to %s s to fit the lockin buffer at %s hz' %
+                           (self.block_period, period, rate))
+        read = 0
+        try:
+            while not self.should_stop():
+                time.sleep(period)
+                points = self.lockin.buffer_points
+                if points > read:
+                    self.emit_block(read, points - read)
+                    read = points
+
+                # - restart the one-shot buffer before it fills within the next block period - #
+                if read + 2 * rate * period >= self.lockin.BUFFER_SIZE:
+                    points = self.lockin.buffer_points
+                    if points > read:
+                        self.emit_block(read, points - read)
+                    rate = self.lockin.start_buffered(self.buffer_rate)
+                    read = 0
+        finally:
+            self.lockin.stop_buffered()
+
+    def emit_block(self, start, count):
+        """ Read a block of samples from the lockin buffer and emit them with their reconstructed timestamps.
+        """
+        block = self.lockin.read_buffer(start, count)
+        ts = self.lockin.buffer_timestamps(start, count)
+        timestamps = datetime.datetime.fromtimestamp(ts[0]) + pd.to_timedelta(ts - ts[0], unit='s')
+        data = {
+            'timestamp': timestamps,
+            'x': block[:, 0],
+            'y': block[:, 1],
+        }
+        self.emit(self.record, data, meta=self.meta_dict)
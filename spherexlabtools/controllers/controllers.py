@@ -8,7 +8,9 @@ from PyQt5 import QtWidgets, QtCore
 from pyqtgraph.parametertree import Parameter, ParameterTree
 
 import spherexlabtools.log as slt_log
+import spherexlabtools.profiler as slt_profile
 from spherexlabtools.ui import SequenceUI
+from spherexlabtools.sequence import SequenceOptimizer
 from ..parameters import ParameterInspect
 from ..thread import StoppableReusableThread
 from ..parameters import Parameter as pymeasureParam
@@ -43,9 +45,10 @@ class Controller(QtWidgets.QWidget):
         :param: showTop: boolean to indicate if the top-level parameter should be shown.
         :param: **kwargs: Key-word arguments for tree.setParameters
         """
-        self.parameters.addChildren(params)
-        self.tree.setParameters(self.parameters, **kwargs)
-        self.layout.addWidget(self.tree)
+        with slt_profile.phase("parameter tree", self.name):
+            self.parameters.addChildren(params)
+            self.tree.setParameters(self.parameters, **kwargs)
+            self.layout.addWidget(self.tree)
 
     def start(self):
         """ Start the controller.
@@ -312,6 +315,7 @@ class ProcedureController(Controller):
 
         # configure the sequencer interface if the sequencer kwarg is true. #
         self.sequencer = None
+        self.sequence_optimizer = None
         if sequencer:
             proc_seq_cfg = {
                 "instance_name": "ProcedureSequence",
@@ -323,7 +327,10 @@ class ProcedureController(Controller):
             self.procedure_sequence.seq_ind = 0
             self.procedure_sequence_thread = StoppableReusableThread()
             self.procedure_sequence_thread_string = f"{self.name}: Procedure Sequence"
-            self.sequencer = SequenceUI(self.proc_params_tree)
+            if cfg.get("sequence_optimizer") is not None:
+                self.sequence_optimizer = SequenceOptimizer(**cfg["sequence_optimizer"])
+            with slt_profile.phase("sequencer", self.name):
+                self.sequencer = SequenceUI(self.proc_params_tree, optimize=self.sequence_optimizer is not None)
             params.append(self.sequencer)
 
         # generate records interface #
@@ -384,13 +391,17 @@ class ProcedureController(Controller):
         #logger.info("%s stopping procedure" % self.name)
         self.procedure.stop()
 
-    def start_procedure_sequence(self, seq_dict, sequence, sleep=2):
+    def start_procedure_sequence(self, seq_dict, sequence):
         """ Start a sequence of procedures with parameters built by the sequencer widget.
 
         :param seq_dict: Dictionary representation of the procedure sequence.
         :param sequence: List of procedure parameters.
-        :param sleep: Time in seconds to sleep between checking if the procedure sequence is complete.
         """
+        if self.sequence_optimizer is not None and self.sequencer.optimize_order.value():
+            sequence, report = self.sequence_optimizer.optimize(sequence)
+            logger.info("%s: optimized sequence of %i steps. Estimated transition time %.1f s. -> %.1f s., saving "
+                        "%.1f s." % (self.name, report["steps"], report["original"], report["optimized"],
+                                     report["saved"]))
         #logger.info("%s: Starting procedure sequence of length %i" % (self.name, len(sequence)))
         """
         if self.proc_seq_ind != 0:
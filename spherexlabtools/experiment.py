@@ -2,31 +2,49 @@
 
 Sam Condon, 01/27/2022
 """
+import time
 import logging
 import os.path
 import threading
 
 import pyqtgraph as pg
 from PyQt5 import QtWidgets, QtCore, QtGui
+from .bus import RecordBus, DROP_OLDEST
 from .loader import load_objects_from_cfg_list
 import spherexlabtools.log as slt_log
+import spherexlabtools.profiler as slt_profile
 import spherexlabtools.viewers as slt_view
 import spherexlabtools.procedures as slt_proc
 import spherexlabtools.recorders as slt_record
 import spherexlabtools.controllers as slt_control
+from spherexlabtools.sequence import SequenceOptimizer
 from spherexlabtools.instruments import InstrumentSuite
 from spherexlabtools.ui import TopUI, StackedHelper
 
 
-# - configure top gui and logging parameters - #
-app = pg.mkQApp("SPHERExLabTools")
-top_widget = QtWidgets.QWidget()
-top_ui = TopUI(top_widget)
-slt_log.LOGGER_GUI_SIGNAL = top_ui.ui_log_signal
-slt_log.configure_slt_log()
+# - top gui, created on the first call to init_gui() - #
+app = None
+top_widget = None
+top_ui = None
 logger = logging.getLogger(slt_log.LOGGER_NAME)
 
 
+def init_gui():
+    """ Create the Qt application and the top gui, and configure logging to the gui log window. Only the first call
+    has an effect.
+
+    :return: The Qt application.
+    """
+    global app, top_widget, top_ui
+    if app is None:
+        app = pg.mkQApp("SPHERExLabTools")
+        top_widget = QtWidgets.QWidget()
+        top_ui = TopUI(top_widget)
+        slt_log.LOGGER_GUI_SIGNAL = top_ui.ui_log_signal
+        slt_log.configure_slt_log()
+    return app
+
+
 class Experiment:
     """ The core class of the spherexlabtools package. The basic operating principle of spherexlabtools
         is implemented by this class. Namely, that every action that is performed in an experiment, be
@@ -35,10 +53,12 @@ class Experiment:
         it needs to operate. All gui windows are run in the main thread.
     """
 
-    def __init__(self, exp_pkg):
+    def __init__(self, exp_pkg, headless=False, startup_profile=None):
         """ Initialize an experiment. This init function performs the following tasks:
                 - imports the hw.py module and instantiates an :class:`.InstrumentSuite`
-                  instance using the INSTRUMENT_SUITE name found within.
+                  instance using the INSTRUMENT_SUITE name found within. The optional
+                  INSTRUMENT_WORKERS and LAZY_INSTRUMENTS names set the max_workers and
+                  lazy arguments of the suite.
 
                 - imports the measure.py module and creates a set of recorders using the
                   RECORDERS name found within.
@@ -46,20 +66,63 @@ class Experiment:
                 - imports the view.py module and creates a set of viewers using the VIEWERS
                   name found within.
 
+                - imports the control.py module and creates a set of controllers using the
+                  CONTROLLERS name found within. Controllers are gui widgets, and are not
+                  created in headless experiments.
+
+            Procedures publish their records to the :class:`.RecordBus` in the bus attribute. Viewers and recorders
+            whose configuration has a "subscribe" key read their records from a bounded subscription to the bus.
+
         :param: exp_pkg: Python package containing the experiment configuration modules.
+        :param: headless: Boolean to indicate if the experiment should run without the Qt application and gui. Headless
+                          experiments are run through :meth:`Experiment.run_procedure`.
+        :param: startup_profile: Optional path of a JSON file to write the startup profile to. Defaults to the
+                                 STARTUP_PROFILE name of the configuration package, if present. The wall time of each
+                                 phase of initialization is always logged, and kept in the startup_profile attribute.
         """
         self.exp_pkg = exp_pkg
-        self.layout = QtWidgets.QGridLayout()
+        self.headless = headless
         self.active_threads = {}
+        self.bus = RecordBus()
 
-        logger.info("Initializing experiment: %s" % exp_pkg.__name__)
-
+        # - the profiler is stopped even if initialization fails, so that no later phase is recorded into it - #
+        profiler = slt_profile.start(exp_pkg.__name__)
+        try:
+            self._load(exp_pkg, headless, profiler)
+        finally:
+            self.startup_profile = slt_profile.stop()
+
+        # - report the startup profile, and write it out if a path is configured - #
+        logger.info(self.startup_profile.report(limit=20))
+        startup_profile = startup_profile if startup_profile is not None else getattr(exp_pkg, "STARTUP_PROFILE", None)
+        if startup_profile is not None:
+            self.startup_profile.write_json(startup_profile)
+            logger.info("Startup profile written to %s" % startup_profile)
+
+    def _load(self, exp_pkg, headless, profiler):
+        """ Create the gui, instruments, viewers, recorders, procedures and controllers of the experiment, recording the
+        time of each phase in the startup profiler.
+        """
         # - Top-level ui - #
-        self.slt_top_widget = top_widget
-        self.slt_top_ui = top_ui
-        self.viewer_stack = StackedHelper()
-        self.procedure_controller_stack = StackedHelper()
-        self.instrument_controller_stack = StackedHelper()
+        with slt_profile.phase("gui"):
+            if headless:
+                slt_log.configure_slt_log()
+                self.layout = None
+                self.slt_top_widget = None
+                self.slt_top_ui = None
+                self.viewer_stack = None
+                self.procedure_controller_stack = None
+                self.instrument_controller_stack = None
+            else:
+                init_gui()
+                self.layout = QtWidgets.QGridLayout()
+                self.slt_top_widget = top_widget
+                self.slt_top_ui = top_ui
+                self.viewer_stack = StackedHelper()
+                self.procedure_controller_stack = StackedHelper()
+                self.instrument_controller_stack = StackedHelper()
+
+        logger.info("Initializing experiment: %s" % exp_pkg.__name__)
 
         # initialize instrument-suite #############################################
         self.dev_links = {}
@@ -73,7 +136,12 @@ class Experiment:
                     dl1 = "ASRL" + dl1
                     dl1 += "::INSTR"
                     self.dev_links[dl0] = dl1
-        self.hw = InstrumentSuite(exp_pkg.INSTRUMENT_SUITE, exp_pkg, dev_links=self.dev_links)
+        with slt_profile.phase("instruments"):
+            self.hw = InstrumentSuite(exp_pkg.INSTRUMENT_SUITE, exp_pkg, dev_links=self.dev_links,
+                                      max_workers=getattr(exp_pkg, "INSTRUMENT_WORKERS", 8),
+                                      lazy=getattr(exp_pkg, "LAZY_INSTRUMENTS", False))
+        for key, t in self.hw.startup_times.items():
+            profiler.record("instruments", key, t, depth=1)
 
         # initialize viewers ######################################################
         viewer_cfgs = exp_pkg.VIEWERS
@@ -81,7 +149,9 @@ class Experiment:
             search_order = [exp_pkg.viewers, slt_view]
         except AttributeError:
             search_order = [slt_view]
-        self.viewers = load_objects_from_cfg_list(search_order, self, viewer_cfgs)
+        with slt_profile.phase("viewers"):
+            self.viewers = load_objects_from_cfg_list(search_order, self, viewer_cfgs, component="viewers")
+        self._subscribe_components(self.viewers, viewer_cfgs)
 
         # initialize recorders ####################################################
         rec_cfgs = exp_pkg.RECORDERS
@@ -89,7 +159,9 @@ class Experiment:
             search_order = [exp_pkg.recorders, slt_record]
         except AttributeError:
             search_order = [slt_record]
-        self.recorders = load_objects_from_cfg_list(search_order, self, rec_cfgs)
+        with slt_profile.phase("recorders"):
+            self.recorders = load_objects_from_cfg_list(search_order, self, rec_cfgs, component="recorders")
+        self._subscribe_components(self.recorders, rec_cfgs)
 
         # initialize procedures ###################################################
         proc_cfgs = exp_pkg.PROCEDURES
@@ -103,23 +175,47 @@ class Experiment:
             search_order = [exp_pkg.procedures, slt_proc]
         except AttributeError:
             search_order = [slt_proc]
-        self.procedures = load_objects_from_cfg_list(search_order, self, proc_cfgs, hw=self.hw,
-                                                     viewers=self.viewers, recorders=self.recorders)
+        with slt_profile.phase("procedures"):
+            self.procedures = load_objects_from_cfg_list(search_order, self, proc_cfgs, component="procedures",
+                                                         hw=self.hw, viewers=self.viewers, recorders=self.recorders)
 
         # initialize controllers ##################################################
-        control_cfgs = exp_pkg.CONTROLLERS
-        try:
-            search_order = [exp_pkg.controllers, slt_control]
-        except AttributeError:
-            search_order = [slt_control]
-        self.controllers = load_objects_from_cfg_list(search_order, self, control_cfgs, hw=self.hw,
-                                                      procs=self.procedures)
+        if headless:
+            self.controllers = {}
+        else:
+            control_cfgs = exp_pkg.CONTROLLERS
+            try:
+                search_order = [exp_pkg.controllers, slt_control]
+            except AttributeError:
+                search_order = [slt_control]
+            with slt_profile.phase("controllers"):
+                self.controllers = load_objects_from_cfg_list(search_order, self, control_cfgs,
+                                                              component="controllers", hw=self.hw,
+                                                              procs=self.procedures)
         logger.info("Experiment initialization complete.")
 
+    def _subscribe_components(self, components, cfgs):
+        """ Replace the queues of the viewers or recorders configured with a "subscribe" key by subscriptions to the
+        record bus. The subscription also receives the records of the procedure records the component is configured
+        for, so that every record it reads is subject to the size and overflow policy of the subscription.
+
+        :param components: Dictionary of viewer or recorder objects.
+        :param cfgs: List of the configurations of the components.
+        """
+        for cfg in cfgs:
+            if "subscribe" not in cfg.keys():
+                continue
+            name = cfg["instance_name"]
+            components[name].queue = self.bus.subscribe(cfg["subscribe"], maxsize=cfg.get("queue_size", 1000),
+                                                        overflow=cfg.get("overflow", DROP_OLDEST),
+                                                        block_timeout=cfg.get("block_timeout", None), name=name)
+
     def start(self):
-        """ Start the top-level interface that includes all viewers, controllers, procedures, etc.
+        """ Start the top-level interface that includes all viewers, controllers, procedures, etc. Headless
+        experiments only start the viewers and recorders.
         """
-        self._init_ui()
+        if not self.headless:
+            self._init_ui()
         # - start all controllers, viewers, and recorders - #
         for c in self.controllers.values():
             c.start()
@@ -127,7 +223,8 @@ class Experiment:
             v.start()
         for r in self.recorders.values():
             r.start()
-        self.slt_top_widget.show()
+        if not self.headless:
+            self.slt_top_widget.show()
 
     def stop(self):
         """ Stop the top-level interface.
@@ -139,7 +236,8 @@ class Experiment:
             v.stop()
         for r in self.recorders.values():
             r.stop()
-        self.slt_top_widget.close()
+        if not self.headless:
+            self.slt_top_widget.close()
 
     def _init_ui(self):
         """ Initialize the top-level interface after start_top_ui() has been called.
@@ -169,6 +267,10 @@ class Experiment:
         for name, viewer in self.viewers.items():
             widget = viewer.widget(name=name)
             viewer.update.connect(widget.update)
+            if hasattr(widget, 'display_shape_changed') and hasattr(viewer, 'set_display_shape'):
+                widget.display_shape_changed.connect(viewer.set_display_shape)
+            if hasattr(widget, 'view_changed') and hasattr(viewer, 'set_view_range'):
+                widget.view_changed.connect(viewer.set_view_range)
             viewers[i] = widget
             i += 1
         if len(viewers) > 0:
@@ -221,15 +323,132 @@ class Experiment:
         logger.info("Killing recorder: %s" % rec_key)
         self.stop_thread(rec_key)
 
-    def start_procedure(self, proc_key, **kwargs):
+    def start_procedure(self, proc_key, params=None):
         """ Start a procedure thread.
+
+        :param proc_key: Name of the procedure.
+        :param params: Optional dictionary of the form {'parameter name': value} to set before the procedure is
+                       started. Parameters are named as in the procedure controller, or by their attribute names.
         """
-        pass
+        logger.info("Starting procedure: %s" % proc_key)
+        procedure = self.procedures[proc_key]
+        self.set_procedure_parameters(procedure, params)
+        self.start_thread(proc_key, procedure)
+        return procedure
 
     def stop_procedure(self, proc_key):
         """ Kill a procedure thread.
         """
-        pass
+        logger.info("Killing procedure: %s" % proc_key)
+        self.stop_thread(proc_key)
+
+    def start_procedure_sequence(self, proc_key, sequence, params=None, optimize=False):
+        """ Start a sequence of procedures in a :class:`.ProcedureSequence` thread.
+
+        :param proc_key: Name of the procedure.
+        :param sequence: Sequence of dictionaries of procedure parameters, e.g. from
+                         :func:`spherexlabtools.sequence.read_sequence_file`.
+        :param params: Optional dictionary of parameters to set before the sequence is started, as for
+                       :meth:`Experiment.start_procedure`.
+        :param optimize: Boolean to indicate if the order of the sequence should be optimized with the
+                         'sequence_optimizer' configuration of the procedure controller.
+        :return: The :class:`.ProcedureSequence` object.
+        """
+        procedure = self.procedures[proc_key]
+        self.set_procedure_parameters(procedure, params)
+        if optimize:
+            optimizer = self.get_sequence_optimizer(proc_key)
+            if optimizer is None:
+                logger.warning("No sequence optimizer is configured for procedure: %s" % proc_key)
+            else:
+                sequence, report = optimizer.optimize(sequence)
+                logger.info("%s: optimized sequence of %i steps. Estimated transition time %.1f s. -> %.1f s., "
+                            "saving %.1f s." % (proc_key, report["steps"], report["original"], report["optimized"],
+                                                report["saved"]))
+        proc_seq_cfg = {
+            "instance_name": "ProcedureSequence",
+            "type": "ProcedureSequence",
+            "hw": None,
+            "records": {}
+        }
+        proc_seq = slt_proc.ProcedureSequence(proc_seq_cfg, self, procedure)
+        proc_seq.param_list = sequence
+        logger.info("Starting procedure sequence of %s with %i steps" % (proc_key, len(sequence)))
+        self.start_thread(f"{proc_key}: Procedure Sequence", proc_seq)
+        return proc_seq
+
+    def run_procedure(self, proc_key, params=None, sequence=None, optimize=False, timeout=None):
+        """ Run a procedure, or a sequence of procedures, and block until it completes. The procedure is stopped if it
+        does not complete within the timeout.
+
+        :param proc_key: Name of the procedure.
+        :param params: Optional dictionary of procedure parameters, as for :meth:`Experiment.start_procedure`.
+        :param sequence: Optional sequence of procedure parameters, as for :meth:`Experiment.start_procedure_sequence`.
+        :param optimize: Same as for :meth:`Experiment.start_procedure_sequence`.
+        :param timeout: Optional timeout in seconds.
+        :return: Final status of the procedure. One of the Procedure.FINISHED, FAILED or ABORTED values. A sequence
+                 has the status FINISHED only if every step finished.
+        """
+        procedure = self.procedures[proc_key]
+        if sequence is None:
+            thread_key = proc_key
+            thread = self.start_procedure(proc_key, params=params)
+        else:
+            thread_key = f"{proc_key}: Procedure Sequence"
+            thread = self.start_procedure_sequence(proc_key, sequence, params=params, optimize=optimize)
+        thread.wait(timeout)
+        timed_out = thread.thread.is_alive()
+        if timed_out:
+            logger.warning("%s did not complete within %.1f s. Stopping." % (thread_key, timeout))
+            self.stop_thread(thread_key)
+            thread.wait()
+
+        # - a sequence that stops early leaves its index at the step that did not finish - #
+        status = thread.status
+        if sequence is not None and len(sequence) > 0 and status == slt_proc.Procedure.FINISHED and \
+                (thread.seq_ind != 0 or procedure.status != slt_proc.Procedure.FINISHED):
+            status = procedure.status
+        if timed_out or status not in (slt_proc.Procedure.FINISHED, slt_proc.Procedure.FAILED):
+            status = slt_proc.Procedure.ABORTED
+
+        # - release the completed threads and any persistent worker of the procedure - #
+        for key in [thread_key, f"{thread.name}: {procedure.name}"]:
+            t = self.active_threads.pop(key, None)
+            if t is not None:
+                t.close_worker()
+        return status
+
+    def set_procedure_parameters(self, procedure, params):
+        """ Set procedure parameters from a dictionary of the form {'parameter name': value}.
+        """
+        if params is None:
+            return
+        for key, value in params.items():
+            setattr(procedure, procedure.parameter_map.get(key, key), value)
+
+    def get_sequence_optimizer(self, proc_key):
+        """ Return a :class:`.SequenceOptimizer` from the 'sequence_optimizer' configuration of the procedure
+        controller of a procedure, or None if none is configured.
+        """
+        for cfg in self.exp_pkg.CONTROLLERS:
+            if cfg.get("procedure") == proc_key and cfg.get("sequence_optimizer") is not None:
+                return SequenceOptimizer(**cfg["sequence_optimizer"])
+        return None
+
+    def wait_for_queues(self, timeout=None):
+        """ Block until every record placed on the viewer and recorder queues has been handled, including the records
+        sent to recorder processes.
+
+        :param timeout: Optional timeout in seconds.
+        :return: Boolean indicating if the queues were emptied before the timeout.
+        """
+        t0 = time.perf_counter()
+        queues = [v.queue for v in self.viewers.values()] + [r.queue for r in self.recorders.values()]
+        while any(q.unfinished_tasks > 0 for q in queues) or any(r.pending() > 0 for r in self.recorders.values()):
+            if timeout is not None and time.perf_counter() - t0 > timeout:
+                return False
+            time.sleep(0.01)
+        return True
 
     def start_controller(self, cntrl_key):
         """ Start a controller thread.
@@ -288,15 +507,19 @@ class Experiment:
         return lambda key=thread_key, t=thread: self.start_thread(key, t)
 
     def kill_threads(self):
-        """ Call the :meth:`StoppableReusableThread.stop` method on each thread in the active threads dictionary.
+        """ Call the :meth:`StoppableReusableThread.stop` method on each thread in the active threads dictionary, and
+        close any persistent worker threads.
         """
         for t in self.active_threads.values():
             t.stop()
+            t.close_worker()
 
 
-def create_experiment(exp_pkg):
+def create_experiment(exp_pkg, headless=False, startup_profile=None):
     """ Instantiate and return an Experiment object.
     :param: exp_pkg: Python package containing the experiment configuration files.
+    :param: headless: Boolean to indicate if the experiment should run without the gui.
+    :param: startup_profile: Optional path of a JSON file to write the startup profile to.
     """
-    return Experiment(exp_pkg)
+    return Experiment(exp_pkg, headless=headless, startup_profile=startup_profile)
 
@@ -1,7 +1,13 @@
 # spherexlabtools.instruments #
+import importlib
+
 from .instrument import CompoundInstrument, InstrumentSuite
-#from . import edmund
-#from . import flir
-#from . import newport
-from . import bluefors
-from . import lakeshore
+
+# - driver subpackages are imported on first access, so that an experiment only loads the drivers it uses - #
+DRIVER_PACKAGES = ["anaheimautomation", "bluefors", "edmund", "flir", "lakeshore", "newport", "srs"]
+
+
+def __getattr__(name):
+    if name in DRIVER_PACKAGES:
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module %s has no attribute %s" % (__name__, name))
@@ -5,20 +5,32 @@
 """
 
 import os
-import clr
 import sys
 import logging
+import importlib
 import numpy as np
 from pymeasure.instruments import Instrument
 from pymeasure.instruments.validators import strict_discrete_range
-sys.path.append(os.path.join(os.environ["SPHEREXLABTOOLS"], "spherexlabtools", "instruments", "edmund", "NDFWheel_DLLs"))
-clr.AddReference("OptecHID_FilterWheelAPI")
-from OptecHID_FilterWheelAPI import FilterWheels
-from OptecHID_FilterWheelAPI import FilterWheel
 
 
 logger = logging.getLogger(__name__)
 
+# - filter wheel .NET API, loaded by load_filter_wheel_api() when a filter wheel is first instantiated - #
+FilterWheelAPI = None
+
+
+def load_filter_wheel_api():
+    """ Load the OptecHID_FilterWheelAPI .NET assembly through pythonnet on the first call, and return the API module.
+    """
+    global FilterWheelAPI
+    if FilterWheelAPI is None:
+        clr = importlib.import_module("clr")
+        sys.path.append(os.path.join(os.environ["SPHEREXLABTOOLS"], "spherexlabtools", "instruments", "edmund",
+                                     "NDFWheel_DLLs"))
+        clr.AddReference("OptecHID_FilterWheelAPI")
+        FilterWheelAPI = importlib.import_module("OptecHID_FilterWheelAPI")
+    return FilterWheelAPI
+
 
 class NDF(Instrument):
     """ Represents an Edmund Optics high speed filter wheel device.
@@ -30,7 +42,7 @@ class NDF(Instrument):
 
     def __init__(self, rec_name=None):
 
-        self.HSFW = FilterWheels().FilterWheelList[0]
+        self.HSFW = load_filter_wheel_api().FilterWheels().FilterWheelList[0]
         self.home()
 
     @property
@@ -1,18 +1,126 @@
+import math
 import time
 
-import PySpin
 import logging
+import importlib
 from pymeasure.instruments import Instrument
 from pymeasure.instruments.validators import strict_discrete_set
 
 logger = logging.getLogger(__name__)
 
+# - the Spinnaker SDK is imported by get_pyspin() when a camera is first used, not on module import - #
+PySpin = None
+
+
+def get_pyspin():
+    """ Return the PySpin module, importing it on the first call.
+    """
+    global PySpin
+    if PySpin is None:
+        PySpin = importlib.import_module("PySpin")
+    return PySpin
+
 
 class FlirInstrument:
     """ Subclass of the pymeasure Instrument object that overrides the property factories
         for property getting/setting specific to the Flir Spinnaker API.
+
+        Node handles are resolved from the camera nodemap once and cached on the instance, so repeated property
+        access does not call GetNode() and re-wrap the node pointer every time.
     """
 
+    # - names of the PySpin node pointer classes for each node type - #
+    NODECLASS_DICT = {
+        "enum": "CEnumerationPtr",
+        "cmd": "CCommandPtr",
+        "float": "CFloatPtr",
+        "bool": "CBooleanPtr",
+        "int": "CIntegerPtr",
+        "str": "CStringPtr"
+    }
+
+    # - order in which apply_config() writes properties. Auto modes and enable flags are written first so that the
+    # - nodes they lock become writable, then the image format, then the values. Unlisted properties go last. - #
+    config_order = []
+
+    # - relative tolerance used by apply_config() when comparing float node values - #
+    float_rel_tol = 1e-6
+
+    def get_node(self, node_name, node_type):
+        """ Return the cached node pointer for a node in the camera nodemap, resolving it on first access.
+
+        :param node_name: Name of the node in the nodemap.
+        :param node_type: One of the keys of :attr:`FlirInstrument.NODECLASS_DICT`.
+        """
+        try:
+            nodes = self._nodes
+        except AttributeError:
+            nodes = self._nodes = {}
+        node = nodes.get(node_name)
+        if node is None:
+            node_class = getattr(get_pyspin(), self.NODECLASS_DICT[node_type])
+            node = node_class(self.nodemap.GetNode(node_name))
+            nodes[node_name] = node
+        return node
+
+    def clear_node_cache(self):
+        """ Drop all cached node pointers. Must be called whenever the camera is de-initialized.
+        """
+        self._nodes = {}
+
+    def apply_config(self, config):
+        """ Write a dictionary of property values to the camera. Properties are written in the order given by
+        :attr:`FlirInstrument.config_order` and values that are already current on the camera are skipped.
+
+        :param config: Dictionary of the form {'property name': value}. Keys that are not node properties are set
+                       with setattr().
+        :return: List of the property names that were written.
+        """
+        order = {name: i for i, name in enumerate(self.config_order)}
+        keys = sorted(config.keys(), key=lambda k: order.get(k, len(order)))
+        written = []
+        for key in keys:
+            value = config[key]
+            prop = getattr(type(self), key, None)
+            if isinstance(prop, property) and getattr(prop.fget, "node_type", None) is not None:
+                try:
+                    current = prop.fget(self)
+                except get_pyspin().SpinnakerException:
+                    current = None
+                if self._node_value_equal(prop.fget.node_type, current, value):
+                    continue
+            setattr(self, key, value)
+            written.append(key)
+        logger.debug("apply_config wrote %s of %s properties" % (len(written), len(keys)))
+        return written
+
+    _bool_strings = {"true": True, "1": True, "on": True, "yes": True,
+                     "false": False, "0": False, "off": False, "no": False}
+
+    def _node_value_equal(self, node_type, current, value):
+        """ Compare a node value read from the camera against a requested value.
+        """
+        if current is None:
+            return False
+        if node_type == "float":
+            try:
+                return math.isclose(float(current), float(value), rel_tol=self.float_rel_tol)
+            except (TypeError, ValueError):
+                return False
+        if node_type == "bool":
+            # - bool() of any non-empty string is True, so strings are parsed explicitly - #
+            if isinstance(value, str):
+                value = self._bool_strings.get(value.strip().lower())
+            elif not isinstance(value, (bool, int)):
+                value = None
+            return value is not None and bool(value) == bool(current)
+        if node_type == "int":
+            try:
+                return int(value) == current
+            except (TypeError, ValueError):
+                return False
+        return str(current) == str(value)
+
     @staticmethod
     def control(node_name, node_type, docs,
                 validator=lambda v, vs: v, values=(), map_values=False,
@@ -36,18 +144,9 @@ class FlirInstrument:
         :param: set_process: A function that takes a value and allows processing
                             before value mapping, returning the processed value
         """
-        nodeclass_dict = {
-            "enum": PySpin.CEnumerationPtr,
-            "cmd": PySpin.CCommandPtr,
-            "float": PySpin.CFloatPtr,
-            "bool": PySpin.CBooleanPtr,
-            "int": PySpin.CIntegerPtr,
-            "str": PySpin.CStringPtr
-        }
-
         def fget(self):
             # get the node value with special handling for enum nodes. 
-            node = nodeclass_dict[node_type](self.nodemap.GetNode(node_name))
+            node = self.get_node(node_name, node_type)
             if node_type == "enum":
                 val = node.GetCurrentEntry().GetSymbolic()
             else:
@@ -57,7 +156,7 @@ class FlirInstrument:
         def fset(self, val):
             value = set_process(validator(val, values))
             # set the node value with special handling for enum nodes.
-            node = nodeclass_dict[node_type](self.nodemap.GetNode(node_name))
+            node = self.get_node(node_name, node_type)
             if node_type == "enum":
                 entry = node.GetEntryByName(value).GetValue()
                 node.SetIntValue(entry)
@@ -65,14 +164,23 @@ class FlirInstrument:
                 node.SetValue(value)
 
         fget.__doc__ = docs
+        fget.node_type = node_type
 
         return property(fget, fset)
 
 
-class Flea3:
-    # class level initialization #
-    system = PySpin.System.GetInstance()
-    cam_list = system.GetCameras()
+class Flea3(FlirInstrument):
+    # - Spinnaker system and camera list, initialized by get_cameras() when a camera is first instantiated - #
+    system = None
+    cam_list = None
+
+    config_order = [
+        "gain_auto", "exposure_auto", "acquisition_frame_rate_auto", "acquisition_frame_rate_en",
+        "blacklevel_en", "gamma_en", "sharpness_en", "hue_en", "sat_en", "exposure_mode", "acquisition_mode",
+        "pixel_format", "offset_x", "offset_y", "exposure_width", "exposure_height",
+        "gain", "blacklevel", "gamma", "sharpness", "acquisition_frame_rate", "exposure_time",
+        "acquisition_frame_count",
+    ]
 
     # Analog Control properties #
     gain = FlirInstrument.control("Gain", "float", "This float property represents the camera gain.")
@@ -134,17 +242,33 @@ class Flea3:
                                                                  "values: ['Mono8', 'Mono12Packed', 'Mono16']",
                                           values=["Mono8", "Mono16", "Mono12Packed"])
 
+    @classmethod
+    def get_cameras(cls):
+        """ Return the list of cameras detected by the Spinnaker system, initializing the system on the first call.
+        """
+        if cls.system is None:
+            cls.system = get_pyspin().System.GetInstance()
+            cls.cam_list = cls.system.GetCameras()
+        return cls.cam_list
+
     def __init__(self, resource):
         """ Initialize the interface to the camera object provided.
-        :param: resource: PySpin Camera object.
+        :param: resource: PySpin Camera object, integer index of the camera in the camera list, or string serial
+                          number of the camera.
         """
-        # initialize camera # 
+        if type(resource) is int:
+            resource = self.get_cameras()[resource]
+        elif type(resource) is str:
+            resource = self.get_cameras().GetBySerial(resource)
+
+        # initialize camera #
         self.cam = resource
         self.cam.Init()
 
         # get nodemaps #
         self.nodemap_tldevice = resource.GetTLDeviceNodeMap()
         self.nodemap = self.cam.GetNodeMap()
+        self.clear_node_cache()
 
         # stream active flag #
         self._stream_active = False
@@ -226,7 +350,11 @@ class Flea3:
 
     def shutdown(self):
         """ Releases communication with camera, bringing it to a safe and stable state."""
+        self.clear_node_cache()
         self.cam.DeInit()
         del self.cam
-        self.cam_list.Clear()
-        self.system.ReleaseInstance()
+        if Flea3.system is not None:
+            Flea3.cam_list.Clear()
+            Flea3.system.ReleaseInstance()
+            Flea3.system = None
+            Flea3.cam_list = None
@@ -1,9 +1,14 @@
 """instrument:
 
-    This module contains the classes :class:`.CompoundInstrument` and :class:`.InstrumentSuite`
+    This module contains the classes :class:`.CompoundInstrument`, :class:`.LazyInstrument` and
+    :class:`.InstrumentSuite`
 """
+import time
 import logging
 import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import spherexlabtools.log as slt_log
 
 log_name = f"{slt_log.LOGGER_NAME}.{__name__.split('.')[-1]}"
@@ -61,8 +66,12 @@ def instantiate_instrument(inst_dict, exp, dev_links=None, **instance_kwargs):
 
     # set initial instrument parameters if any are given #
     if "params" in inst_dict:
-        for param, param_val in inst_dict["params"].items():
-            setattr(inst, param, param_val)
+        # - instruments that implement a bulk apply_config() write their parameters in one ordered pass - #
+        if callable(getattr(inst, "apply_config", None)):
+            inst.apply_config(inst_dict["params"])
+        else:
+            for param, param_val in inst_dict["params"].items():
+                setattr(inst, param, param_val)
         logger.info(slt_log.CMPLT_MSG % f"{inst_dict['instance_name']} initialization")
 
     # - set the instrument name - #
@@ -121,30 +130,197 @@ class CompoundInstrument:
         object.__setattr__(inst, attr, value)
 
 
+class LazyInstrument:
+    """ Proxy for an instrument that is only instantiated, and connected, on the first access to one of its
+    attributes. Attribute access and assignment are then forwarded to the instrument.
+    """
+
+    def __init__(self, name, factory):
+        """ Initialize a lazy instrument.
+
+        :param name: Instance name of the instrument.
+        :param factory: Callable with no arguments that instantiates and returns the instrument.
+        """
+        object.__setattr__(self, "_lazy_name", name)
+        object.__setattr__(self, "_lazy_factory", factory)
+        object.__setattr__(self, "_lazy_instance", None)
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+
+    def _lazy_connect(self):
+        """ Instantiate the instrument if this has not already been done, and return it.
+        """
+        inst = object.__getattribute__(self, "_lazy_instance")
+        if inst is None:
+            with object.__getattribute__(self, "_lazy_lock"):
+                inst = object.__getattribute__(self, "_lazy_instance")
+                if inst is None:
+                    logger.info("Connecting lazy instrument %s on first access" %
+                                object.__getattribute__(self, "_lazy_name"))
+                    inst = object.__getattribute__(self, "_lazy_factory")()
+                    object.__setattr__(self, "_lazy_instance", inst)
+        return inst
+
+    def __getattr__(self, name):
+        return getattr(self._lazy_connect(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._lazy_connect(), name, value)
+
+    def __dir__(self):
+        return dir(self._lazy_connect())
+
+    def __repr__(self):
+        inst = object.__getattribute__(self, "_lazy_instance")
+        if inst is None:
+            return "<LazyInstrument(%s, not connected)>" % object.__getattribute__(self, "_lazy_name")
+        return repr(inst)
+
+
 class InstrumentSuite:
     """ Top-level instrument object to encapsulate all instruments within an experiment.
+
+    Instruments are instantiated concurrently on up to max_workers threads. Instruments that share a resource name,
+    e.g. several controllers on one serial bus, are instantiated one after another in the order they are configured,
+    together with their initial params. The sub-instruments of compound instruments are instantiated before the
+    compound instrument itself.
+
+    Instruments configured with "lazy": True, or every instrument if lazy is set, are instead wrapped in a
+    :class:`.LazyInstrument` and only instantiated on the first access to one of their attributes.
+
+    The time to instantiate each instrument is kept in the startup_times dictionary and logged once the suite is
+    initialized, or when a lazy instrument connects.
     """
 
-    def __init__(self, inst_cfg, exp, dev_links=None):
+    def __init__(self, inst_cfg, exp, dev_links=None, max_workers=8, lazy=False):
+        """ Initialize the instrument suite.
+
+        :param inst_cfg: List of instrument configuration dictionaries.
+        :param exp: Experiment configuration package.
+        :param dev_links: Optional dictionary mapping resource names to device link resource names.
+        :param max_workers: Maximum number of instruments instantiated concurrently. 1 instantiates every instrument
+                            in sequence.
+        :param lazy: Boolean to indicate if every instrument should be instantiated on first access.
+        """
+        self.startup_times = {}
+        self._exp = exp
+        self._dev_links = dev_links
+        self._max_workers = max(1, int(max_workers))
+        self._timing_lock = threading.Lock()
+
+        t0 = time.perf_counter()
+        eager = []
         for inst in inst_cfg:
-            # - normal instrument - #
+            if lazy or inst.get("lazy", False):
+                self.__dict__[inst["instance_name"]] = LazyInstrument(inst["instance_name"],
+                                                                      lambda cfg=inst: self._build(cfg))
+            else:
+                self.__dict__[inst["instance_name"]] = None
+                eager.append(inst)
+
+        # - instantiate every normal instrument and sub-instrument, then the compound instruments - #
+        leaves = []
+        for inst in eager:
+            if "sub_instruments" not in inst:
+                leaves.append((inst, inst["instance_name"]))
+            else:
+                leaves.extend((cfg, "%s.%s" % (inst["instance_name"], cfg["instance_name"]))
+                              for cfg in inst["sub_instruments"])
+        built = dict(zip([key for _, key in leaves], self._run_grouped(
+            [(cfg, lambda c=cfg, k=key: self._instantiate(c, k)) for cfg, key in leaves])))
+
+        compounds = []
+        for inst in eager:
             if "sub_instruments" not in inst:
-                self.__dict__[inst["instance_name"]] = instantiate_instrument(inst, exp, dev_links=dev_links)
-
-            # - compound instrument with a defined class - #
-            elif "manufacturer" in inst and "instrument" in inst:
-                instruments = {
-                    cfg["instance_name"]: instantiate_instrument(cfg, exp, dev_links=dev_links) for
-                    cfg in inst["sub_instruments"]
-                }
-                self.__dict__[inst["instance_name"]] = instantiate_instrument(inst, exp, dev_links=dev_links,
-                                                                              instruments=instruments)
-            # - compound instrument w/ no defined class - #
+                self.__dict__[inst["instance_name"]] = built[inst["instance_name"]]
             else:
-                instruments = {
-                    cfg["instance_name"]: instantiate_instrument(cfg, exp, dev_links=dev_links) for
-                    cfg in inst["sub_instruments"]
-                }
-                self.__dict__[inst["instance_name"]] = CompoundInstrument(inst["resource_name"],
-                                                                          name=inst["instance_name"],
-                                                                          instruments=instruments)
+                instruments = {cfg["instance_name"]: built["%s.%s" % (inst["instance_name"], cfg["instance_name"])]
+                               for cfg in inst["sub_instruments"]}
+                compounds.append((inst, instruments))
+        compound_insts = self._run_grouped([(inst, lambda i=inst, s=subs: self._compound(i, s))
+                                            for inst, subs in compounds])
+        for (inst, _), compound in zip(compounds, compound_insts):
+            self.__dict__[inst["instance_name"]] = compound
+
+        if len(self.startup_times) > 0:
+            self._log_startup_times(time.perf_counter() - t0)
+
+    def _build(self, inst):
+        """ Instantiate a normal or compound instrument, and its sub-instruments, in sequence. Used to connect lazy
+        instruments.
+        """
+        t0 = time.perf_counter()
+        if "sub_instruments" not in inst:
+            result = self._instantiate(inst, inst["instance_name"])
+        else:
+            instruments = {
+                cfg["instance_name"]: self._instantiate(cfg, "%s.%s" % (inst["instance_name"], cfg["instance_name"]))
+                for cfg in inst["sub_instruments"]
+            }
+            result = self._compound(inst, instruments)
+        logger.info("Lazy instrument %s connected in %.3f s." % (inst["instance_name"], time.perf_counter() - t0))
+        return result
+
+    def _compound(self, inst, instruments):
+        """ Instantiate a compound instrument from its instantiated sub-instruments.
+        """
+        # - compound instrument with a defined class - #
+        if "manufacturer" in inst and "instrument" in inst:
+            return self._instantiate(inst, inst["instance_name"], instruments=instruments)
+        # - compound instrument w/ no defined class - #
+        return CompoundInstrument(inst["resource_name"], name=inst["instance_name"], instruments=instruments)
+
+    def _instantiate(self, inst, key, **instance_kwargs):
+        """ Instantiate an instrument with :func:`.instantiate_instrument` and record the time taken under key in
+        startup_times.
+        """
+        t0 = time.perf_counter()
+        result = instantiate_instrument(inst, self._exp, dev_links=self._dev_links, **instance_kwargs)
+        with self._timing_lock:
+            self.startup_times[key] = time.perf_counter() - t0
+        return result
+
+    def _resource_key(self, inst):
+        """ Return the key used to group instruments by resource name, after applying the device links.
+        """
+        rec_name = inst.get("resource_name")
+        if rec_name is None or rec_name.__hash__ is None:
+            return id(inst)
+        if type(self._dev_links) is dict and rec_name in self._dev_links.keys():
+            rec_name = self._dev_links[rec_name]
+        return rec_name
+
+    def _run_grouped(self, tasks):
+        """ Run a list of (instrument config, callable) tasks. Tasks that share a resource run one after another in
+        the order given, and groups of tasks on different resources run concurrently.
+
+        :return: List of the task results in the order of the tasks.
+        """
+        groups = {}
+        for i, (inst, _) in enumerate(tasks):
+            groups.setdefault(self._resource_key(inst), []).append(i)
+        results = [None for _ in tasks]
+
+        def run_group(indices):
+            for i in indices:
+                results[i] = tasks[i][1]()
+
+        if self._max_workers == 1 or len(groups) < 2:
+            for indices in groups.values():
+                run_group(indices)
+            return results
+
+        with ThreadPoolExecutor(max_workers=min(self._max_workers, len(groups)),
+                                thread_name_prefix="InstrumentSuite") as pool:
+            group_futures = [pool.submit(run_group, indices) for indices in groups.values()]
+        for fut in group_futures:
+            fut.result()
+        return results
+
+    def _log_startup_times(self, elapsed):
+        """ Log the startup time of every instrument, slowest first.
+        """
+        total = sum(self.startup_times.values())
+        logger.info("Instrument suite initialized %i instruments in %.3f s. (%.3f s. of instrument startup)" %
+                    (len(self.startup_times), elapsed, total))
+        for key, t in sorted(self.startup_times.items(), key=lambda kv: -kv[1]):
+            logger.info("    %s: %.3f s." % (key, t))
@@ -0,0 +1 @@
+from .slt_sr830 import SLTSR830, SimulatedSR830
@@ -0,0 +1,163 @@
+""" This module implements the classes:
+
+    - :class:`.SLTSR830`: PyMeasure SR830 driver extended with hardware-buffered acquisition of X and Y.
+    - :class:`.SimulatedSR830`: Simulated SR830 with the same interface, for testing without hardware.
+
+In buffered acquisition the SR830 stores X and Y in its internal data buffer at a fixed sample rate. Samples are read
+back in bulk binary transfers and timestamped from the time the buffer was started and the sample rate, rather than
+from the host clock at the time of each read.
+"""
+import time
+import logging
+
+import numpy as np
+from pymeasure.instruments.srs import SR830
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class BufferedLockinMixin:
+    """ Buffered acquisition interface shared by the real and simulated SR830.
+    """
+
+    SAMPLE_FREQUENCIES = [62.5e-3 * 2 ** i for i in range(14)]
+    BUFFER_SIZE = 16383
+
+    buffer_rate = None
+    buffer_start_time = None
+
+    @classmethod
+    def nearest_sample_frequency(cls, rate):
+        """ Return the largest sample frequency of the SR830 not greater than rate.
+        """
+        valid = [f for f in cls.SAMPLE_FREQUENCIES if f <= rate]
+        return valid[-1] if len(valid) > 0 else cls.SAMPLE_FREQUENCIES[0]
+
+    def buffer_timestamps(self, start, count):
+        """ Return the host times in seconds since the epoch of buffer samples start to start + count.
+        """
+        return self.buffer_start_time + np.arange(start, start + count) / self.buffer_rate
+
+
+class SLTSR830(BufferedLockinMixin, SR830):
+    """ SR830 lockin amplifier with hardware-buffered acquisition of X and Y.
+    """
+
+    def start_buffered(self, rate):
+        """ Configure the display channels to X and Y, clear the data buffer and start storing samples in one-shot
+        mode.
+
+        :param rate: Requested sample rate in Hz. The largest supported rate not greater than this is used.
+        :return: The sample rate in Hz.
+        """
+        rate = self.nearest_sample_frequency(rate)
+        self.write("DDEF1,0,0")
+        self.write("DDEF2,0,0")
+        self.write("SRAT%d" % self.SAMPLE_FREQUENCIES.index(rate))
+        self.write("SEND0")
+        self.write("FAST0")
+        self.write("REST")
+        t0 = time.time()
+        self.write("STRT")
+        self.buffer_start_time = (t0 + time.time()) / 2
+        self.buffer_rate = rate
+        return rate
+
+    def stop_buffered(self):
+        """ Pause and clear the data buffer.
+        """
+        self.write("PAUS")
+        self.write("REST")
+
+    @property
+    def buffer_points(self):
+        """ Number of samples stored in the data buffer.
+        """
+        return int(self.ask("SPTS?").strip().split()[-1])
+
+    def read_buffer(self, start, count):
+        """ Read samples from the data buffer.
+
+        :param start: Index of the first sample.
+        :param count: Number of samples.
+        :return: Array of shape (count, 2) of X and Y.
+        """
+        out = np.empty((count, 2), dtype=np.float64)
+        for ch in (1, 2):
+            cmd = "TRCB?%d,%d,%d" % (ch, start, count)
+            connection = getattr(self.adapter, "connection", None)
+            if connection is not None and hasattr(connection, "query_binary_values"):
+                vals = connection.query_binary_values(cmd, datatype="f", is_big_endian=False, header_fmt="empty",
+                                                      data_points=count, expect_termination=False)
+            else:
+                vals = self.values("TRCA?%d,%d,%d" % (ch, start, count))
+            out[:, ch - 1] = vals
+        return out
+
+
+class SimulatedSR830(BufferedLockinMixin):
+    """ Simulated SR830 producing a constant X and Y signal with gaussian noise, for testing without hardware.
+    """
+
+    def __init__(self, resource_name=None, x=1e-3, y=0, noise=1e-5, seed=None, **kwargs):
+        """ Initialize a simulated SR830.
+
+        :param resource_name: Unused. Accepted for compatibility with the instrument loader.
+        :param x: Mean X signal in V.
+        :param y: Mean Y signal in V.
+        :param noise: Standard deviation of the noise on X and Y in V.
+        :param seed: Optional random seed.
+        """
+        self.name = "Simulated SR830"
+        self.signal = np.array([x, y], dtype=np.float64)
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.sensitivity = 1.0
+        self.time_constant = 0.1
+        self._buffer = None
+        self._stored = 0
+
+    @property
+    def x(self):
+        return self.signal[0] + self.rng.normal(0, self.noise)
+
+    @property
+    def y(self):
+        return self.signal[1] + self.rng.normal(0, self.noise)
+
+    @property
+    def magnitude(self):
+        return float(np.hypot(self.x, self.y))
+
+    @property
+    def theta(self):
+        return float(np.degrees(np.arctan2(self.y, self.x)))
+
+    def start_buffered(self, rate):
+        self.buffer_rate = self.nearest_sample_frequency(rate)
+        self.buffer_start_time = time.time()
+        self._buffer = np.empty((self.BUFFER_SIZE, 2), dtype=np.float64)
+        self._stored = 0
+        return self.buffer_rate
+
+    def stop_buffered(self):
+        self.buffer_start_time = None
+        self._buffer = None
+        self._stored = 0
+
+    @property
+    def buffer_points(self):
+        if self.buffer_start_time is None:
+            return 0
+        points = min(self.BUFFER_SIZE, int((time.time() - self.buffer_start_time) * self.buffer_rate))
+        if points > self._stored:
+            n = points - self._stored
+            self._buffer[self._stored:points] = self.signal + self.rng.normal(0, self.noise, (n, 2))
+            self._stored = points
+        return points
+
+    def read_buffer(self, start, count):
+        if start + count > self.buffer_points:
+            raise ValueError("Requested samples beyond the end of the buffer!")
+        return self._buffer[start:start + count].copy()
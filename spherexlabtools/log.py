@@ -1,5 +1,10 @@
+import queue
+import atexit
 import logging
 import threading
+import time
+from collections import deque
+from logging.handlers import QueueHandler
 
 # - log configurations - #
 LOGGER_NAME = "slt_log"
@@ -7,6 +12,14 @@ LOGGER_LEVEL = logging.DEBUG
 LOGGER_FORMAT = "[%(asctime)s] [%(levelname)s::%(name)s] [%(message)s]"
 LOGGER_FILE_NAME = "slt.log"
 LOGGER_GUI_SIGNAL = None
+LOGGER_CONFIGURED = False
+
+# - asynchronous logging configurations - #
+LOGGER_GUI_PERIOD = 0.2         # minimum time in seconds between updates of the gui log window.
+LOGGER_GUI_MAX_LINES = 1000     # maximum number of messages held for a single update of the gui log window.
+LOGGER_BATCH_SIZE = 1000        # maximum number of records written out by the listener at once.
+LOGGER_QUEUE = None
+LOGGER_LISTENER = None
 
 # - generic log messages - #
 INIT_MSG = "Initializing %s"
@@ -14,23 +27,124 @@ CMPLT_MSG = "%s complete"
 SET_MSG = "Setting %s on %s with %s"
 
 
-class GuiStreamHandler(logging.StreamHandler):
-    """ Simple sub-class of the stream handler to write data to a gui log window in addition to the stream.
+class GuiLogHandler(logging.Handler):
+    """ Handler collecting formatted messages for the gui log window. The messages are emitted through the gui log
+    signal as a single list of (level number, logger name, message) entries on flush, at most once every period
+    seconds, so that the gui thread is not signalled for every record.
     """
 
-    def __init__(self, ui_log_sig):
+    def __init__(self, ui_log_sig, period=0.2, max_lines=1000):
+        """ Initialize a gui log handler.
+
+        :param ui_log_sig: Signal connected to the gui log window.
+        :param period: Minimum time in seconds between emits of the signal.
+        :param max_lines: Maximum number of pending messages. Older messages are dropped if more records arrive
+                          between two emits, and the number of dropped messages is noted in the next chunk.
+        """
         super().__init__()
         self.ui_log_sig = ui_log_sig
+        self.period = period
+        self.pending = deque(maxlen=max_lines)
+        self.dropped = 0
+        self.last_emit = 0
 
     def emit(self, record):
-        msg = self.format(record)
-        self.ui_log_sig.emit(msg)
-        super().emit(record)
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+        self.pending.append((record.levelno, record.name, self.format(record)))
+
+    def flush(self, force=False):
+        """ Emit the pending messages if the period has passed since the last emit, or if force is True.
+        """
+        now = time.monotonic()
+        if len(self.pending) == 0 or (not force and now - self.last_emit < self.period):
+            return
+        entries = list(self.pending)
+        self.pending.clear()
+        if self.dropped > 0:
+            entries.insert(0, (logging.WARNING, LOGGER_NAME, "[... %d log messages not shown, see %s ...]" %
+                               (self.dropped, LOGGER_FILE_NAME)))
+            self.dropped = 0
+        self.last_emit = now
+        self.ui_log_sig.emit(entries)
+
+
+class BatchLogListener(threading.Thread):
+    """ Background thread writing the log records put on a queue by a :class:`logging.handlers.QueueHandler` to its
+    handlers. Records are taken off the queue in batches; stream and file handlers receive each batch in a single write
+    and flush, and :class:`.GuiLogHandler` instances are flushed at their own rate.
+    """
+
+    _stop_record = None
+
+    def __init__(self, log_queue, handlers, period=0.2, batch_size=1000):
+        """ Initialize a batch log listener.
+
+        :param log_queue: Queue the records are taken from.
+        :param handlers: List of handlers writing out the records.
+        :param period: Maximum time in seconds to wait for records before flushing the gui handlers.
+        :param batch_size: Maximum number of records written out at once.
+        """
+        super().__init__(name="slt_log listener", daemon=True)
+        self.queue = log_queue
+        self.handlers = handlers
+        self.period = period
+        self.batch_size = batch_size
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            records = []
+            try:
+                records.append(self.queue.get(timeout=self.period))
+                while len(records) < self.batch_size:
+                    records.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            if self._stop_record in records:
+                stopping = True
+                records = [r for r in records if r is not self._stop_record]
+            if len(records) > 0:
+                self.handle_batch(records)
+            for h in self.handlers:
+                if isinstance(h, GuiLogHandler):
+                    h.flush(force=stopping)
+
+    def handle_batch(self, records):
+        """ Write a batch of records out to each handler.
+        """
+        for h in self.handlers:
+            records_h = [r for r in records if r.levelno >= h.level and h.filter(r)]
+            if len(records_h) == 0:
+                continue
+            if isinstance(h, logging.StreamHandler):
+                try:
+                    text = h.terminator.join(h.format(r) for r in records_h) + h.terminator
+                    with h.lock:
+                        h.stream.write(text)
+                        h.flush()
+                except Exception:
+                    h.handleError(records_h[0])
+            else:
+                for r in records_h:
+                    h.handle(r)
+
+    def stop(self, timeout=None):
+        """ Write out the records queued so far, flush the gui handlers and stop the thread.
+        """
+        self.queue.put_nowait(self._stop_record)
+        self.join(timeout)
 
 
 def configure_slt_log():
-    """ Configure the spherexlabtools logger classes.
+    """ Configure the spherexlabtools logger classes. Records are put on a queue by the logging thread and written to
+    the log file, and to the gui log window if LOGGER_GUI_SIGNAL is set or otherwise to a plain stream, by a background
+    listener thread. Only the first call has an effect.
     """
+    global LOGGER_CONFIGURED, LOGGER_QUEUE, LOGGER_LISTENER
+    if LOGGER_CONFIGURED:
+        return
+    LOGGER_CONFIGURED = True
     slt_logger = logging.getLogger(LOGGER_NAME)
     slt_logger.setLevel(LOGGER_LEVEL)
     slt_formatter = logging.Formatter(LOGGER_FORMAT)
@@ -38,15 +152,33 @@ def configure_slt_log():
 
     # - configure handlers - #
     slt_file_handler = logging.FileHandler(filename=LOGGER_FILE_NAME)
-    slt_gui_handler = GuiStreamHandler(LOGGER_GUI_SIGNAL)
+    slt_stream_handler = logging.StreamHandler()
+    handlers = [slt_file_handler, slt_stream_handler]
+    if LOGGER_GUI_SIGNAL is not None:
+        handlers.append(GuiLogHandler(LOGGER_GUI_SIGNAL, period=LOGGER_GUI_PERIOD, max_lines=LOGGER_GUI_MAX_LINES))
 
     # - add filters and format to the handlers - #
-    slt_file_handler.setFormatter(slt_formatter)
-    slt_gui_handler.setFormatter(slt_formatter)
-    slt_file_handler.addFilter(slt_filter)
-    slt_gui_handler.addFilter(slt_filter)
+    for h in handlers:
+        h.setFormatter(slt_formatter)
+        h.addFilter(slt_filter)
 
-    # - add the handlers to the logger - #
-    slt_logger.addHandler(slt_file_handler)
-    slt_logger.addHandler(slt_gui_handler)
+    # - add the queue handler to the logger and start the listener - #
+    LOGGER_QUEUE = queue.SimpleQueue()
+    slt_queue_handler = QueueHandler(LOGGER_QUEUE)
+    slt_queue_handler.addFilter(slt_filter)
+    slt_logger.addHandler(slt_queue_handler)
+    LOGGER_LISTENER = BatchLogListener(LOGGER_QUEUE, handlers, period=LOGGER_GUI_PERIOD, batch_size=LOGGER_BATCH_SIZE)
+    LOGGER_LISTENER.start()
+    atexit.register(stop_slt_log)
 
+
+def stop_slt_log(timeout=5):
+    """ Write out the queued log records and stop the listener thread. Called at exit; records logged afterwards are
+    queued but not written.
+
+    :param timeout: Maximum time in seconds to wait for the listener.
+    """
+    global LOGGER_LISTENER
+    listener, LOGGER_LISTENER = LOGGER_LISTENER, None
+    if listener is not None and listener.is_alive():
+        listener.stop(timeout)
@@ -2,14 +2,17 @@
 """
 import time
 import logging
+import threading
 import smtplib
 import datetime
 from operator import attrgetter
-from email.mime.text import MIMEText
 
 from pyqtgraph.parametertree import Parameter, ParameterTree
 
 import spherexlabtools.log as slt_log
+import spherexlabtools.profiler as slt_profile
+from spherexlabtools.alerts import AlertDispatcher
+from spherexlabtools.conditions import ConditionSet
 from spherexlabtools.record import Record
 from spherexlabtools.ui.record import RecordUI
 from spherexlabtools.thread import StoppableReusableThread
@@ -31,6 +34,9 @@ class Procedure(StoppableReusableThread):
     }
     parameters = {}
 
+    # - attribute names of parameters whose hardware setpoints can be applied before the procedure starts - #
+    prefetch_parameters = []
+
     def __init__(self, cfg, exp, hw=None, update_params=True, viewers=None, recorders=None, **kwargs):
         """ Initialize a bare procedure instance.
 
@@ -50,7 +56,17 @@ class Procedure(StoppableReusableThread):
         self.hw = cfg.get("hw", None)
         self.records = {}
         self.record_queues = {}
+        self._status_cond = threading.Condition()
+        self.status_times = {}
         self.status = Procedure.QUEUED
+        self.acquisition_done = False
+
+        # - hardware setpoints applied ahead of the next run by prefetch() - #
+        self.hw_lock = threading.RLock()
+        self.prefetched = {}
+        self.prefetch_time = None
+        self.staged = {}
+        self.staged_time = None
         self.proc_params = {}
         self.start_time = None
         self.sequence = None
@@ -78,31 +94,147 @@ class Procedure(StoppableReusableThread):
             self.record_queues[key] = qdict_val
             self.records[key] = Record(key, **kwargs_dict)
         if update_params:
-            ParameterInspect.update_parameters(self)
+            with slt_profile.phase("ParameterInspect.update_parameters", self.name):
+                ParameterInspect.update_parameters(self)
         for key in kwargs:
             if key in self.parameters.keys():
                 setattr(self, key, kwargs[key])
         self.parameter_map = {pval.name: pkey for pkey, pval in self.parameters.items()}
 
-        # - configure the records user-interface - #
-        self.records_interface = RecordUI(self.records)
-        self.records_interface_tree = ParameterTree()
-        setattr(self.records_interface_tree, "name", self.name)
-        self.records_interface_tree.setParameters(self.records_interface)
+        # - configure the records user-interface. The tree widget is not created in headless experiments - #
+        with slt_profile.phase("records interface", self.name):
+            self.records_interface = RecordUI(self.records)
+            self.records_interface_tree = None
+            if not getattr(self.exp, "headless", False):
+                self.records_interface_tree = ParameterTree()
+                setattr(self.records_interface_tree, "name", self.name)
+                self.records_interface_tree.setParameters(self.records_interface)
         logger.info(slt_log.CMPLT_MSG % f"{self.name} initialization")
 
+    @property
+    def status(self):
+        """ Current procedure status. One of the Procedure.FINISHED, FAILED, ABORTED, QUEUED or RUNNING values.
+        """
+        return self._status
+
+    @status.setter
+    def status(self, status):
+        """ Set the procedure status, record the time of the transition in status_times and wake any threads
+        waiting in :meth:`.wait_for_status`.
+        """
+        with self._status_cond:
+            self._status = status
+            self.status_times[status] = time.perf_counter()
+            self._status_cond.notify_all()
+
+    def notify_status(self):
+        """ Wake any threads waiting in :meth:`.wait_for_status` so they re-check their condition.
+        """
+        with self._status_cond:
+            self._status_cond.notify_all()
+
+    def wait_for_status(self, predicate, timeout=None):
+        """ Block until predicate() is true. The predicate is re-checked on every status transition and on calls to
+        :meth:`.notify_status`.
+
+        :param predicate: Callable with no arguments.
+        :param timeout: Optional timeout in seconds.
+        :return: The last value returned by predicate().
+        """
+        with self._status_cond:
+            return self._status_cond.wait_for(predicate, timeout)
+
+    def acquisition_complete(self):
+        """ Called by procedures once they no longer need the hardware set by the prefetch parameters, e.g. when the
+        last exposure has been taken and only data handling remains. Wakes a waiting :class:`.ProcedureSequence` so
+        that it can prefetch the setpoints of its next step.
+        """
+        with self._status_cond:
+            self.acquisition_done = True
+            self._status_cond.notify_all()
+
+    def prefetch(self, params):
+        """ Apply the hardware setpoints of the prefetch parameters ahead of the next run. The applied values are
+        available to the next run in the staged attribute.
+
+        :param params: Dictionary of the form {'parameter attribute name': value}. Parameters that are not in
+                       prefetch_parameters are ignored.
+        """
+        params = {k: v for k, v in params.items() if k in self.prefetch_parameters}
+        if len(params) == 0:
+            return
+        with self.hw_lock:
+            self.apply_setpoints(params)
+            self.prefetched.update(params)
+            self.prefetch_time = time.perf_counter()
+
+    def apply_setpoints(self, params):
+        """ Set the hardware for the given prefetch parameter values. Must be implemented by procedures that declare
+        prefetch_parameters.
+
+        :param params: Dictionary of the form {'parameter attribute name': value}.
+        """
+        raise NotImplementedError("apply_setpoints() must be implemented by procedures with prefetch parameters!")
+
+    def is_staged(self, attr):
+        """ Return True if the hardware setpoint of the parameter attribute was prefetched with its current value.
+        """
+        return attr in self.staged and self.staged[attr] == getattr(self, attr)
+
+    def run(self):
+        """ Run the procedure thread. The status is set to FAILED if an exception is raised, and to FINISHED if
+        the thread completes without the shutdown() method having set it.
+        """
+        try:
+            super().run()
+        except Exception:
+            logger.exception('Procedure %s failed' % self.name)
+            self.running = False
+            self.status = Procedure.FAILED
+        else:
+            if self.status == Procedure.RUNNING:
+                self.status = Procedure.FINISHED
+
     def startup(self):
         """ Check that all procedure parameters have been set, and set the start_time object.
         """
         self.status = Procedure.RUNNING
+        self.acquisition_done = False
+        with self.hw_lock:
+            self.staged, self.prefetched = self.prefetched, {}
+            self.staged_time = self.prefetch_time
         ParameterInspect.check_parameters(self)
         self.proc_params = ParameterInspect.parameter_values(self)
         self.start_time = datetime.datetime.now()
         if self.name != 'ProcedureSequence':
             logger.info('Procedure %s starting' % self.name)
 
+    def topic(self, record_name):
+        """ Return the record bus topic of a record of this procedure.
+        """
+        return '%s.%s' % (self.name, record_name)
+
+    def publish(self, topic, record):
+        """ Publish a record to a topic of the experiment record bus.
+
+        :return: Number of subscriptions that queued the record.
+        """
+        return self.exp.bus.publish(topic, record)
+
+    def subscribe(self, topics, **kwargs):
+        """ Subscribe to topics of the experiment record bus. Records are read from the returned subscription with
+        get(timeout=...) or get_nowait().
+
+        :param topics: Topic string, or list of topics.
+        :param kwargs: Key-word arguments of :meth:`RecordBus.subscribe <spherexlabtools.bus.RecordBus.subscribe>`.
+        :return: The :class:`Subscription <spherexlabtools.bus.Subscription>`.
+        """
+        return self.exp.bus.subscribe(topics, name=kwargs.pop('name', self.name), **kwargs)
+
     def emit(self, record_name, record_data, meta=None, timestamp=True, filepath=None, **kwargs):
-        """ Post a record to the appropriate queues.
+        """ Post a record to the appropriate queues, and publish it to the '<procedure name>.<record name>' topic of the
+        experiment record bus. Each viewer or recorder of the record receives it once, even if it also subscribes to
+        the topic.
 
         :param record_name: String name of the record.
         :param record_data: Data values to write to the record.
@@ -128,8 +260,11 @@ class Procedure(StoppableReusableThread):
 
         # - update the record and place it on all associated queues - #
         record.update(record_data, proc_params=self.proc_params, meta=meta, proc_start_time=proc_start_time, **kwargs)
-        for q in self.record_queues[record_name]:
+        # - subscriptions of the viewers and recorders of the record already have it - #
+        queues = self.record_queues[record_name]
+        for q in queues:
             q.put(record)
+        self.exp.bus.publish(self.topic(record_name), record, exclude=queues)
 
     def shutdown(self):
         """ Set the procedure finished value.
@@ -214,62 +349,139 @@ class LoggingProcedure(Procedure):
 
 class ProcedureSequence(Procedure):
     """ Procedure class that wraps and executes a standalone procedure in a loop.
+
+    The sequence waits on status transitions of the wrapped procedure rather than polling it, so each step starts as
+    soon as the previous one finishes. The overhead between steps is logged for every step and summarized at the end
+    of the sequence.
+
+    If persistent_procedure is set, the wrapped procedure is switched to a persistent worker thread when the sequence
+    starts, so that the steps run on a single long-lived thread rather than a new thread per step. The procedure is
+    switched back, and its worker closed, when the sequence shuts down.
+
+    If the procedure declares prefetch_parameters, the setpoints of the next step are applied through
+    :meth:`Procedure.prefetch` as soon as the current step signals :meth:`Procedure.acquisition_complete`, so that
+    hardware motion overlaps with the data handling at the end of the step.
     """
 
     param_list = Parameter("Parameter List")
-    sleep = FloatParameter("Sleep Interval", default=1, units="s.")
     seq_ind = 0
+    persistent_procedure = True
 
     def __init__(self, cfg, exp, proc, **kwargs):
         super().__init__(cfg, exp, **kwargs)
         self.procedure = proc
+        self._procedure_persistent = None
 
     def startup(self):
         """ Set the sequence attribute of the procedure attribute.
         """
         super().startup()
         self.procedure.sequence = self
+        if self.persistent_procedure:
+            self._procedure_persistent = self.procedure.persistent
+            self.procedure.persistent = True
 
     def execute(self):
         """ Execute the provided procedure in a loop from the constructed parameter list.
         """
+        done = (Procedure.FINISHED, Procedure.FAILED, Procedure.ABORTED)
+        thread_key = f"{self.name}: {self.procedure.name}"
         stopped = False
         seq_len = len(self.param_list)
-        for params in self.param_list[self.seq_ind:]:
+        overheads = []
+        step_done = time.perf_counter()
+        for ind in range(self.seq_ind, seq_len):
+            params = self.param_list[ind]
             # set procedure parameters #
             for pkey, pval in params.items():
                 setattr(self.procedure, self.procedure.parameter_map[pkey], pval)
             log_str = f"{self.name}: starting procedure {self.procedure.name} at index {self.seq_ind} / {seq_len - 1}"
             logger.info(log_str)
-            self.exp.start_thread(log_str, self.procedure)
-            # wait for the procedure to start running. #
-            while not self.procedure.status == self.procedure.RUNNING:
-                time.sleep(self.sleep)
-
-            # wait until the procedure completes its execution. #
-            while not self.procedure.status == self.procedure.FINISHED:
-                time.sleep(self.sleep)
-                if self.should_stop():
-                    self.procedure.stop()
-                    stopped = True
+            self.procedure.status = Procedure.QUEUED
+            self.procedure.acquisition_done = False
+            self.exp.start_thread(thread_key, self.procedure)
+
+            # setpoints of the next step that can be applied once this step completes its acquisition. #
+            prefetch = {}
+            if len(self.procedure.prefetch_parameters) > 0 and ind + 1 < seq_len:
+                prefetch = {self.procedure.parameter_map[pkey]: pval
+                            for pkey, pval in self.param_list[ind + 1].items()}
+
+            # wait until the procedure completes its execution or the sequence is stopped. #
+            while True:
+                self.procedure.wait_for_status(lambda: self.procedure.status in done or self.should_stop() or
+                                               (len(prefetch) > 0 and self.procedure.acquisition_done))
+                if self.procedure.status in done or self.should_stop():
                     break
+                logger.debug(f"{self.name}: prefetching {prefetch} for index {ind + 1}")
+                try:
+                    self.procedure.prefetch(prefetch)
+                except Exception:
+                    logger.exception(f"{self.name}: failed to prefetch setpoints for index {ind + 1}")
+                prefetch = {}
+            if self.procedure.status not in done:
+                self.procedure.stop()
+                stopped = True
+            self.procedure.wait()
             if stopped:
                 break
-            else:
-                self.seq_ind += 1
 
+            status = self.procedure.status
+            if status != Procedure.FINISHED:
+                logger.error(f"{self.name}: procedure {self.procedure.name} at index {self.seq_ind} ended with status "
+                             f"{self.STATUS_STRINGS[status]}. Stopping the sequence.")
+                stopped = True
+                break
+
+            # log the time spent between the end of the previous step and the start of this one. #
+            times = self.procedure.status_times
+            overhead = times[Procedure.RUNNING] - step_done
+            step_done = times[Procedure.FINISHED]
+            overheads.append(overhead)
+            logger.info(f"{self.name}: index {self.seq_ind} finished in "
+                        f"{step_done - times[Procedure.RUNNING]:.3f} s. with {overhead * 1e3:.1f} ms. of overhead")
+            self.seq_ind += 1
+            if self.should_stop():
+                stopped = True
+                break
+
+        if len(overheads) > 0:
+            mean_overhead = sum(overheads) / len(overheads)
+            logger.info(f"{self.name}: step overhead over {len(overheads)} steps: mean {mean_overhead * 1e3:.1f} ms., "
+                        f"max {max(overheads) * 1e3:.1f} ms., total {sum(overheads):.3f} s.")
         if not stopped:
             self.seq_ind = 0
 
+    def stop(self):
+        """ Stop the sequence and wake the execution thread if it is waiting on the procedure.
+        """
+        super().stop()
+        self.procedure.notify_status()
+
     def shutdown(self):
-        """ Clear the sequence attribute of the procedure attribute.
+        """ Clear the sequence attribute of the procedure attribute, and restore its thread mode. The persistent worker
+        of the sequence exits once the current step has completed.
         """
         self.procedure.sequence = None
+        if self._procedure_persistent is not None:
+            self.procedure.persistent = self._procedure_persistent
+            self._procedure_persistent = None
+            if not self.procedure.persistent:
+                self.procedure.close_worker()
         log_str = f"{self.name} shutting down."
         logger.info(log_str)
 
 
 class AlertProcedure(Procedure):
+    """ Procedure monitoring the values returned by get() and sending an email alert when any of a set of conditions
+    is met. The conditions are compiled once at startup into a
+    :class:`ConditionSet <spherexlabtools.conditions.ConditionSet>`; see :mod:`spherexlabtools.conditions` for the
+    syntax.
+
+    Alerts are sent by an :class:`AlertDispatcher <spherexlabtools.alerts.AlertDispatcher>` thread, and monitoring
+    continues while they are delivered. A condition that becomes met is alerted on at most once every Min Alert
+    Interval, and a condition that stays met is alerted on again every Repeat Interval.
+    """
     _smtp = None
     _smtp_port = 587
 
@@ -279,61 +491,99 @@ class AlertProcedure(Procedure):
     _alerts = []
 
     # - messaging parameters ---------------- #
-    _condition_strs = []
-
-    def __init__(self, cfg, exp, check_values, address, password, smtp_dict, **kwargs):
+    _condition_strs = {}
+    _conditions = None
+    alert_interval = FloatParameter('Min Alert Interval', units='s', default=300)
+    repeat_interval = FloatParameter('Repeat Interval', units='s', default=3600)
+
+    # - key of the sample time in the values returned by get(), used by rate() conditions - #
+    time_key = 'datetime'
+
+    def __init__(self, cfg, exp, check_values, address, password, smtp_dict, conditions=None, smtp_port=None,
+                 smtp_tls=True, **kwargs):
+        """ Initialize an alert procedure.
+
+        :param check_values: List of value names with a single-value condition each. The conditions are parameters
+                             named after the values, with '%f' standing for the value, e.g. '%f > 300'.
+        :param address: Email address the alerts are sent from.
+        :param password: Password of the email address. No login is done if None.
+        :param smtp_dict: Dictionary of smtp servers to lists of recipients.
+        :param conditions: Optional dictionary of condition names to condition expressions in any of the values, e.g.
+                           {'pressure_rise': 'rate(pressure) > 1e-7'}. Each is a parameter named after the condition.
+        :param smtp_port: Port of the smtp servers. Defaults to 587.
+        :param smtp_tls: Boolean indicating if the smtp connections are upgraded with STARTTLS.
+        """
         self._check_vals = check_values
+        self._condition_exprs = conditions if conditions is not None else {}
         self._address = address
         self._password = password
         self._smtp = smtp_dict
-
-        # - check that the passed smtp servers in smtp_dict are valid --- #
+        self._active = set()
+        self._last_alert = {}
+        self._due = []
+        self.dispatcher = AlertDispatcher(address, password, smtp_dict,
+                                          port=smtp_port if smtp_port is not None else self._smtp_port,
+                                          use_tls=smtp_tls)
+
+        # - check that the passed smtp servers in smtp_dict are valid. The connections are kept for the alerts - #
         for server in self._smtp.keys():
             try:
-                with smtplib.SMTP(server, self._smtp_port) as check:
-                    check.starttls()
+                self.dispatcher.connect(server)
             except smtplib.SMTPException as e:
                 logger.error('Invalid smtp server %s provided!' % server)
                 raise e
 
         # - extract recipients into single list from smtp dictionary --- #
-        self._recipients = list(self._smtp.values())
-        self._recipients = [i for j in self._recipients for i in j]
+        self._recipients = self.dispatcher.recipients
 
         # - create the condition string parameters - #
         for cv in self._check_vals:
             p = Parameter(cv, default='%f < 0')
             setattr(self, cv, p)
+        for name, expr in self._condition_exprs.items():
+            if hasattr(type(self), name) or name in self._check_vals:
+                raise ValueError('Condition name %s of %s is already in use!' % (name, cfg['instance_name']))
+            setattr(self, name, Parameter(name, default=expr))
 
         super().__init__(cfg, exp, **kwargs)
 
     def startup(self):
         logger.info('Starting %s alert procedure' % self.name)
-        self._condition_strs = [
-            getattr(self, cv).replace('%f', cv) + '\n' for cv in self._check_vals
-        ]
+        conditions = {cv: getattr(self, cv).replace('%f', cv) for cv in self._check_vals}
+        conditions.update({name: getattr(self, name) for name in self._condition_exprs})
+        self._conditions = ConditionSet(conditions)
+        self._condition_strs = {
+            name: (expr if name in self._check_vals else '%s: %s' % (name, expr)) + '\n'
+            for name, expr in conditions.items()
+        }
+        self._active = set()
+        self._last_alert = {}
+
+        # - wait for the dispatcher to finish the alerts of a previous run before restarting it - #
+        self.dispatcher.wait()
+        self.dispatcher.start()
         self._state = 'MONITORING'
 
     def execute(self):
         logger.info('%s alert procedure is actively monitoring the following conditions: %s' %
-                    (self.name, '\t'.join(['\n'] + self._condition_strs)))
+                    (self.name, '\t'.join(['\n'] + list(self._condition_strs.values()))))
 
         # - monitoring loop ------------------------------ #
         while not self.should_stop():
             if self._state == 'MONITORING':
                 vals = self.get()
+                if vals is None:
+                    continue
+                met = self._conditions.check(vals, self.sample_time(vals))
+                self._due = self.due_alerts(met, time.monotonic())
                 self._alerts = []
-                for param, val in vals.items():
-                    if param in self._check_vals:
-                        eval_str = getattr(self, param) % val
-                        condition = eval(eval_str)
-                        if condition:
-                            alert = '%s = %s\n' % (param, val)
+                for name in self._due:
+                    for param in self._conditions.condition_channels[name]:
+                        alert = '%s = %s\n' % (param, vals.get(param))
+                        if alert not in self._alerts:
                             self._alerts.append(alert)
-                    else:
-                        continue
 
-                if any(self._alerts):
+                if len(self._due) > 0:
                     self._state = 'ALERT'
 
             elif self._state == 'ALERT':
@@ -345,29 +595,51 @@ class AlertProcedure(Procedure):
                 dt = datetime.datetime.now()
                 msg = 'You are receiving this message from the SPHEREx-Lab alert system. \n'
                 msg += 'At %s the following values were recorded: %s' % (dt, alert_str)
-                msg += '\nThese values violate some (or all) of the following conditions: %s' % \
-                       '\t'.join(['\n'] + self._condition_strs)
+                msg += '\nThese values violate the following conditions: %s' % \
+                       '\t'.join(['\n'] + [self._condition_strs[name] for name in self._due])
                 msg += '\n Please take the appropriate action immediately.'
-                msg = MIMEText(msg, 'plain')
-                msg['Subject'] = '%s Alert' % self.name
-                msg['From'] = 'SPHEREx B111 Lab Alert System'
-                msg['To'] = ', '.join(self._recipients)
-
-                # - send the alert to all recipients --------------------------------------------- #
-                for server_str, recipients in self._smtp.items():
-                    with smtplib.SMTP(server_str, self._smtp_port) as server:
-                        server.starttls()
-                        server.ehlo()
-                        server.login(self._address, self._password)
-                        server.sendmail(from_addr=self._address, to_addrs=recipients,
-                                        msg=msg.as_string())
-                self._state = 'IDLE'
+
+                # - queue the alert for the dispatcher and continue monitoring --------------------- #
+                self.dispatcher.send('%s Alert' % self.name, msg)
+                self._state = 'MONITORING'
 
             elif self._state == 'IDLE':
                 break
 
     def shutdown(self):
         logger.info('%s alert procedure shutting down.' % self.name)
+        if self.dispatcher.running:
+            self.dispatcher.stop()
+
+    def due_alerts(self, met, now):
+        """ Return the names of the met conditions to alert on, and record the time of their alert. A condition that
+        has become met is due if it was last alerted on at least alert_interval seconds ago, and a condition that has
+        stayed met is due if it was last alerted on at least repeat_interval seconds ago.
+
+        :param met: List of the names of the conditions met by the current values.
+        :param now: Current time in seconds.
+        """
+        due = []
+        for name in met:
+            last = self._last_alert.get(name)
+            interval = self.repeat_interval if name in self._active else self.alert_interval
+            if last is None or now - last >= interval:
+                due.append(name)
+                self._last_alert[name] = now
+        for name in self._active.difference(met):
+            logger.info('%s alert condition %s cleared.' % (self.name, name))
+        self._active = set(met)
+        return due
+
+    def sample_time(self, vals):
+        """ Return the time in seconds since the epoch of the values returned by get(). The time_key value is used if
+        present, and otherwise the current time.
+        """
+        t = vals.get(self.time_key)
+        return t.timestamp() if isinstance(t, datetime.datetime) else time.time()
 
     def get(self):
+        """ Return a dictionary of the current values of the monitored channels, or None if no values are available,
+        e.g. after a read from a subscription times out, so that the monitoring loop can check for a stop.
+        """
         raise NotImplementedError('get() must be implemented in subclasses!')
@@ -0,0 +1,145 @@
+""" This module implements the class :class:`.StartupProfiler`, which records the wall time spent in each phase of
+experiment construction, and the function :func:`.phase` used to time a block of code against the active profiler.
+
+A phase is identified by a component, e.g. 'procedures', and optionally by the config entry it belongs to, e.g. the
+instance name of a procedure. Phases may be nested; the depth of each phase is recorded so that nested phases are not
+double counted in the component totals. When no profiler is active, :func:`.phase` does nothing.
+"""
+import json
+import time
+import datetime
+import threading
+from contextlib import contextmanager
+
+# - profiler receiving the phases timed with phase() - #
+active_profiler = None
+
+
+class StartupProfiler:
+    """ Records the wall time of named phases, and produces a sorted report and a JSON file of the timings.
+    """
+
+    def __init__(self, name):
+        """ Initialize a startup profiler.
+
+        :param name: Name of the profiled object, e.g. the experiment configuration package name.
+        """
+        self.name = name
+        self.phases = []
+        self.start_time = datetime.datetime.now()
+        self.t0 = time.perf_counter()
+        self.total = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def phase(self, component, entry=None):
+        """ Context manager timing the enclosed block as a phase of component, and optionally of a config entry.
+        """
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            self.record(component, entry, time.perf_counter() - t0, start=t0, depth=depth)
+
+    def record(self, component, entry, duration, start=None, depth=None):
+        """ Record a phase timed elsewhere.
+
+        :param component: Name of the component.
+        :param entry: Name of the config entry, or None for the component as a whole.
+        :param duration: Wall time of the phase in seconds.
+        :param start: perf_counter() value at the start of the phase.
+        :param depth: Nesting depth of the phase. Defaults to one level below the current phase.
+        """
+        if depth is None:
+            depth = getattr(self._local, "depth", 0)
+        with self._lock:
+            self.phases.append({
+                "component": component,
+                "entry": entry,
+                "start": None if start is None else start - self.t0,
+                "duration": duration,
+                "depth": depth,
+            })
+
+    def finish(self):
+        """ Set the total wall time since the profiler was created.
+        """
+        self.total = time.perf_counter() - self.t0
+
+    def component_totals(self):
+        """ Return a dictionary of the total time of the outermost phases of each component.
+        """
+        totals = {}
+        for p in self.phases:
+            if p["entry"] is None and p["depth"] == 0:
+                totals[p["component"]] = totals.get(p["component"], 0) + p["duration"]
+        return totals
+
+    def report(self, limit=None):
+        """ Return a text report of the component totals and of the config entry phases, slowest first.
+
+        :param limit: Optional maximum number of entry phases to include.
+        """
+        total = self.total if self.total is not None else time.perf_counter() - self.t0
+        lines = ["Startup profile of %s: %.3f s." % (self.name, total)]
+        for component, t in sorted(self.component_totals().items(), key=lambda kv: -kv[1]):
+            lines.append("    %-40s %8.3f s. %5.1f %%" % (component, t, 100 * t / total if total > 0 else 0))
+        entries = sorted([p for p in self.phases if p["entry"] is not None], key=lambda p: -p["duration"])
+        if limit is not None:
+            entries = entries[:limit]
+        if len(entries) > 0:
+            lines.append("  slowest config entries:")
+        for p in entries:
+            lines.append("    %-40s %8.3f s." % ("%s: %s" % (p["component"], p["entry"]), p["duration"]))
+        return "\n".join(lines)
+
+    def to_dict(self):
+        """ Return a JSON serializable dictionary of the profile.
+        """
+        return {
+            "name": self.name,
+            "start_time": self.start_time.isoformat(),
+            "total": self.total,
+            "components": self.component_totals(),
+            "phases": self.phases,
+        }
+
+    def write_json(self, path):
+        """ Write the profile to a JSON file.
+        """
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def start(name):
+    """ Create a :class:`.StartupProfiler` and make it the active profiler.
+    """
+    global active_profiler
+    active_profiler = StartupProfiler(name)
+    return active_profiler
+
+
+def stop():
+    """ Finish the active profiler and return it. No phases are recorded until the next call to :func:`.start`.
+    """
+    global active_profiler
+    profiler, active_profiler = active_profiler, None
+    if profiler is not None:
+        profiler.finish()
+    return profiler
+
+
+@contextmanager
+def phase(component, entry=None):
+    """ Time the enclosed block as a phase of the active profiler. Does nothing if no profiler is active.
+    """
+    profiler = active_profiler
+    if profiler is None:
+        yield
+    else:
+        with profiler.phase(component, entry):
+            yield
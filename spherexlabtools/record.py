@@ -26,6 +26,9 @@ class Record:
     lock = threading.Lock()
     lock_initialized = True
 
+    # - attributes whose access manages the lock itself - #
+    _self_locking = ("lock", "data")
+
     def __init__(self, name, viewer=None, recorder=None, **kwargs):
         """ Initialize a record.
 
@@ -73,9 +76,13 @@ class Record:
                      parameters.
         :param proc_start_time: Timestamp of when the procedure started.
 
+        Numpy array data is kept by reference in :attr:`Record.raw_data` and only converted to a dataframe the first
+        time :attr:`Record.data` is read, so consumers that work on arrays directly (such as the
+        :class:`ImageViewer <spherexlabtools.viewers.ImageViewer>`) never pay for the conversion. Procedures must not
+        modify an array after emitting it.
         """
-        # - update the dataframe attributes - #
-        self.data = self.to_dataframe(data)
+        # - update the dataframe attributes. numpy arrays are converted lazily on first access of self.data - #
+        self.data = data if type(data) is np.ndarray else self.to_dataframe(data)
         self.proc_params = self.to_dataframe(proc_params)
         self.meta = self.to_dataframe(meta)
 
@@ -86,6 +93,27 @@ class Record:
         # - set the up-to-date flag - #
         self.to_date = True
 
+    @property
+    def data(self):
+        """ Record data as a dataframe, converted from :attr:`Record.raw_data` on first access.
+        """
+        lock = object.__getattribute__(self, "lock")
+        with lock:
+            raw = object.__getattribute__(self, "raw_data")
+            df = object.__getattribute__(self, "_data")
+        if df is None and raw is not None:
+            # - convert outside of the lock so other threads are not blocked by large conversions - #
+            df = self.to_dataframe(raw)
+            with lock:
+                if object.__getattribute__(self, "raw_data") is raw:
+                    object.__setattr__(self, "_data", df)
+        return df
+
+    @data.setter
+    def data(self, value):
+        object.__setattr__(self, "_data", value if type(value) is pd.DataFrame else None)
+        object.__setattr__(self, "raw_data", value)
+
     def to_dataframe(self, obj):
         """ Convert the object to a dataframe.
 
@@ -127,7 +155,7 @@ class Record:
     def __getattribute__(self, name):
         """ Attribute access override for thread safety.
         """
-        if not name == "lock" and object.__getattribute__(self, "lock_initialized"):
+        if name not in Record._self_locking and object.__getattribute__(self, "lock_initialized"):
             with object.__getattribute__(self, "lock"):
                 ret = object.__getattribute__(self, name)
         else:
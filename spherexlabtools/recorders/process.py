@@ -0,0 +1,385 @@
+""" This module implements running a :class:`Recorder <spherexlabtools.recorders.Recorder>` in a child process, so that
+the pandas work of writing records does not compete for the GIL with the procedures and the gui:
+
+    - :class:`.RecorderProcess`: Parent side of a recorder process. Started and stopped by the recorder thread.
+    - :class:`.SharedRing`: Ring buffer of the records in flight to the child process, in a shared memory block.
+    - :func:`.run_recorder`: Entry point of the child process.
+
+The child process creates its own instance of the recorder class from the recorder configuration, and runs the usual
+recorder thread, so that every override of the recorder class runs in the child. The configuration, including its
+'kwargs', must therefore be picklable.
+
+Records are pickled with protocol 5 in the parent, and the array buffers of their dataframes are copied into the
+shared memory ring out-of-band. Only a small descriptor of the name, results path and location of each record is sent
+over the command pipe. The child acknowledges over the event pipe when a record has been read out of the ring, and when
+it has been handled, and forwards its log messages to the parent. A record larger than the ring is sent inline over
+the command pipe.
+
+The child process is started with the 'spawn' method, so the script that creates the experiment must be guarded with
+``if __name__ == "__main__":``.
+"""
+import queue
+import pickle
+import logging
+import importlib
+import threading
+import multiprocessing as mp
+from collections import deque
+from multiprocessing import shared_memory
+
+import spherexlabtools.log as slt_log
+from spherexlabtools.record import Record
+
+log_name = f"{slt_log.LOGGER_NAME}.{__name__.split('.')[-1]}"
+logger = logging.getLogger(log_name)
+
+# - message kinds of the command (parent -> child) and event (child -> parent) pipes - #
+RECORD, STOP = 'record', 'stop'
+RELEASED, HANDLED, LOG = 'released', 'handled', 'log'
+
+
+class RecorderProcessError(Exception):
+    pass
+
+
+class SharedRing:
+    """ Ring buffer of variable size regions of a shared memory block. Regions are released in the order they were
+    allocated, since the child process reads the records in order.
+    """
+
+    def __init__(self, size):
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.size = size
+        self.regions = deque()
+        self.cond = threading.Condition()
+        self.closed = False
+
+    def _offset(self, n):
+        """ Return the offset of a free region of n bytes, or None if there is no room.
+        """
+        if len(self.regions) == 0:
+            return 0
+        first = self.regions[0][0]
+        last, head = self.regions[-1]
+        if last >= first:
+            # - the regions in flight do not wrap: free space after the last region, then before the first - #
+            if self.size - head >= n:
+                return head
+            return 0 if first >= n else None
+        return head if first - head >= n else None
+
+    def alloc(self, n):
+        """ Allocate a region of n bytes, blocking until the child process releases enough space.
+
+        :return: Offset of the region.
+        """
+        with self.cond:
+            while True:
+                if self.closed:
+                    raise RecorderProcessError('The recorder process has exited!')
+                offset = self._offset(n)
+                if offset is not None:
+                    self.regions.append((offset, offset + n))
+                    return offset
+                self.cond.wait(0.1)
+
+    def write(self, offset, parts):
+        """ Copy a list of buffers to consecutive bytes starting at offset.
+        """
+        for part in parts:
+            n = part.nbytes
+            self.shm.buf[offset:offset + n] = part
+            offset += n
+
+    def release(self):
+        """ Release the oldest region.
+        """
+        with self.cond:
+            self.regions.popleft()
+            self.cond.notify_all()
+
+    def shutdown(self):
+        """ Refuse further allocations, and wake any writer waiting for space.
+        """
+        with self.cond:
+            self.closed = True
+            self.regions.clear()
+            self.cond.notify_all()
+
+    def close(self):
+        """ Free the shared memory block. Must be called by the writer, once it no longer writes to the ring.
+        """
+        self.shutdown()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class RecorderProcess:
+    """ Parent side of a recorder running in a child process. :meth:`.send` is called by the recorder thread in place
+    of handling each record.
+    """
+
+    def __init__(self, recorder, cfg, shm_size):
+        """ Initialize a recorder process. The process is started by :meth:`.start`.
+
+        :param recorder: The parent :class:`Recorder <spherexlabtools.recorders.Recorder>` object.
+        :param cfg: Configuration dictionary of the recorder.
+        :param shm_size: Size in bytes of the shared memory ring.
+        """
+        self.recorder = recorder
+        self.cfg = cfg
+        self.shm_size = shm_size
+        self.ring = None
+        self.process = None
+        self.commands = None
+        self.events = None
+        self.reader = None
+        self.cond = threading.Condition()
+        self.pending = 0
+        self.sent = 0
+        self.handled = 0
+        self.exited = False
+
+    def start(self):
+        """ Create the shared memory ring and start the child process and the event reader thread.
+        """
+        ctx = mp.get_context('spawn')
+        self.ring = SharedRing(self.shm_size)
+        cmd_recv, self.commands = ctx.Pipe(duplex=False)
+        self.events, event_send = ctx.Pipe(duplex=False)
+        cls = type(self.recorder)
+        try:
+            self.process = ctx.Process(target=run_recorder, name='%s process' % self.recorder.name, daemon=True,
+                                       args=(cls.__module__, cls.__qualname__, self.cfg, self.ring.shm.name, cmd_recv,
+                                             event_send, logging.getLogger(slt_log.LOGGER_NAME).getEffectiveLevel()))
+            self.process.start()
+        except Exception:
+            # - e.g. an unpicklable configuration: free the ring and the pipes, since stop() will not be called - #
+            logger.exception('Could not start recorder process %s' % self.recorder.name)
+            for conn in [cmd_recv, self.commands, self.events, event_send]:
+                conn.close()
+            self.ring.close()
+            self.process = None
+            raise
+        finally:
+            if self.process is not None:
+                cmd_recv.close()
+                event_send.close()
+        self.pending = 0
+        self.exited = False
+        self.reader = threading.Thread(target=self.read_events, name='%s events' % self.recorder.name, daemon=True)
+        self.reader.start()
+        logger.info('Started recorder process %s (pid %d)' % (self.recorder.name, self.process.pid))
+
+    def read_events(self):
+        """ Handle the acknowledgements and log messages of the child process until it exits.
+        """
+        while True:
+            try:
+                msg = self.events.recv()
+            except (EOFError, OSError):
+                break
+            if msg[0] == RELEASED:
+                self.ring.release()
+            elif msg[0] == HANDLED:
+                with self.cond:
+                    self.pending -= 1
+                    self.handled += 1
+                    self.cond.notify_all()
+            elif msg[0] == LOG:
+                record = logging.makeLogRecord(msg[1])
+                logging.getLogger(record.name).handle(record)
+        with self.cond:
+            if self.pending > 0:
+                logger.error('Recorder process %s exited with %d records not handled!' %
+                             (self.recorder.name, self.pending))
+            self.pending = 0
+            self.exited = True
+            self.cond.notify_all()
+        self.ring.shutdown()
+
+    def send(self, record, results_path):
+        """ Copy a record to the shared memory ring and send its descriptor to the child process.
+
+        :param record: :class:`Record <spherexlabtools.record.Record>` object.
+        :param results_path: Current value of the results path of the recorder.
+        """
+        buffers = []
+        payload = (record.raw_data, record.proc_params, record.meta, record.procedure_start_time, record.emit_kwargs)
+        parts = [pickle.PickleBuffer(pickle.dumps(payload, protocol=5, buffer_callback=buffers.append))]
+        parts = [p.raw() for p in parts + buffers]
+        size = sum(p.nbytes for p in parts)
+        with self.cond:
+            if self.exited:
+                raise RecorderProcessError('Recorder process %s has exited!' % self.recorder.name)
+            self.pending += 1
+            self.sent += 1
+
+        # - the descriptor carries the part sizes for a record in the ring, or the parts themselves - #
+        if size <= self.shm_size:
+            offset = self.ring.alloc(size)
+            self.ring.write(offset, parts)
+            descriptor = (RECORD, record.name, results_path, offset, [p.nbytes for p in parts])
+        else:
+            logger.warning('Record %s of %d bytes does not fit the %d byte shared memory ring of %s. Sending it over '
+                           'the pipe.' % (record.name, size, self.shm_size, self.recorder.name))
+            descriptor = (RECORD, record.name, results_path, None, [p.tobytes() for p in parts])
+        try:
+            self.commands.send(descriptor)
+        except (BrokenPipeError, OSError):
+            raise RecorderProcessError('Recorder process %s has exited!' % self.recorder.name)
+
+    def wait_handled(self, timeout=None):
+        """ Block until every record sent has been handled by the child process.
+
+        :param timeout: Optional timeout in seconds.
+        :return: Boolean indicating if every record was handled before the timeout.
+        """
+        with self.cond:
+            return self.cond.wait_for(lambda: self.pending == 0, timeout)
+
+    def stop(self, timeout=30):
+        """ Stop the child process once it has handled the records sent, and free the shared memory ring.
+
+        :param timeout: Maximum time in seconds to wait for the child process to exit before terminating it.
+        """
+        try:
+            self.commands.send((STOP,))
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            logger.warning('Recorder process %s did not exit within %.1f s. Terminating it.' %
+                           (self.recorder.name, timeout))
+            self.process.terminate()
+            self.process.join()
+        self.reader.join()
+        self.ring.close()
+        self.commands.close()
+        self.events.close()
+        logger.info('Recorder process %s exited. %d records handled.' % (self.recorder.name, self.handled))
+
+
+# - child process ------------------------------------------------------------------------------------------------- #
+class _PipeLogHandler(logging.Handler):
+    """ Log handler of the child process, forwarding the log records to the parent process.
+    """
+
+    def __init__(self, send):
+        super().__init__()
+        self.send = send
+
+    def emit(self, record):
+        try:
+            d = dict(record.__dict__)
+            d['msg'] = record.getMessage()
+            d['args'] = None
+            if record.exc_info:
+                d['exc_text'] = logging.Formatter().formatException(record.exc_info)
+            d['exc_info'] = None
+            self.send((LOG, d))
+        except Exception:
+            self.handleError(record)
+
+
+class _PipeQueue:
+    """ Queue of the recorder thread of the child process. Records are read from the command pipe and the shared
+    memory ring, and the parent process is notified as they are read and handled.
+    """
+
+    def __init__(self, recorder, commands, send, shm):
+        self.recorder = recorder
+        self.commands = commands
+        self.send = send
+        self.shm = shm
+        self.records = {}
+        self.results_path = None
+        self.unfinished_tasks = 0
+
+    def get(self, timeout=None):
+        try:
+            if not self.commands.poll(timeout):
+                raise queue.Empty
+            msg = self.commands.recv()
+        except (EOFError, OSError):
+            msg = (STOP,)
+        if msg[0] == STOP:
+            self.recorder.stop()
+            raise queue.Empty
+        _, name, results_path, offset, parts = msg
+
+        # - read the record out of the ring, and release its region to the parent - #
+        if offset is not None:
+            views = []
+            for n in parts:
+                views.append(self.shm.buf[offset:offset + n])
+                offset += n
+            try:
+                payload = pickle.loads(views[0], buffers=[bytearray(v) for v in views[1:]])
+            finally:
+                for v in views:
+                    v.release()
+            self.send((RELEASED,))
+        else:
+            payload = pickle.loads(parts[0], buffers=[bytearray(p) for p in parts[1:]])
+
+        # - follow changes of the results path in the parent - #
+        if results_path != self.results_path:
+            self.results_path = results_path
+            self.recorder.results_path.setValue(results_path)
+
+        record = self.records.get(name)
+        if record is None:
+            record = self.records[name] = Record(name)
+        data, proc_params, meta, proc_start_time, emit_kwargs = payload
+        record.update(data, proc_params=proc_params, meta=meta, proc_start_time=proc_start_time,
+                      **(emit_kwargs or {}))
+        self.unfinished_tasks += 1
+        return record
+
+    def task_done(self):
+        self.unfinished_tasks -= 1
+        self.send((HANDLED,))
+
+
+def run_recorder(module, qualname, cfg, shm_name, commands, events, log_level):
+    """ Entry point of a recorder process. Create the recorder and run its thread until the parent sends a stop.
+
+    :param module: Name of the module of the recorder class.
+    :param qualname: Qualified name of the recorder class.
+    :param cfg: Configuration dictionary of the recorder.
+    :param shm_name: Name of the shared memory ring.
+    :param commands: Receiving end of the command pipe.
+    :param events: Sending end of the event pipe.
+    :param log_level: Level of the spherexlabtools logger of the parent.
+    """
+    send_lock = threading.Lock()
+
+    def send(msg):
+        with send_lock:
+            events.send(msg)
+
+    slt_logger = logging.getLogger(slt_log.LOGGER_NAME)
+    slt_logger.setLevel(log_level)
+    slt_logger.addHandler(_PipeLogHandler(send))
+    threading.excepthook = lambda args: logger.error('Recorder %s failed' % cfg['instance_name'], exc_info=(
+        args.exc_type, args.exc_value, args.exc_traceback))
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        cls = importlib.import_module(module)
+        for attr in qualname.split('.'):
+            cls = getattr(cls, attr)
+        kwargs = dict(cfg.get('kwargs', {}))
+        kwargs['process'] = False
+        recorder = cls(cfg, exp=None, **kwargs)
+        for key, val in cfg.get('params', {}).items():
+            setattr(recorder, key, val)
+        recorder.queue = _PipeQueue(recorder, commands, send, shm)
+        recorder.start()
+        recorder.wait()
+    except Exception:
+        logger.exception('Recorder process %s failed' % cfg['instance_name'])
+    finally:
+        shm.close()
+        events.close()
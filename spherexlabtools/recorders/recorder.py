@@ -6,6 +6,7 @@ from pyqtgraph.parametertree.parameterTypes import FileParameter
 
 import spherexlabtools.log as slt_log
 from spherexlabtools.thread import QueueThread
+from spherexlabtools.recorders.process import RecorderProcess, RecorderProcessError
 
 log_name = f"{slt_log.LOGGER_NAME}.{__name__.split('.')[-1]}"
 logger = logging.getLogger(log_name)
@@ -14,6 +15,11 @@ logger = logging.getLogger(log_name)
 class Recorder(QueueThread):
     """ Abstract base-class for all recorders. This class generates the 'RecordGroup', 'RecordGroupInd', and
     'RecordRow' indices used in output dataframes.
+
+    If the process option is set, the records are written by an instance of the recorder class in a child process,
+    started and stopped with the recorder thread, so that writing does not hold the GIL of the experiment process. The
+    recorder thread then only copies each record to the shared memory of the child process. See
+    :mod:`spherexlabtools.recorders.process`.
     """
 
     _rgroup_col_str = "RecordGroup"
@@ -29,9 +35,19 @@ class Recorder(QueueThread):
     _rgroupind_val_prepend_str = ''
     _rrow_val_prepend_str = ''
 
-    def __init__(self, cfg, exp, extension, merge=False, **kwargs):
+    def __init__(self, cfg, exp, extension, merge=False, process=False, shm_size=64 * 2 ** 20, **kwargs):
+        """ Initialize a recorder.
+
+        :param cfg: Configuration dictionary.
+        :param exp: Experiment object.
+        :param extension: Extension of the results file.
+        :param merge: Boolean indicating if the record tables are merged before they are written out.
+        :param process: Boolean indicating if the records are written in a child process.
+        :param shm_size: Size in bytes of the shared memory ring of the records sent to the child process.
+        """
         super().__init__(**kwargs)
         self.name = cfg["instance_name"]
+        self.recorder_process = RecorderProcess(self, cfg, shm_size) if process else None
         self.extension = extension
         self.opened_results = None
         self.record_group = None
@@ -62,10 +78,38 @@ class Recorder(QueueThread):
         self.results_path_changed = True
         self.results_path.sigValueChanged.connect(self.update_results_path_changed)
 
+    def startup(self):
+        """ Start the recorder process, if the recorder runs in a child process.
+        """
+        if self.recorder_process is not None:
+            self.recorder_process.start()
+
+    def execute(self):
+        # - the recorder process is stopped on the recorder thread, once no record is being sent - #
+        try:
+            super().execute()
+        finally:
+            if self.recorder_process is not None:
+                self.recorder_process.stop()
+
+    def pending(self):
+        """ Return the number of records sent to the recorder process that it has not handled yet.
+        """
+        return 0 if self.recorder_process is None else self.recorder_process.pending
+
     def handle(self, record):
         """ Update the record_group, record_group_ind, and record_row attributes, then call overridden methods to
-        write to the output file.
+        write to the output file. Records are only sent to the recorder process, if the recorder runs in one.
         """
+        if self.recorder_process is not None:
+            try:
+                self.recorder_process.send(record, self.results_path.value())
+            except RecorderProcessError:
+                logger.error('Recorder process %s has exited. Stopping the recorder: later records are not recorded.'
+                             % self.name)
+                self.stop()
+            return
+
         should_open, fp_exists = self.should_open()
         should_close = True if self.data_df is not None else False
         if should_open and should_close:
@@ -0,0 +1,87 @@
+""" Command line runner for unattended experiments. Loads an experiment configuration package without the gui, runs a
+procedure or a saved procedure sequence to completion, and exits. For example::
+
+    python -m spherexlabtools.run spherexlabtools.configs.mock heater_proc -p "Heater Voltage=2.5"
+    python -m spherexlabtools.run spherexlabtools.configs.spectral_cal SpectralCalProcedure -s sequence.txt --optimize
+
+The exit code is 0 if the procedure, or every step of the sequence, finished and 1 otherwise.
+"""
+import sys
+import time
+import logging
+import argparse
+import importlib
+
+import spherexlabtools.log as slt_log
+from spherexlabtools.experiment import Experiment
+from spherexlabtools.procedures import Procedure
+from spherexlabtools.sequence import read_sequence_file, typecast
+
+log_name = f"{slt_log.LOGGER_NAME}.{__name__.split('.')[-1]}"
+logger = logging.getLogger(log_name)
+
+
+def parse_args(argv=None):
+    """ Parse the command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog="python -m spherexlabtools.run",
+                                     description="Run a SPHERExLabTools procedure or procedure sequence without the "
+                                                 "gui.")
+    parser.add_argument("exp_pkg", help="Import name of the experiment configuration package.")
+    parser.add_argument("procedure", help="Instance name of the procedure to run.")
+    parser.add_argument("-p", "--param", action="append", default=[], metavar="NAME=VALUE",
+                        help="Procedure parameter to set before the run. May be given more than once. Values are "
+                             "typecast as in the sequencer.")
+    parser.add_argument("-s", "--sequence", default=None, metavar="PATH",
+                        help="Sequence file saved by the sequencer. The procedure is run once per step.")
+    parser.add_argument("--optimize", action="store_true",
+                        help="Optimize the order of the sequence with the sequence optimizer of the procedure "
+                             "controller configuration.")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Stop the run if it does not complete within this many seconds.")
+    parser.add_argument("--startup-profile", default=None, metavar="PATH",
+                        help="Write the startup profile of the experiment to a JSON file.")
+    parser.add_argument("--drain-timeout", type=float, default=60,
+                        help="Maximum time in seconds to wait for the recorders to write out queued records after the "
+                             "run.")
+    return parser.parse_args(argv)
+
+
+def parse_param(param):
+    """ Split a 'NAME=VALUE' command line parameter into its name and typecast value.
+    """
+    if "=" not in param:
+        raise ValueError("Invalid parameter %s! Parameters must be given as NAME=VALUE." % param)
+    name, value = param.split("=", 1)
+    return name.strip(), typecast(value.strip())
+
+
+def main(argv=None):
+    """ Run the command line interface.
+
+    :return: Exit code.
+    """
+    args = parse_args(argv)
+    params = dict(parse_param(p) for p in args.param)
+    sequence = read_sequence_file(args.sequence) if args.sequence is not None else None
+
+    exp_pkg = importlib.import_module(args.exp_pkg)
+    exp = Experiment(exp_pkg, headless=True, startup_profile=args.startup_profile)
+    exp.start()
+    t0 = time.perf_counter()
+    try:
+        status = exp.run_procedure(args.procedure, params=params, sequence=sequence, optimize=args.optimize,
+                                   timeout=args.timeout)
+        run_time = time.perf_counter() - t0
+        if not exp.wait_for_queues(args.drain_timeout):
+            logger.warning("Records were still queued after %.1f s." % args.drain_timeout)
+    finally:
+        exp.stop()
+        exp.kill_threads()
+    logger.info("%s %s in %.3f s. Records written out after %.3f s." %
+                (args.procedure, Procedure.STATUS_STRINGS[status], run_time, time.perf_counter() - t0))
+    return 0 if status == Procedure.FINISHED else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
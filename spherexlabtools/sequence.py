@@ -0,0 +1,349 @@
+""" This module implements the class :class:`.ParameterSequence`, a lazy representation of the procedure parameter
+sequences built by the :class:`SequenceUI <spherexlabtools.ui.sequence.SequenceUI>`, the function
+:func:`.parse_range` used to safely evaluate numpy range expressions entered in the sequencer, and the function
+:func:`.read_sequence_file` to build a sequence from a file saved by the sequencer without the user interface.
+
+A sequence is a concatenation of blocks, one per top-level node of the sequencer tree. Each block is the cartesian
+product of the values of every node in its subtree, taken in depth-first order so that the values of parent nodes
+vary slowest. Parameter dictionaries are computed on access from the index, so the length of a sequence and access
+to any index are independent of the number of combinations.
+
+The class :class:`.SequenceOptimizer` reorders the steps of a sequence to reduce the time spent on hardware
+transitions between steps, based on a cost model per parameter.
+"""
+import ast
+import bisect
+import operator
+import itertools
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class ParameterSequence(Sequence):
+    """ Lazy sequence of procedure parameter dictionaries.
+    """
+
+    def __init__(self, blocks):
+        """ Initialize a parameter sequence.
+
+        :param blocks: List of blocks, each of which is a list of (parameter name, values) tuples ordered from the
+                       slowest to the fastest varying parameter. Values that are not iterable, or are strings, are
+                       held constant over the block. When a parameter appears more than once in a block the later
+                       value is used.
+        """
+        self.blocks = []
+        self.offsets = [0]
+        for block in blocks:
+            names = [name for name, _ in block]
+            values = [vals if issubclass(type(vals), Iterable) and type(vals) is not str else [vals]
+                      for _, vals in block]
+            lengths = [len(vals) for vals in values]
+            self.blocks.append((names, values, lengths))
+            self.offsets.append(self.offsets[-1] + int(np.prod(lengths, dtype=object)))
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Sequence index %i out of range!' % index)
+
+        # - find the block, then decompose the index within the block into one index per parameter - #
+        b = bisect.bisect_right(self.offsets, index) - 1
+        names, values, lengths = self.blocks[b]
+        rem = index - self.offsets[b]
+        digits = [0 for _ in range(len(lengths))]
+        for i in range(len(lengths) - 1, -1, -1):
+            rem, digits[i] = divmod(rem, lengths[i])
+        return {names[i]: values[i][digits[i]] for i in range(len(names))}
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+    def column(self, name):
+        """ Return an object array of the values of a parameter at every index of the sequence. Indices at which the
+        parameter is not set hold None.
+        """
+        col = np.empty(len(self), dtype=object)
+        for b, (names, values, lengths) in enumerate(self.blocks):
+            o0, o1 = self.offsets[b], self.offsets[b + 1]
+            if o1 == o0 or name not in names:
+                continue
+            axis = len(names) - 1 - names[::-1].index(name)
+            vals = np.empty(lengths[axis], dtype=object)
+            vals[:] = list(values[axis])
+            inner = int(np.prod(lengths[axis + 1:], dtype=object))
+            col[o0:o1] = np.tile(np.repeat(vals, inner), (o1 - o0) // (inner * lengths[axis]))
+        return col
+
+    def iter_from(self, start):
+        """ Generate the parameter dictionaries from index start to the end of the sequence.
+        """
+        if start >= len(self):
+            return
+        b = bisect.bisect_right(self.offsets, start) - 1
+        skip = start - self.offsets[b]
+        for names, values, lengths in self.blocks[b:]:
+            combos = itertools.product(*values)
+            if skip:
+                combos = itertools.islice(combos, skip, None)
+                skip = 0
+            for combo in combos:
+                yield dict(zip(names, combo))
+
+
+# - numpy functions and operators allowed in range expressions - #
+RANGE_FUNCTIONS = {
+    'arange': np.arange,
+    'linspace': np.linspace,
+    'logspace': np.logspace,
+    'geomspace': np.geomspace,
+}
+RANGE_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+
+def parse_range(expr):
+    """ Safely evaluate a numpy range expression such as 'np.arange(0.75, 5.0, 0.01)' or
+    'np.linspace(1, 2, 11) * 1e-3'. Only numeric literals, arithmetic operators and the functions in RANGE_FUNCTIONS
+    are allowed.
+
+    :param expr: String expression.
+    :return: numpy array.
+    """
+    try:
+        tree = ast.parse(expr.strip(), mode='eval')
+        result = _eval_range_node(tree.body)
+    except (SyntaxError, ZeroDivisionError) as e:
+        raise ValueError('Invalid range expression %s: %s' % (expr, e))
+    if type(result) is not np.ndarray:
+        raise TypeError('Only numpy arrays are allowed for numpy commands.')
+    return result
+
+
+def _eval_range_node(node):
+    """ Recursively evaluate a node of a range expression.
+    """
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    elif isinstance(node, ast.UnaryOp) and type(node.op) in RANGE_OPERATORS:
+        return RANGE_OPERATORS[type(node.op)](_eval_range_node(node.operand))
+    elif isinstance(node, ast.BinOp) and type(node.op) in RANGE_OPERATORS:
+        return RANGE_OPERATORS[type(node.op)](_eval_range_node(node.left), _eval_range_node(node.right))
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and \
+            isinstance(node.func.value, ast.Name) and node.func.value.id in ('np', 'numpy') and \
+            node.func.attr in RANGE_FUNCTIONS:
+        args = [_eval_range_node(a) for a in node.args]
+        kwargs = {k.arg: _eval_range_node(k.value) for k in node.keywords if k.arg is not None}
+        if len(kwargs) != len(node.keywords):
+            raise ValueError('Keyword argument unpacking is not allowed in range expressions!')
+        return RANGE_FUNCTIONS[node.func.attr](*args, **kwargs)
+    raise ValueError('Unsupported element in range expression: %s' % ast.dump(node))
+
+
+def typecast(val):
+    """ Typecast a sequencer value from its original string type to a number, a list, or a numpy array from a range
+    expression. Other strings are returned unchanged.
+
+    :param val: Original string to cast.
+    """
+    result = val
+    sign = 1
+    if val.startswith("-"):
+        val = val[1:]
+        sign = -1
+    try:
+        result = sign * float(val)
+    except ValueError:
+        if val.startswith("[") and val.endswith("]"):
+            result = [typecast(v.strip()) for v in val[1:-1].split(",")]
+        elif "np" in val:
+            result = sign * parse_range(val)
+    return result
+
+
+def read_sequence_file(path):
+    """ Build a :class:`.ParameterSequence` from a sequence file written by the sequencer. Each line of the file
+    holds one node of the sequence tree as 'level: parameter name: value', indented with one tab per level below
+    the top level.
+
+    :param path: Path to the sequence file.
+    """
+    blocks = []
+    with open(path, "r") as f:
+        for line in f.readlines():
+            if len(line.strip()) == 0:
+                continue
+            split = line.split(":")
+            if not line.startswith("\t") or len(blocks) == 0:
+                blocks.append([])
+            blocks[-1].append((split[1].strip(), typecast(split[2].strip())))
+    return ParameterSequence(blocks)
+
+
+class ReorderedSequence(Sequence):
+    """ View of a sequence in a different order.
+    """
+
+    def __init__(self, base, order):
+        """ Initialize a reordered sequence.
+
+        :param base: Original sequence.
+        :param order: Integer array of indices into the original sequence.
+        """
+        self.base = base
+        self.order = np.asarray(order, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.base[int(self.order[index])]
+
+
+class SequenceOptimizer:
+    """ Reorders the steps of a procedure sequence to reduce the total hardware transition time between steps.
+
+    The cost model maps parameter names to the time in seconds to transition between two values of the parameter,
+    given as one of:
+
+        - a number: the time to change the parameter, independent of the values (e.g. a grating change).
+        - a dictionary with optional 'change' and 'rate' keys: a fixed time to change the parameter plus 'rate'
+          seconds per unit of difference between the values (e.g. wavelength or stage travel).
+        - a callable of two arrays of values returning an array of transition times.
+
+    Parameters that are not in the cost model are assumed to be free to change. Steps are sorted so that the most
+    costly parameters change least often, and the traversal direction of each parameter alternates between
+    consecutive groups of the slower parameters, so that a sweep continues from where the previous one ended
+    instead of returning to its start.
+
+    Required orderings are given as a list of parameter names. Steps are only reordered within contiguous runs of
+    the original sequence over which all of these parameters are constant, so their order of execution is preserved.
+    The reordering is only applied if it reduces the estimated transition time.
+    """
+
+    def __init__(self, costs, ordered=None):
+        """ Initialize a sequence optimizer.
+
+        :param costs: Dictionary cost model of the form {'parameter name': cost}.
+        :param ordered: List of parameter names whose order must be preserved.
+        """
+        self.costs = costs
+        self.ordered = [] if ordered is None else list(ordered)
+
+    def optimize(self, sequence):
+        """ Reorder a sequence.
+
+        :param sequence: Sequence of parameter dictionaries.
+        :return: Tuple of (reordered sequence, report dictionary). The report holds the 'original' and 'optimized'
+                 estimated transition times and the estimated time 'saved', in seconds.
+        """
+        n = len(sequence)
+        names = set(self.costs.keys()) | set(self.ordered)
+        columns = {name: self.get_column(sequence, name) for name in names}
+        original = self.transition_time(columns)
+        report = {'steps': n, 'original': original, 'optimized': original, 'saved': 0.0}
+        if n < 3:
+            return sequence, report
+
+        # - order the costed parameters from slowest to fastest varying by their cost over the full range - #
+        keys = []
+        for name in self.costs.keys():
+            codes, uniques = self.factorize(columns[name])
+            if len(uniques) < 2:
+                continue
+            span = self._cost(name, uniques[:1], uniques[-1:])
+            keys.append((float(np.nansum(span)), codes))
+        if len(keys) == 0:
+            return sequence, report
+        keys.sort(key=lambda k: -k[0])
+
+        # - number the contiguous runs over which the required ordering parameters are constant - #
+        segment = np.zeros(n, dtype=np.int64)
+        for name in self.ordered:
+            codes, _ = self.factorize(columns[name])
+            segment[1:] += np.cumsum(codes[1:] != codes[:-1])
+
+        # - serpentine ordering: reverse each key within every other group of the slower keys - #
+        sort_keys = [segment]
+        for _, codes in keys:
+            order = np.lexsort(sort_keys[::-1])
+            sorted_keys = np.stack([k[order] for k in sort_keys])
+            boundaries = np.any(sorted_keys[:, 1:] != sorted_keys[:, :-1], axis=0)
+            group = np.empty(n, dtype=np.int64)
+            group[order] = np.concatenate([[0], np.cumsum(boundaries)])
+            sort_keys.append(np.where(group % 2, -codes, codes))
+        sort_keys.append(np.arange(n))
+        order = np.lexsort(sort_keys[::-1])
+
+        optimized = self.transition_time({name: col[order] for name, col in columns.items()})
+        if optimized >= original:
+            return sequence, report
+        report.update({'optimized': optimized, 'saved': original - optimized})
+        return ReorderedSequence(sequence, order), report
+
+    def transition_time(self, columns):
+        """ Estimated total transition time in seconds of a sequence given as {'parameter name': column of values}.
+        """
+        total = 0.0
+        for name in self.costs.keys():
+            col = columns[name]
+            if len(col) < 2:
+                continue
+            total += float(np.sum(self._cost(name, col[:-1], col[1:])))
+        return total
+
+    def _cost(self, name, a, b):
+        """ Array of transition times of a parameter from the values in a to the values in b.
+        """
+        cost = self.costs[name]
+        if callable(cost):
+            return np.asarray(cost(a, b), dtype=np.float64)
+        changed = np.asarray(a != b, dtype=bool)
+        if not isinstance(cost, dict):
+            return changed * float(cost)
+        result = changed * float(cost.get('change', 0))
+        if cost.get('rate', 0):
+            a_num = pd.to_numeric(pd.Series(a), errors='coerce').to_numpy(dtype=np.float64)
+            b_num = pd.to_numeric(pd.Series(b), errors='coerce').to_numpy(dtype=np.float64)
+            result = result + float(cost['rate']) * np.nan_to_num(np.abs(b_num - a_num))
+        return result
+
+    @staticmethod
+    def get_column(sequence, name):
+        """ Object array of the values of a parameter over a sequence.
+        """
+        if isinstance(sequence, ParameterSequence):
+            return sequence.column(name)
+        col = np.empty(len(sequence), dtype=object)
+        col[:] = [step.get(name) for step in sequence]
+        return col
+
+    @staticmethod
+    def factorize(col):
+        """ Integer codes of the values in a column, and the object array of unique values. If all the values are
+        numeric the codes follow their numeric order, otherwise the order in which they first appear. Missing values
+        have the code -1.
+        """
+        codes, uniques = pd.factorize(col)
+        uniques = np.asarray(uniques, dtype=object)
+        if all(isinstance(v, (int, float, np.number)) and not isinstance(v, bool) for v in uniques):
+            rank = np.argsort(np.argsort(uniques.astype(np.float64), kind='stable'))
+            codes = np.where(codes < 0, codes, rank[codes])
+            uniques = uniques[np.argsort(rank)]
+        return codes, uniques
@@ -0,0 +1,61 @@
+""" This module implements the class :class:`.SettleDetector`, which waits for an instrument reading to settle rather
+than sleeping for a fixed time.
+
+A reading is considered settled once every sample taken over the last window seconds lies within a band of width
+max(tolerance, rel_tolerance * |mean|). If the reading does not settle within the timeout, the wait returns anyway
+so that a procedure never waits longer than the fixed sleep it replaces.
+"""
+import time
+from collections import deque
+
+
+class SettleDetector:
+    """ Polls a reading until it is stable over a time window, or until a timeout.
+    """
+
+    def __init__(self, reader, tolerance=0, rel_tolerance=0.01, window=1.0, timeout=10.0, interval=0.1,
+                 min_samples=3):
+        """ Initialize a settle detector.
+
+        :param reader: Callable with no arguments returning the current reading as a number.
+        :param tolerance: Absolute width of the band the samples in the window must lie within.
+        :param rel_tolerance: Width of the band relative to the mean of the samples in the window. The larger of the
+                              absolute and relative widths is used.
+        :param window: Time in seconds over which the reading must be stable.
+        :param timeout: Maximum time in seconds to wait.
+        :param interval: Time in seconds between readings.
+        :param min_samples: Minimum number of samples in the window.
+        """
+        self.reader = reader
+        self.tolerance = tolerance
+        self.rel_tolerance = rel_tolerance
+        self.window = window
+        self.timeout = timeout
+        self.interval = interval
+        self.min_samples = min_samples
+
+    def wait(self, should_stop=None):
+        """ Block until the reading settles, the timeout expires, or should_stop() returns True.
+
+        :param should_stop: Optional callable with no arguments used to abort the wait.
+        :return: Tuple of (settled boolean, elapsed time in seconds, last reading).
+        """
+        t0 = time.perf_counter()
+        samples = deque()
+        value = None
+        while True:
+            now = time.perf_counter()
+            value = float(self.reader())
+            samples.append((now, value))
+            while now - samples[0][0] > self.window:
+                samples.popleft()
+
+            elapsed = now - t0
+            if elapsed >= self.window and len(samples) >= self.min_samples:
+                vals = [v for _, v in samples]
+                band = max(self.tolerance, self.rel_tolerance * abs(sum(vals) / len(vals)))
+                if max(vals) - min(vals) <= band:
+                    return True, elapsed, value
+            if elapsed >= self.timeout or (should_stop is not None and should_stop()):
+                return False, elapsed, value
+            time.sleep(max(0, self.interval - (time.perf_counter() - now)))
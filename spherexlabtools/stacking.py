@@ -0,0 +1,154 @@
+""" This module implements the class :class:`.FrameStacker`, which combines a sequence of camera frames into a single
+stacked image using preallocated buffers and in-place updates.
+
+Three stacking methods are supported:
+
+    - 'mean': running sum accumulated in place, divided by the frame count at the end.
+    - 'sigma_clip': mean of each pixel after iteratively rejecting samples further than clip_sigma standard deviations
+      from the pixel mean.
+    - 'median': per-pixel median of the frames.
+
+The 'sigma_clip' and 'median' methods hold the raw frames in a preallocated cube of the native frame dtype and reduce
+it in chunks of rows. The number of rows of a chunk is derived from a byte budget and the frame count, so that each
+float working array stays within the budget however many frames are stacked.
+"""
+import logging
+
+import numpy as np
+
+import spherexlabtools.log as slt_log
+
+log_name = f"{slt_log.LOGGER_NAME}.{__name__.split('.')[-1]}"
+logger = logging.getLogger(log_name)
+
+
+class FrameStacker:
+    """ Reusable frame stacking engine. Buffers are allocated once and reused between stacks as long as the frame
+    shape, dtype and frame count do not change.
+    """
+
+    METHODS = ('mean', 'sigma_clip', 'median')
+
+    def __init__(self, frames, method='mean', clip_sigma=3.0, clip_iters=3, chunk_bytes=2 ** 25):
+        """ Initialize a frame stacker.
+
+        :param frames: Number of frames in a full stack.
+        :param method: One of :attr:`FrameStacker.METHODS`.
+        :param clip_sigma: Rejection threshold in standard deviations for the 'sigma_clip' method.
+        :param clip_iters: Maximum number of rejection iterations for the 'sigma_clip' method.
+        :param chunk_bytes: Approximate size in bytes of each float64 working array used by the 'sigma_clip' and
+                            'median' methods. Chunks are at least one image row.
+        """
+        if method not in self.METHODS:
+            raise ValueError('Invalid stacking method %s. Must be one of %s' % (method, str(self.METHODS)))
+        self.frames = int(frames)
+        self.method = method
+        self.clip_sigma = clip_sigma
+        self.clip_iters = clip_iters
+        self.chunk_bytes = chunk_bytes
+        self.count = 0
+
+        # - preallocated buffers - #
+        self._shape = None
+        self._dtype = None
+        self._sum = None
+        self._cube = None
+
+    def reset(self):
+        """ Start a new stack without releasing the preallocated buffers.
+        """
+        self.count = 0
+        if self._sum is not None:
+            self._sum.fill(0)
+
+    def add(self, frame):
+        """ Add a frame to the current stack. The buffers are reallocated on the first frame of a stack if the frame
+        shape, dtype or frame count has changed.
+
+        :param frame: 2-dimensional numpy array.
+        """
+        if self.count >= self.frames:
+            raise IndexError('Stack is already full with %i frames!' % self.frames)
+        if frame.shape != self._shape or frame.dtype != self._dtype or \
+                (self._cube is not None and self._cube.shape[0] != self.frames):
+            if self.count > 0:
+                raise ValueError('Frame of shape %s and dtype %s does not match the %i frames of shape %s and dtype %s '
+                                 'in the current stack!' % (frame.shape, frame.dtype, self.count, self._shape,
+                                                            self._dtype))
+            self._allocate(frame.shape, frame.dtype)
+
+        np.add(self._sum, frame, out=self._sum)
+        if self._cube is not None:
+            self._cube[self.count] = frame
+        self.count += 1
+
+    def preview(self):
+        """ Return the running mean of the frames added so far as a new array.
+        """
+        if self.count == 0:
+            return None
+        return self._sum * (1 / self.count)
+
+    def result(self):
+        """ Reduce the frames added so far into the final stacked image.
+
+        :return: New float64 array holding the stacked image.
+        """
+        if self.count == 0:
+            raise ValueError('No frames have been added to the stack!')
+        if self.method == 'mean':
+            return self._sum / self.count
+
+        out = np.empty(self._shape, dtype=np.float64)
+        cube = self._cube[:self.count]
+        rows = self.chunk_rows()
+        for r0 in range(0, self._shape[0], rows):
+            r1 = min(r0 + rows, self._shape[0])
+            if self.method == 'median':
+                np.median(cube[:, r0:r1], axis=0, out=out[r0:r1])
+            else:
+                out[r0:r1] = self._clipped_mean(cube[:, r0:r1])
+        return out
+
+    def chunk_rows(self):
+        """ Return the number of image rows reduced at a time, so that a float64 chunk of the current stack fits in
+        chunk_bytes.
+        """
+        row_bytes = self.count * int(np.prod(self._shape[1:])) * 8
+        return max(1, int(self.chunk_bytes // max(1, row_bytes)))
+
+    def _clipped_mean(self, chunk):
+        """ Sigma-clipped mean along the frame axis of a chunk of the frame cube.
+        """
+        data = chunk.astype(np.float64)
+        mask = np.ones(data.shape, dtype=bool)
+        n = np.full(data.shape[1:], data.shape[0], dtype=np.float64)
+        mean = data.mean(axis=0)
+        resid = np.empty_like(data)
+        for _ in range(self.clip_iters):
+            np.subtract(data, mean, out=resid)
+            np.multiply(resid, mask, out=resid)
+            std = np.sqrt(np.einsum('ijk,ijk->jk', resid, resid) / n)
+            np.abs(resid, out=resid)
+            new_mask = resid <= self.clip_sigma * std
+            np.logical_and(new_mask, mask, out=new_mask)
+            if np.array_equal(new_mask, mask):
+                break
+            mask = new_mask
+            n = mask.sum(axis=0, dtype=np.float64)
+            np.maximum(n, 1, out=n)
+            mean = np.einsum('ijk,ijk->jk', data, mask) / n
+        return mean
+
+    def _allocate(self, shape, dtype):
+        """ (Re)allocate the stacking buffers for a new frame shape or dtype.
+        """
+        logger.debug('Allocating %s stack buffers for %i frames of shape %s' % (self.method, self.frames, shape))
+        self._shape = shape
+        self._dtype = dtype
+        self._sum = np.zeros(shape, dtype=np.float64)
+        if self.method == 'mean':
+            self._cube = None
+        else:
+            self._cube = np.empty((self.frames,) + tuple(shape), dtype=dtype)
+        self.count = 0
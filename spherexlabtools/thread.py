@@ -64,27 +64,115 @@ class StoppableThread(Thread):
 ######################################################################################################
 
 
+class WorkerRun:
+    """ A single run request executed by a :class:`.WorkerThread`. Exposes the same stop interface as the
+        :class:`.StoppableThread`, and is alive from the time it is queued until its target returns.
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self._should_stop = InterruptableEvent()
+        self._should_stop.clear()
+        self._done = Event()
+
+    def stop(self):
+        self._should_stop.set()
+
+    def should_stop(self):
+        return self._should_stop.is_set()
+
+    def is_alive(self):
+        return not self._done.is_set()
+
+    def join(self, timeout=None):
+        """ Block until the run has completed.
+
+        :param timeout: Optional timeout in seconds.
+        """
+        self._done.wait(timeout)
+
+    def __repr__(self):
+        return "<{}(should_stop={})>".format(
+            self.__class__.__name__, self.should_stop())
+
+
+class WorkerThread(Thread):
+    """ Long-lived daemon thread that executes :class:`.WorkerRun` requests from a queue, so that repeated runs do
+        not pay for thread creation. Runs that are stopped before they are picked up are skipped.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("daemon", True)
+        super().__init__(**kwargs)
+        self.requests = queue.Queue()
+
+    def submit(self, target):
+        """ Queue a run of target and return its :class:`.WorkerRun` handle.
+        """
+        run = WorkerRun(target)
+        self.requests.put(run)
+        return run
+
+    def close(self):
+        """ Exit the worker once the queued runs have completed.
+        """
+        self.requests.put(None)
+
+    def run(self):
+        while True:
+            run = self.requests.get()
+            if run is None:
+                break
+            try:
+                if not run.should_stop():
+                    run.target()
+            except Exception:
+                logger.exception("Worker thread %s run failed" % self.name)
+            finally:
+                run._done.set()
+
+
 class StoppableReusableThread:
     """ Wrapper around the :class:`.StoppableThread` which creates new Thread instances every time
         it is run. This abstracts away the need to create new thread instances each time.
+
+        If the persistent attribute is set, runs are instead submitted to a single long-lived
+        :class:`.WorkerThread`, and the thread attribute holds the :class:`.WorkerRun` of the latest run.
     """
 
+    persistent = False
+
     def __init__(self, **kwargs):
         self.thread = None
+        self.worker = None
         self.running = False
 
     def start(self, **tkwargs):
         """ Start running a thread, assuming it is not already running.
 
-        :param tkwargs: Key-word arguments passed to the :py:class:`StoppableThread` instantiation.
+        :param tkwargs: Key-word arguments passed to the :py:class:`StoppableThread` instantiation, or to the
+                        :class:`.WorkerThread` instantiation when the worker is first created.
         """
         if self.thread is None or not self.thread.is_alive():
-            self.thread = StoppableThread(target=self.run, **tkwargs)
-            self.thread.start()
+            if self.persistent:
+                if self.worker is None or not self.worker.is_alive():
+                    self.worker = WorkerThread(**tkwargs)
+                    self.worker.start()
+                self.thread = self.worker.submit(self.run)
+            else:
+                self.thread = StoppableThread(target=self.run, **tkwargs)
+                self.thread.start()
             self.running = True
         else:
             raise RuntimeError("Thread already running!")
 
+    def close_worker(self):
+        """ Exit the persistent worker thread, if there is one, once its current run has completed.
+        """
+        if self.worker is not None:
+            self.worker.close()
+            self.worker = None
+
     def run(self):
         """ Call the thread execution methods, which should be overridden in subclasses.
         """
@@ -108,6 +196,16 @@ class StoppableReusableThread:
         """
         return self.thread.should_stop()
 
+    def wait(self, timeout=None):
+        """ Block until the current thread has exited.
+
+        :param timeout: Optional timeout in seconds.
+        """
+        if isinstance(self.thread, Thread):
+            Thread.join(self.thread, timeout)
+        elif self.thread is not None:
+            self.thread.join(timeout)
+
     def startup(self):
         """ Initialize thread state.
         """
@@ -143,9 +241,12 @@ class QueueThread(StoppableReusableThread):
         while not self.thread.should_stop():
             try:
                 record = self.queue.get(timeout=self.timeout)
-                self.handle(record)
             except queue.Empty:
-                pass
+                continue
+            try:
+                self.handle(record)
+            finally:
+                self.queue.task_done()
 
     def handle(self, record):
         """ Method called to process a record in the queue. Must be overridden in subclasses.
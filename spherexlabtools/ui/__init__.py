@@ -1,4 +1,5 @@
 from .top import TopUI
+from .log import LogWidget
 from .record import RecordUI
 from .sequence import SequenceUI
 from .view import LineViewerWidget, ImageViewerWidget
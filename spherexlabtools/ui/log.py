@@ -0,0 +1,213 @@
+""" This module implements the log window of the top-level interface:
+
+    - :class:`.LogModel`: List model holding the most recent log lines in a ring of fixed size.
+    - :class:`.LogFilterModel`: Proxy model filtering the log lines by level and logger name.
+    - :class:`.LogWidget`: List view of the log with the filter controls.
+
+The list view only renders the lines in view, so the time to append to or filter the log does not grow with the length
+of the run. Lines that have left the ring are still in the log file, which is read on demand from the widget.
+"""
+import os
+import re
+import logging
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+import spherexlabtools.log as slt_log
+
+LEVEL_NAMES = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+LOG_LINE_RE = re.compile(r"^\[.*?\] \[(\w+)::(.*?)\] ")
+
+
+class LogModel(QtCore.QAbstractListModel):
+    """ List model of the most recent log lines. Each entry of the log is split into lines of (level number, logger
+    name, text), and the oldest lines are removed once max_lines is reached.
+    """
+
+    def __init__(self, max_lines=10000, parent=None):
+        """ Initialize a log model.
+
+        :param max_lines: Maximum number of lines held by the model.
+        """
+        super().__init__(parent)
+        self.max_lines = max_lines
+        self.lines = []
+        self.removed = 0
+        self.warning_brush = QtGui.QBrush(QtGui.QColor("#b36b00"))
+        self.error_brush = QtGui.QBrush(QtGui.QColor("#c00000"))
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.lines)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        levelno, name, text = self.lines[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return text
+        if role == QtCore.Qt.ForegroundRole:
+            if levelno >= logging.ERROR:
+                return self.error_brush
+            if levelno >= logging.WARNING:
+                return self.warning_brush
+        return None
+
+    def append(self, entries):
+        """ Append log entries to the model.
+
+        :param entries: List of (level number, logger name, formatted message) entries.
+        """
+        lines = [(levelno, name, line) for levelno, name, text in entries for line in text.split("\n")]
+        if len(lines) > self.max_lines:
+            self.removed += len(lines) - self.max_lines
+            lines = lines[-self.max_lines:]
+        if len(lines) == 0:
+            return
+
+        # - remove the oldest lines from the ring - #
+        overflow = len(self.lines) + len(lines) - self.max_lines
+        if overflow > 0:
+            self.beginRemoveRows(QtCore.QModelIndex(), 0, overflow - 1)
+            del self.lines[:overflow]
+            self.endRemoveRows()
+            self.removed += overflow
+
+        self.beginInsertRows(QtCore.QModelIndex(), len(self.lines), len(self.lines) + len(lines) - 1)
+        self.lines.extend(lines)
+        self.endInsertRows()
+
+
+class LogFilterModel(QtCore.QSortFilterProxyModel):
+    """ Proxy model of a :class:`.LogModel` accepting the lines at or above a level, from loggers whose name contains
+    a given string.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.min_level = logging.DEBUG
+        self.logger_filter = ""
+
+    def set_filter(self, min_level=None, logger_filter=None):
+        """ Update the filter. Arguments left as None are unchanged.
+        """
+        if min_level is not None:
+            self.min_level = min_level
+        if logger_filter is not None:
+            self.logger_filter = logger_filter.strip()
+        self.invalidateFilter()
+
+    def accepts(self, levelno, name):
+        """ Return True if a line of level number levelno from the logger name passes the filter.
+        """
+        return levelno >= self.min_level and (self.logger_filter == "" or self.logger_filter in name)
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        levelno, name, _ = self.sourceModel().lines[source_row]
+        return self.accepts(levelno, name)
+
+
+class LogWidget(QtWidgets.QWidget):
+    """ Log window of the top-level interface, with controls to filter the log by level and logger name and to open
+    the log file.
+    """
+
+    def __init__(self, max_lines=10000, max_file_bytes=50000000, **kwargs):
+        """ Initialize a log widget.
+
+        :param max_lines: Maximum number of lines held in the log window.
+        :param max_file_bytes: Maximum number of bytes read from the end of the log file when it is opened.
+        """
+        QtWidgets.QWidget.__init__(self, **kwargs)
+        self.max_file_bytes = max_file_bytes
+        self.model = LogModel(max_lines=max_lines, parent=self)
+        self.filter_model = LogFilterModel(parent=self)
+        self.filter_model.setSourceModel(self.model)
+        self.file_window = None
+
+        # - filter controls - #
+        self.level_select = QtWidgets.QComboBox()
+        self.level_select.addItems(LEVEL_NAMES)
+        self.logger_select = QtWidgets.QLineEdit()
+        self.logger_select.setPlaceholderText("Logger name contains...")
+        self.file_button = QtWidgets.QPushButton("Open Log File")
+        controls = QtWidgets.QHBoxLayout()
+        controls.addWidget(QtWidgets.QLabel("Level:"))
+        controls.addWidget(self.level_select)
+        controls.addWidget(QtWidgets.QLabel("Logger:"))
+        controls.addWidget(self.logger_select)
+        controls.addStretch()
+        controls.addWidget(self.file_button)
+
+        # - list view, only the lines in view are rendered - #
+        self.view = QtWidgets.QListView()
+        self.view.setModel(self.filter_model)
+        self.view.setUniformItemSizes(True)
+        self.view.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.view.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self.ver_scrollbar = self.view.verticalScrollBar()
+
+        self.layout = QtWidgets.QVBoxLayout()
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.layout.addLayout(controls)
+        self.layout.addWidget(self.view)
+        self.setLayout(self.layout)
+
+        self.level_select.currentTextChanged.connect(
+            lambda level: self.filter_model.set_filter(min_level=logging.getLevelName(level)))
+        self.logger_select.textChanged.connect(lambda text: self.filter_model.set_filter(logger_filter=text))
+        self.file_button.clicked.connect(self.open_log_file)
+
+    def append(self, entries):
+        """ Append log entries to the log window. The view follows the end of the log if it was scrolled to within 10
+        lines of the end.
+
+        :param entries: List of (level number, logger name, formatted message) entries.
+        """
+        scroll = self.ver_scrollbar.maximum() - self.ver_scrollbar.value() <= 10
+        self.model.append(entries)
+        if scroll:
+            self.view.scrollToBottom()
+
+    def read_log_file(self):
+        """ Read the end of the log file, up to max_file_bytes, and return the lines passing the current filter.
+        Continuation lines, e.g. of tracebacks, are filtered with the line of the record they belong to.
+        """
+        with open(slt_log.LOGGER_FILE_NAME, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - self.max_file_bytes))
+            text = f.read().decode(errors="replace")
+        lines = text.splitlines()
+        if size > self.max_file_bytes:
+            lines = lines[1:]
+        out = []
+        keep = False
+        for line in lines:
+            match = LOG_LINE_RE.match(line)
+            if match is not None:
+                levelno = logging.getLevelName(match.group(1))
+                levelno = levelno if isinstance(levelno, int) else logging.NOTSET
+                keep = self.filter_model.accepts(levelno, match.group(2))
+            if keep:
+                out.append(line)
+        return out
+
+    def open_log_file(self):
+        """ Open a window showing the end of the log file, filtered as the log window.
+        """
+        try:
+            lines = self.read_log_file()
+        except OSError as e:
+            QtWidgets.QMessageBox.warning(self, "Log File", "Could not read %s: %s" % (slt_log.LOGGER_FILE_NAME, e))
+            return
+        if self.file_window is None:
+            self.file_window = QtWidgets.QPlainTextEdit()
+            self.file_window.setReadOnly(True)
+            self.file_window.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+            self.file_window.setFont(self.view.font())
+            self.file_window.resize(1000, 600)
+        self.file_window.setWindowTitle(os.path.abspath(slt_log.LOGGER_FILE_NAME))
+        self.file_window.setPlainText("\n".join(lines))
+        self.file_window.moveCursor(QtGui.QTextCursor.End)
+        self.file_window.show()
+        self.file_window.raise_()
@@ -2,12 +2,12 @@
 """
 import os
 
-import numpy as np
 from PyQt5 import QtCore
-from collections.abc import Iterable
 import pyqtgraph.parametertree.parameterTypes as pTypes
 from pyqtgraph.parametertree import Parameter
 
+from spherexlabtools.sequence import ParameterSequence, typecast
+
 
 class DuplicateParameterError(Exception):
     pass
@@ -108,14 +108,16 @@ class SequenceUI(pTypes.GroupParameter):
     pause_proc_sequence = QtCore.pyqtSignal()
     abort_proc_sequence = QtCore.pyqtSignal()
 
-    def __init__(self, params, **opts):
+    def __init__(self, params, optimize=False, **opts):
         """ Initialize the sequencer.
 
         :param: params: Parameters to sequence through.
+        :param: optimize: Boolean to indicate if an option to optimize the order of the sequence should be shown.
         """
         opts["name"] = "Procedure Sequencer"
         opts["type"] = "group"
         self.sequence_group = SequenceGroup(params)
+        self.optimize_order = Parameter.create(name="Optimize Order", type="bool", value=optimize, visible=optimize)
         self.start_sequence = Parameter.create(name="Start Procedure Sequence", type="action")
         self.pause_sequence = Parameter.create(name="Pause Procedure Sequence", type="action")
         self.stop_sequence = Parameter.create(name="Abort Procedure Sequence", type="action")
@@ -125,8 +127,8 @@ class SequenceUI(pTypes.GroupParameter):
         self.load_sequence = Parameter.create(name="Load Sequence", type="action", children=[
             {"name": "Load Path", "type": "file", "value": os.path.join(os.getcwd(), 'sequence.txt')}
         ])
-        self.base_children = [self.sequence_group, self.start_sequence, self.pause_sequence, self.stop_sequence,
-                              self.save_sequence, self.load_sequence]
+        self.base_children = [self.sequence_group, self.optimize_order, self.start_sequence, self.pause_sequence,
+                              self.stop_sequence, self.save_sequence, self.load_sequence]
         opts["children"] = self.base_children
         pTypes.GroupParameter.__init__(self, **opts)
 
@@ -138,39 +140,32 @@ class SequenceUI(pTypes.GroupParameter):
         self.load_sequence.sigActivated.connect(self.input_sequence)
 
     def build_sequence(self):
-        """ Build a procedure sequence from the sequencer parameters.
+        """ Build a procedure sequence from the sequencer parameters. The sequence is emitted as a
+        :class:`.ParameterSequence`, which computes the parameters of each procedure on access rather than expanding
+        every combination up front.
         """
-        sequence = []
         # get the sequence group children values and remove the buttons #
         seq_dict = self.sequence_group.getValues()
         seq_dict.pop("Level")
         seq_dict.pop("Remove")
 
-        # build sequence parameters #
+        # build one block of (parameter, values) axes per top level node #
+        blocks = []
         for node in seq_dict.items():
-            procs = [{}]
-            procs = self.build_node_sequence(node, sequence, procs)
-            sequence.extend(procs)
-
-        # strip levels from each procedure dictionary key #
-        for i in range(len(sequence)):
-            proc_dict = sequence[i]
-            new_dict = {key.split(SequenceGroup.level_identifier)[-1]: val for key, val in proc_dict.items()}
-            sequence[i] = new_dict
+            axes = []
+            self.build_node_axes(node, axes)
+            blocks.append(axes)
 
-        self.new_sequence.emit(seq_dict, sequence)
+        self.new_sequence.emit(seq_dict, ParameterSequence(blocks))
 
-    def build_node_sequence(self, node, sequence, procs):
-        """ Build procedure sequence for a single parameter tree node.
+    def build_node_axes(self, node, axes):
+        """ Append the (parameter, values) axes of a single parameter tree node and its children to axes, in
+        depth-first order.
         """
-        top_key = node[0]
-        top_val = self.typecast(node[1][0])
-        procs = self.update_procs_list(procs, top_key, top_val)
-        children = node[1][1].items()
-        for c in children:
-            procs = self.build_node_sequence(c, sequence, procs)
-
-        return procs
+        key = node[0].split(SequenceGroup.level_identifier)[-1]
+        axes.append((key, self.typecast(node[1][0])))
+        for c in node[1][1].items():
+            self.build_node_axes(c, axes)
 
     def write_sequence(self):
         """ Save the current sequence out to a .txt file
@@ -216,50 +211,13 @@ class SequenceUI(pTypes.GroupParameter):
                 val = typ_val_split[2].strip()
                 self.sequence_group.addNew(typ=typ, level=level, val=val)
 
-    @staticmethod
-    def update_procs_list(procs, key, val):
-        """ Update list of procedures based on data values of the given node.
-        """
-        if issubclass(type(val), Iterable) and type(val) is not str:
-            new_procs = []
-            for proc in procs:
-                proc_list = [{key: v} for v in val]
-                for d in proc_list:
-                    d.update(proc)
-                new_procs.extend(proc_list)
-        else:
-            for p in procs:
-                p.update({key: val})
-            new_procs = procs
-
-        return new_procs
-
     def typecast(self, val):
         """ Method to typecast an item value from its original string type to an iterable, or numeric
             type.
 
         :param: val: Original string to cast.
         """
-        typecast = val
-        sign = 1
-        if val.startswith("-"):
-            val = val[1:]
-            sign = -1
-        try:
-            typecast = sign * float(val)
-        except ValueError:
-            if val.startswith("[") and val.endswith("]"):
-                val_list = val[1:-1].split(",")
-                for i in range(len(val_list)):
-                    val_list[i] = self.typecast(val_list[i].strip())
-                typecast = val_list
-            elif "np" in val:
-                np_array = eval(val)
-                if type(np_array) is not np.ndarray:
-                    raise TypeError("Only numpy arrays are allowed for numpy commands.")
-                typecast = np_array
-
-        return typecast
+        return typecast(val)
 
     def write_dict(self, dct, child):
         children = child.children()
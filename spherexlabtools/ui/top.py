@@ -10,6 +10,8 @@
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 
+from .log import LogWidget
+
 
 class TopQt(object):
     def setupUi(self, Form):
@@ -105,26 +107,27 @@ class TopUI(TopQt, QtCore.QObject):
 
     ui_log_signal = QtCore.pyqtSignal(object, name="UI Log Signal")
 
-    def __init__(self, top_widget):
+    def __init__(self, top_widget, max_log_lines=10000):
         super().__init__()
         self.setupUi(top_widget)
-        self.ver_scrollbar = self.logBrowser.verticalScrollBar()
-        self.hor_scrollbar = self.logBrowser.horizontalScrollBar()
         self.ui_log_signal.connect(self.log)
         font = QtGui.QFont()
         font.setPointSize(16)
-        self.logBrowser.setFont(font)
 
-    def log(self, msg):
+        # - the log browser keeps the banner, log messages are written to the log widget below it - #
+        self.log_widget = LogWidget(max_lines=max_log_lines)
+        self.log_widget.view.setFont(font)
+        self.gridLayout_3.removeWidget(self.logBrowser)
+        self.log_splitter = QtWidgets.QSplitter(QtCore.Qt.Vertical)
+        self.log_splitter.addWidget(self.logBrowser)
+        self.log_splitter.addWidget(self.log_widget)
+        self.log_splitter.setSizes([100, 300])
+        self.gridLayout_3.addWidget(self.log_splitter, 0, 0, 1, 1)
+
+    def log(self, entries):
         """ This method allows logging of formatted log messaged created by the logging package to the log
         interface.
 
-        :param msg: String message to write to the log window.
+        :param entries: List of (level number, logger name, formatted message) entries to write to the log window.
         """
-        self.logBrowser.append(msg)
-        scroll = self.ver_scrollbar.maximum() - self.ver_scrollbar.value() <= 10
-        if scroll:
-            self.ver_scrollbar.setValue(self.ver_scrollbar.maximum())
-            self.hor_scrollbar.setValue(0)
-
-
+        self.log_widget.append(entries)
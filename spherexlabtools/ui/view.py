@@ -9,7 +9,7 @@
 """
 import datetime
 import pyqtgraph as pg
-from PyQt5 import QtWidgets
+from PyQt5 import QtWidgets, QtCore
 
 
 class ViewerWidget(QtWidgets.QWidget):
@@ -36,16 +36,33 @@ class LineViewerWidget(ViewerWidget):
     """ Embeds a line plot within the GraphicsLayoutWidget.
     """
 
+    view_changed = QtCore.pyqtSignal(object)
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.plot_item = self.graphics_layout.addPlot(row=0, col=0)
         self.legend_item = self.plot_item.addLegend()
         self.curve_items = {}
+        view_box = self.plot_item.getViewBox()
+        view_box.sigXRangeChanged.connect(self.emit_view)
+        view_box.sigResized.connect(self.emit_view)
+
+    def emit_view(self, *args):
+        """ Report the x range and pixel width of the plot so that viewers can decimate lines to it. The x range is
+        reported as (None, None) while the x axis autoranges, so that the whole buffer is displayed.
+        """
+        view_box = self.plot_item.getViewBox()
+        width = int(view_box.width())
+        if view_box.autoRangeEnabled()[0]:
+            self.view_changed.emit((None, None, width))
+        else:
+            x0, x1 = view_box.viewRange()[0]
+            self.view_changed.emit((x0, x1, width))
 
     def update(self, plot_dict):
         """ Updates the plot_item in the graphics layout with data transferred in the plot_dict.
 
-        :param plot_dict: Dictionary of the following form: {'name of line': ([array of data], 'color of the line')}
+        :param plot_dict: Dictionary of the following form: {'name of line': ([x data], [y data], 'color of the line')}
         """
         new_curve_names = list(plot_dict.keys())
 
@@ -58,18 +75,20 @@ class LineViewerWidget(ViewerWidget):
 
         # - update the curve items - #
         for curve_name in new_curve_names:
-            data, pen_color = plot_dict[curve_name]
+            x, y, pen_color = plot_dict[curve_name]
             if curve_name not in self.curve_items.keys():
-                curve_item = pg.PlotCurveItem(name=curve_name, pen=pen_color)
+                curve_item = pg.PlotCurveItem(name=curve_name, pen=pen_color, connect='finite')
                 self.curve_items[curve_name] = curve_item
                 self.plot_item.addItem(curve_item)
-            self.curve_items[curve_name].setData(data)
+            self.curve_items[curve_name].setData(x=x, y=y)
 
 
 class ImageViewerWidget(ViewerWidget):
     """ Embeds an image display into the GraphicsLayoutWidget.
     """
 
+    display_shape_changed = QtCore.pyqtSignal(object)
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.view = self.graphics_layout.addViewBox()
@@ -80,7 +99,18 @@ class ImageViewerWidget(ViewerWidget):
     def update(self, img):
         """ Updates the image displayed in the image item display.
 
-        :param img: 2-dimensional array of image data.
+        :param img: Dictionary with the 2-dimensional array of (possibly downsampled) image data under 'data', the
+                    full resolution frame shape under 'shape' and the ImageItem.setImage() kwargs under
+                    'display_kwargs'.
         """
         self.img.setImage(img['data'], **img['display_kwargs'])
+        # - keep the image in full resolution pixel coordinates regardless of the downsampling - #
+        rows, cols = img.get('shape', img['data'].shape)
+        self.img.setRect(QtCore.QRectF(0, 0, cols, rows))
 
+    def resizeEvent(self, event):
+        """ Report the new (rows, columns) pixel size of the display so that viewers can reduce frames to it.
+        """
+        super().resizeEvent(event)
+        size = self.graphics_layout.size()
+        self.display_shape_changed.emit((size.height(), size.width()))
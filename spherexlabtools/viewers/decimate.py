@@ -0,0 +1,178 @@
+""" This module implements the class :class:`.MinMaxBuffer`, a fixed capacity ring buffer of multi-column samples that
+produces min/max decimated series for line plots.
+
+Samples are addressed by an absolute sample index that increases monotonically as samples are appended. Alongside the
+raw samples, the buffer keeps the minimum and maximum of every block of block_size samples aligned to the absolute
+index. These are updated incrementally on append, so a decimated series for any view range and pixel width is built
+from the block extrema in time proportional to the number of blocks in view, and only the partial buckets at the edges
+of the view are reduced from raw samples.
+"""
+import math
+
+import numpy as np
+
+
+class MinMaxBuffer:
+    """ Ring buffer of samples with incrementally maintained block extrema for min/max decimation.
+    """
+
+    def __init__(self, capacity, columns, block_size=64):
+        """ Initialize a min/max buffer.
+
+        :param capacity: Maximum number of samples held in the buffer.
+        :param columns: List of column names.
+        :param block_size: Number of samples per block of precomputed extrema.
+        """
+        self.capacity = max(1, int(capacity))
+        self.columns = list(columns)
+        self.block_size = int(block_size)
+        self.total = 0
+
+        ncols = len(self.columns)
+        self.samples = np.full((self.capacity, ncols), np.nan)
+        self.nblocks = -(-self.capacity // self.block_size) + 1
+        self.block_min = np.full((self.nblocks, ncols), np.nan)
+        self.block_max = np.full((self.nblocks, ncols), np.nan)
+
+    @property
+    def start(self):
+        """ Absolute index of the oldest sample in the buffer.
+        """
+        return max(0, self.total - self.capacity)
+
+    @property
+    def stop(self):
+        """ Absolute index one past the newest sample in the buffer.
+        """
+        return self.total
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def append(self, values):
+        """ Append rows of samples to the buffer.
+
+        :param values: Array of shape (rows, len(columns)).
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.columns))
+        n = values.shape[0]
+        if n == 0:
+            return
+        if n > self.capacity:
+            # - every buffered sample is replaced, so clear the block extrema before the partial block update - #
+            self.total += n - self.capacity
+            values = values[-self.capacity:]
+            n = self.capacity
+            self.block_min.fill(np.nan)
+            self.block_max.fill(np.nan)
+
+        # - write the samples into the ring - #
+        t0 = self.total
+        p0 = t0 % self.capacity
+        first = min(n, self.capacity - p0)
+        self.samples[p0:p0 + first] = values[:first]
+        self.samples[:n - first] = values[first:]
+        self.total += n
+
+        # - update the block extrema covering [t0, t0 + n) - #
+        bs = self.block_size
+        a = t0
+        if a % bs:
+            # - finish the partially filled block - #
+            b = min(t0 + n, (a // bs + 1) * bs)
+            seg = values[a - t0:b - t0]
+            slot = (a // bs) % self.nblocks
+            self.block_min[slot] = np.fmin(self.block_min[slot], np.fmin.reduce(seg, axis=0))
+            self.block_max[slot] = np.fmax(self.block_max[slot], np.fmax.reduce(seg, axis=0))
+            a = b
+        full = (t0 + n - a) // bs
+        if full:
+            seg = values[a - t0:a - t0 + full * bs].reshape(full, bs, -1)
+            slots = (a // bs + np.arange(full)) % self.nblocks
+            self.block_min[slots] = np.fmin.reduce(seg, axis=1)
+            self.block_max[slots] = np.fmax.reduce(seg, axis=1)
+            a += full * bs
+        if a < t0 + n:
+            # - start a new partial block - #
+            seg = values[a - t0:]
+            slot = (a // bs) % self.nblocks
+            self.block_min[slot] = np.fmin.reduce(seg, axis=0)
+            self.block_max[slot] = np.fmax.reduce(seg, axis=0)
+
+    def take(self, a0, a1):
+        """ Return a copy of the samples with absolute indices in [a0, a1).
+        """
+        return self.samples[np.arange(a0, a1) % self.capacity]
+
+    def decimate(self, width, x0=None, x1=None):
+        """ Return a min/max decimated series of the samples in the view range [x0, x1], with at most two points per
+        pixel of width. If the view holds no more than two samples per pixel the raw samples are returned.
+
+        :param width: Width of the plot in pixels.
+        :param x0: Absolute index of the start of the view. Defaults to the oldest sample.
+        :param x1: Absolute index of the end of the view. Defaults to the newest sample.
+        :return: Tuple of (x array, y array of shape (len(x), len(columns))).
+        """
+        width = max(1, int(width))
+        start, stop = self.start, self.stop
+        x0 = start if x0 is None else max(start, int(math.floor(x0)))
+        x1 = stop if x1 is None else min(stop, int(math.ceil(x1)) + 1)
+        n = x1 - x0
+        if n <= 0:
+            return np.empty(0), np.empty((0, len(self.columns)))
+        if n <= 2 * width:
+            return np.arange(x0, x1, dtype=np.float64), self.take(x0, x1)
+
+        # - bucket size in samples, rounded to whole blocks when it spans more than one - #
+        bucket = -(-n // width)
+        bs = self.block_size
+        if bucket >= bs:
+            bucket = -(-bucket // bs) * bs
+
+        # - full buckets aligned to the bucket size, and the partial buckets at either edge - #
+        f0 = -(-x0 // bucket) * bucket
+        f1 = (x1 // bucket) * bucket
+        nfull = max(0, (f1 - f0) // bucket)
+        edges = []
+        if nfull == 0:
+            edges.append((x0, x1))
+        else:
+            if x0 < f0:
+                edges.append((x0, f0))
+            if f1 < x1:
+                edges.append((f1, x1))
+
+        if nfull:
+            if bucket >= bs:
+                g = bucket // bs
+                slots = (f0 // bs + np.arange(nfull * g)) % self.nblocks
+                bmin = np.fmin.reduce(self.block_min[slots].reshape(nfull, g, -1), axis=1)
+                bmax = np.fmax.reduce(self.block_max[slots].reshape(nfull, g, -1), axis=1)
+            else:
+                seg = self.take(f0, f1).reshape(nfull, bucket, -1)
+                bmin = np.fmin.reduce(seg, axis=1)
+                bmax = np.fmax.reduce(seg, axis=1)
+            centers = f0 + bucket * (np.arange(nfull) + 0.5)
+        else:
+            bmin = bmax = np.empty((0, len(self.columns)))
+            centers = np.empty(0)
+
+        # - reduce the edge buckets from the raw samples and place them around the full buckets - #
+        for a0, a1 in edges:
+            seg = self.take(a0, a1)
+            emin = np.fmin.reduce(seg, axis=0)[np.newaxis]
+            emax = np.fmax.reduce(seg, axis=0)[np.newaxis]
+            center = np.array([(a0 + a1 - 1) / 2])
+            if a0 < f0 or nfull == 0:
+                bmin, bmax = np.concatenate([emin, bmin]), np.concatenate([emax, bmax])
+                centers = np.concatenate([center, centers])
+            else:
+                bmin, bmax = np.concatenate([bmin, emin]), np.concatenate([bmax, emax])
+                centers = np.concatenate([centers, center])
+
+        # - interleave the minima and maxima of each bucket - #
+        x = np.repeat(centers, 2)
+        y = np.empty((2 * len(centers), len(self.columns)))
+        y[0::2] = bmin
+        y[1::2] = bmax
+        return x, y
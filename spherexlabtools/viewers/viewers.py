@@ -11,6 +11,7 @@ from pyqtgraph.parametertree import Parameter
 import spherexlabtools.log as slt_log
 from spherexlabtools.thread import QueueThread
 from spherexlabtools.ui import LineViewerWidget, ImageViewerWidget
+from spherexlabtools.viewers.decimate import MinMaxBuffer
 
 pg.setConfigOption("imageAxisOrder", "row-major")
 logger = logging.getLogger(f"{slt_log.LOGGER_NAME}.{__name__}")
@@ -73,16 +74,23 @@ class Viewer(QueueThread, QObject):
 class LineViewer(Viewer):
     """ A viewer subclass that plots data as lines on a graph. This subclass connects to the :class:`.LineViewerWidget`
     class by setting widget = LineViewerWidget.
+
+    Rather than the dataframe buffer of the base class, line viewers keep the last buffer_size samples of each line in
+    a :class:`.MinMaxBuffer`. Lines are sent to the widget min/max decimated to the pixel width and x range of the
+    plot, so the number of points drawn is bounded by the plot width rather than the buffer size. The x axis is the
+    absolute sample index.
     """
 
     widget = LineViewerWidget
 
-    def __init__(self, cfg, exp, lines=None, **kwargs):
+    def __init__(self, cfg, exp, lines=None, plot_width=1000, **kwargs):
         """ Initialize a LineViewer.
 
         :param cfg: Configuration dictionary
         :param exp: Experiment control package
         :param lines: Dictionary of the following form: {'record column name': 'line color'}
+        :param plot_width: Initial pixel width of the plot. This is updated by the LineViewerWidget when its view
+                           changes.
         :param kwargs:
         """
         assert type(lines) is dict and len(lines) > 0, 'The LineViewer needs the record columns to plot!'
@@ -100,30 +108,101 @@ class LineViewer(Viewer):
         self.buffer_size.setValue(100)
         self.buffer_size.setDefault(100)
 
+        # - sample buffer and the current view of the widget - #
+        self.buffer = None
+        self.view_range = (None, None)
+        self.plot_width = plot_width
+
+    def handle(self, record):
+        """ Append the latest record to the sample buffer, then update the display object and send it to the
+        ViewerWidget. A record of None only redraws the current buffer, and is queued when the view changes.
+        """
+        if record is not None:
+            self.append_record(record)
+        if self.buffer is None:
+            return
+        self.update_display_object()
+        self.update.emit(self.display_object)
+
+    def append_record(self, record):
+        """ Append the rows of a record to the sample buffer. The buffer is reallocated if the buffer size changes.
+        Columns of the plotted lines that are missing from the record are filled with NaN.
+        """
+        size = max(1, self.buffer_size.value())
+        if self.buffer is None or self.buffer.capacity != size:
+            self.buffer = MinMaxBuffer(size, list(self.lines.keys()))
+        data = record.data
+        values = np.full((data.shape[0], len(self.buffer.columns)), np.nan)
+        for i, col in enumerate(self.buffer.columns):
+            if col in data.columns:
+                values[:, i] = data[col].values
+        self.buffer.append(values)
+
+    def set_view_range(self, view):
+        """ Set the x range and pixel width that lines are decimated to, and queue a redraw if the view changed.
+
+        :param view: Tuple of (x start, x end, pixel width). The x range is (None, None) to follow the whole buffer.
+        """
+        x0, x1, width = view
+        view_range = (x0, x1)
+        width = max(1, int(width))
+        if view_range != self.view_range or width != self.plot_width:
+            self.view_range = view_range
+            self.plot_width = width
+            self.queue.put(None)
+
     def update_display_object(self):
         """ Update the display object for the LineViewerWidget to plot. Sets the display object to be a dictionary of
-        the following form {'line name': (data, color of the line to plot)}
+        the following form {'line name': (x data, y data, color of the line to plot)}
         """
         self.display_object = {}
-        for plot_line_param in self.plot_lines_enable.children():
-            if plot_line_param.value():
-                line_name = plot_line_param.name()
-                display_tup = (self.buffer[line_name].values, self.lines[line_name])
-                self.display_object[line_name] = display_tup
+        enabled = [param.name() for param in self.plot_lines_enable.children() if param.value()]
+        if len(enabled) == 0:
+            return
+        x, y = self.buffer.decimate(self.plot_width, *self.view_range)
+        for line_name in enabled:
+            col = self.buffer.columns.index(line_name)
+            self.display_object[line_name] = (x, y[:, col], self.lines[line_name])
 
 
 class ImageViewer(Viewer):
     """ A viewer subclass that displays 2-dimensional arrays as images. This subclass connects to the
     :class:`.ImageViewerWidget` class by setting widget = ImageViewerWidget.
+
+    Frames are reduced to the display resolution of the widget before any further processing, and display levels are
+    computed from a subsample of the reduced frame, so the GUI thread only ever receives a display-sized image with
+    fixed levels.
+
+    Rather than the dataframe buffer of the base class, image viewers keep a ring buffer of the last buffer_size raw
+    2-dimensional frames in a single preallocated array, along with a running sum used for rolling means.
     """
 
     widget = ImageViewerWidget
 
-    def __init__(self, cfg, exp, **kwargs):
+    # - approximate number of pixels used to compute autoscale levels - #
+    level_samples = 2 ** 16
+
+    def __init__(self, cfg, exp, display_shape=(512, 512), **kwargs):
+        """ Initialize an ImageViewer.
+
+        :param cfg: Configuration dictionary
+        :param exp: Experiment control package
+        :param display_shape: Initial (rows, columns) of the display. This is updated by the ImageViewerWidget when
+                              it is resized.
+        :param kwargs:
+        """
         super().__init__(cfg, exp, **kwargs)
+        self.display_shape = display_shape
 
-        # - reference frame used for differencing ---------------------------------------------- #
+        # - ring buffer of raw frames ---------------------------------------------------------- #
+        self.buffer = None
+        self.buffer_sum = None
+        self.buffer_count = 0
+        self.buffer_ind = -1
+
+        # - reference frame used for differencing, and its downsampled copies keyed by factor ------------------ #
         self.reference = None
+        self._reference_display = {}
 
         # - create autoscale parameters -------------------------------------------------------- #
         self.scaling = Parameter.create(name='Scaling', type='group')
@@ -144,48 +223,187 @@ class ImageViewer(Viewer):
         self.gaussian_filter.addChild({'name': 'enabled', 'type': 'bool', 'value': False})
         self.gaussian_filter.addChild({'name': 'sigma', 'type': 'float', 'value': 1})
 
+        # - display resolution parameters ------------------------------------------------------ #
+        self.display = Parameter.create(name='Display', type='group')
+        self.display.addChild({'name': 'downsample', 'type': 'bool', 'value': True})
+        self.display.addChild({'name': 'method', 'type': 'list', 'limits': ['stride', 'mean']})
+        self.display.addChild({'name': 'average frames', 'type': 'int', 'value': 1, 'limits': (1, None)})
+
+    def handle(self, record):
+        """ Copy the latest frame into the ring buffer, then update the display object and send it to the
+        ViewerWidget.
+        """
+        frame = record.raw_data
+        if not type(frame) is np.ndarray:
+            frame = record.data.values
+        self.append_frame(frame)
+        self.update_display_object()
+        self.update.emit(self.display_object)
+
+    def append_frame(self, frame):
+        """ Copy a frame into the next slot of the ring buffer. The buffer is reallocated if the frame shape, dtype
+        or the buffer size changes.
+
+        :param frame: 2-dimensional numpy array.
+        """
+        size = max(1, self.buffer_size.value())
+        if self.buffer is None or self.buffer.shape != (size,) + frame.shape or self.buffer.dtype != frame.dtype:
+            self.buffer = np.empty((size,) + frame.shape, dtype=frame.dtype)
+            self.buffer_sum = np.zeros(frame.shape, dtype=np.float64)
+            self.buffer_count = 0
+            self.buffer_ind = -1
+
+        self.buffer_ind = (self.buffer_ind + 1) % size
+        slot = self.buffer[self.buffer_ind]
+        if self.buffer_count == size:
+            np.subtract(self.buffer_sum, slot, out=self.buffer_sum)
+        else:
+            self.buffer_count += 1
+        slot[...] = frame
+        np.add(self.buffer_sum, slot, out=self.buffer_sum)
+
+        # - recompute the running sum once per pass through the ring to bound floating point drift - #
+        if self.buffer_ind == size - 1 and self.buffer.dtype.kind == 'f':
+            self.buffer[:self.buffer_count].sum(axis=0, dtype=np.float64, out=self.buffer_sum)
+
+    def latest(self):
+        """ Return the latest frame in the ring buffer.
+        """
+        if self.buffer_count == 0:
+            return None
+        return self.buffer[self.buffer_ind]
+
+    def last_frames(self, n=None):
+        """ Return the last n frames in the ring buffer, oldest first.
+
+        :param n: Number of frames. Defaults to all of the buffered frames.
+        """
+        n = self.buffer_count if n is None else min(int(n), self.buffer_count)
+        inds = (self.buffer_ind - np.arange(n)[::-1]) % self.buffer.shape[0]
+        return self.buffer[inds]
+
+    def rolling_mean(self, n=None):
+        """ Return the mean of the last n frames in the ring buffer.
+
+        :param n: Number of frames. Defaults to all of the buffered frames, which is served from the running sum.
+        """
+        if self.buffer_count == 0:
+            return None
+        n = self.buffer_count if n is None else max(1, min(int(n), self.buffer_count))
+        if n == self.buffer_count:
+            return self.buffer_sum / n
+        if n == 1:
+            return self.latest().astype(np.float64)
+        frames = self.last_frames(n)
+        return frames.mean(axis=0, dtype=np.float64)
+
+    def set_display_shape(self, shape):
+        """ Slot to update the (rows, columns) shape of the display.
+        """
+        self.display_shape = tuple(shape)
+
     def save_reference(self):
         """ Set the latest buffer data as the reference frame.
         """
-        ind = self.buffer.index.get_level_values(0)[-1]
-        self.reference = self.buffer.loc[ind].values
+        latest = self.latest()
+        if latest is None:
+            return
+        self.reference = latest.astype(np.float32)
+        self._reference_display = {}
+
+    def display_factor(self, shape):
+        """ Return the integer downsampling factor that reduces a frame of the given shape to the display shape.
+        """
+        rows, cols = self.display_shape
+        if rows <= 0 or cols <= 0:
+            return 1
+        return max(1, min(shape[0] // rows, shape[1] // cols))
+
+    @staticmethod
+    def downsample(img, factor, method='stride'):
+        """ Reduce an image by an integer factor along both axes.
+
+        :param img: 2-dimensional array.
+        :param factor: Integer downsampling factor.
+        :param method: 'stride' to keep every factor-th pixel, or 'mean' to average factor x factor blocks.
+        :return: New float32 array of the reduced image. It is always a copy, since img may be a slot of the ring
+                 buffer that is overwritten by the next frame while the gui draws the result.
+        """
+        if factor <= 1:
+            return img.astype(np.float32)
+        if method == 'mean':
+            rows, cols = img.shape[0] // factor, img.shape[1] // factor
+            blocks = img[:rows * factor, :cols * factor].reshape(rows, factor, cols, factor)
+            return blocks.mean(axis=(1, 3), dtype=np.float32)
+        return img[::factor, ::factor].astype(np.float32)
+
+    @classmethod
+    def display_levels(cls, data):
+        """ Compute (min, max) display levels from a regular subsample of the image.
+        """
+        step = max(1, int(np.sqrt(data.size / cls.level_samples)))
+        sample = data[::step, ::step]
+        lo, hi = float(np.nanmin(sample)), float(np.nanmax(sample))
+        if hi <= lo:
+            hi = lo + 1
+        return lo, hi
+
+    def reference_display(self, shape, factor, method):
+        """ Return the cached, downsampled reference frame for the given display factor.
+        """
+        key = (factor, method)
+        ref = self._reference_display.get(key)
+        if ref is None:
+            if self.reference is None or self.reference.shape != shape:
+                self.reference = np.zeros(shape, dtype=np.float32)
+            ref = self.downsample(self.reference, factor, method)
+            self._reference_display = {key: ref}
+        return ref
 
     def update_display_object(self):
-        """ Update the display object for the ImageViewerWidget to display. Sets the display object to the numpy values
-        of the latest item in the buffer.
+        """ Update the display object for the ImageViewerWidget to display. The latest item in the buffer is reduced
+        to the display resolution before differencing and filtering.
         """
         # - get the processing parameters ------------------------------------------------------ #
         scale_vals = self.scaling.getValues()
         difference_vals = self.difference_frame.getValues()
         gauss_filt_vals = self.gaussian_filter.getValues()
+        display_vals = self.display.getValues()
 
-        # - get the latest image from the buffer set a default reference frame ----------------- #
-        ind = self.buffer.index.get_level_values(0)[-1]
-        img = self.buffer.loc[ind].values
-        if self.reference is None:
-            self.reference = np.zeros_like(img)
+        # - get the latest (or averaged) image and reduce it to the display resolution --------- #
+        avg_frames = display_vals['average frames'][0]
+        img = self.latest() if avg_frames <= 1 else self.rolling_mean(avg_frames)
+        factor = self.display_factor(img.shape) if display_vals['downsample'][0] else 1
+        method = display_vals['method'][0]
 
         # - select the display data from the difference frame options --------------------------- #
         data = None
         im_select = difference_vals['Image Selection'][0]
         if im_select == 'original':
-            data = img
+            data = self.downsample(img, factor, method)
         elif im_select == 'reference':
-            data = self.reference
+            data = self.reference_display(img.shape, factor, method)
         elif im_select == 'difference':
-            data = img - self.reference
+            data = self.downsample(img, factor, method) - self.reference_display(img.shape, factor, method)
 
-        # - run the gaussian filter if enabled ------------------------------------------------- #
+        # - run the gaussian filter if enabled, scaling sigma to the display resolution --------- #
         if gauss_filt_vals['enabled'][0]:
-            sigma = self.gaussian_filter.getValues()['sigma'][0]
+            sigma = gauss_filt_vals['sigma'][0] / factor
             data = gaussian_filter(data, sigma)
 
+        # - compute the display levels in the viewer thread ------------------------------------ #
+        if scale_vals['autoscale'][0]:
+            levels = self.display_levels(data)
+        else:
+            levels = (scale_vals['min'][0], scale_vals['max'][0])
+
         # - create the final display object and set the attribute ------------------------------ #
         obj = {
             'data': data,
+            'shape': img.shape,
             'display_kwargs': {
-                'autoLevels': scale_vals['autoscale'][0],
-                'levels': (scale_vals['min'][0], scale_vals['max'][0])
+                'autoLevels': False,
+                'levels': levels
             }
         }
         self.display_object = obj
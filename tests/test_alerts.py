@@ -0,0 +1,204 @@
+""" Tests of the delivery of alerts by :class:`AlertDispatcher <spherexlabtools.alerts.AlertDispatcher>` and
+:class:`AlertProcedure <spherexlabtools.procedures.AlertProcedure>` against a local smtp stand-in.
+"""
+import types
+import socket
+import datetime
+import threading
+import socketserver
+
+import pytest
+
+pytest.importorskip("PyQt5")
+pytest.importorskip("pyqtgraph")
+
+from spherexlabtools.alerts import AlertDispatcher
+from spherexlabtools.procedures import AlertProcedure
+
+RECIPIENTS = ["a@lab.test", "b@lab.test"]
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """ Minimal smtp session: greeting, EHLO/HELO, NOOP, RSET, MAIL, RCPT, DATA and QUIT.
+    """
+
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        self.server.opened(self.request)
+        self.reply("220 localhost smtp stand-in")
+        recipients = []
+        try:
+            for raw in self.rfile:
+                line = raw.decode().rstrip("\r\n")
+                cmd = line[:4].upper()
+                if cmd in ("EHLO", "HELO", "NOOP"):
+                    self.reply("250 localhost")
+                elif cmd in ("MAIL", "RSET"):
+                    recipients = []
+                    self.reply("250 OK")
+                elif cmd == "RCPT":
+                    recipients.append(line.split(":", 1)[1].strip(" <>"))
+                    self.reply("250 OK")
+                elif cmd == "DATA":
+                    self.reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    for data in self.rfile:
+                        if data == b".\r\n":
+                            break
+                        lines.append(data.decode())
+                    self.server.received(recipients, "".join(lines))
+                    self.reply("250 OK")
+                elif cmd == "QUIT":
+                    self.server.quits += 1
+                    self.reply("221 Bye")
+                    return
+                else:
+                    self.reply("502 Command not implemented")
+        except OSError:
+            pass
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """ Local smtp server counting connections and keeping the received messages.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.port = self.server_address[1]
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.quits = 0
+        self.messages = []
+        self.sockets = []
+
+    def opened(self, sock):
+        with self.lock:
+            self.connections += 1
+            self.sockets.append(sock)
+
+    def received(self, recipients, msg):
+        with self.lock:
+            self.messages.append((recipients, msg))
+
+    def drop(self):
+        """ Close every open connection from the server side, as a server timing out idle clients would.
+        """
+        with self.lock:
+            for sock in self.sockets:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self.sockets = []
+
+
+@pytest.fixture
+def smtp_server():
+    server = SMTPStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def dispatcher(smtp_server):
+    dispatcher = AlertDispatcher("alerts@lab.test", None, {"127.0.0.1": RECIPIENTS}, port=smtp_server.port,
+                                 use_tls=False, smtp_timeout=5)
+    dispatcher.start()
+    yield dispatcher
+    if dispatcher.running:
+        dispatcher.stop()
+    dispatcher.wait(timeout=5)
+
+
+def test_connection_is_reused(smtp_server, dispatcher):
+    for i in range(3):
+        dispatcher.send("Alert %d" % i, "body %d" % i)
+    assert dispatcher.wait_sent(timeout=10)
+    assert dispatcher.sent == 3
+    assert smtp_server.connections == 1
+    assert [r for r, _ in smtp_server.messages] == [RECIPIENTS] * 3
+    assert "Subject: Alert 2" in smtp_server.messages[2][1]
+
+
+def test_reconnects_after_dropped_connection(smtp_server, dispatcher):
+    dispatcher.send("Before", "body")
+    assert dispatcher.wait_sent(timeout=10)
+    smtp_server.drop()
+    dispatcher.send("After", "body")
+    assert dispatcher.wait_sent(timeout=10)
+    assert dispatcher.sent == 2
+    assert dispatcher.failed == 0
+    assert smtp_server.connections == 2
+    assert "Subject: After" in smtp_server.messages[-1][1]
+
+
+def test_stop_drains_queue(smtp_server, dispatcher):
+    for i in range(5):
+        dispatcher.send("Alert %d" % i, "body")
+    dispatcher.stop()
+    dispatcher.wait(timeout=10)
+    assert not dispatcher.thread.is_alive()
+    assert len(smtp_server.messages) == 5
+    assert dispatcher.connections == {}
+    assert smtp_server.quits == smtp_server.connections
+
+
+class ScriptedAlertProcedure(AlertProcedure):
+    """ Alert procedure monitoring a fixed list of values, stopping once they have all been checked.
+    """
+
+    def __init__(self, *args, values=(), **kwargs):
+        self.values = list(values)
+        super().__init__(*args, **kwargs)
+
+    def get(self):
+        if len(self.values) == 0:
+            self._state = "IDLE"
+            return None
+        return {"temp": self.values.pop(0), "datetime": datetime.datetime.now()}
+
+
+def make_procedure(smtp_server, values=(), **kwargs):
+    cfg = {"instance_name": "temp_alert", "records": {}}
+    exp = types.SimpleNamespace(headless=True)
+    return ScriptedAlertProcedure(cfg, exp, ["temp"], "alerts@lab.test", None, {"127.0.0.1": RECIPIENTS},
+                                  smtp_port=smtp_server.port, smtp_tls=False, values=values, temp="%f > 300",
+                                  **kwargs)
+
+
+def test_due_alerts_intervals(smtp_server):
+    proc = make_procedure(smtp_server, alert_interval=10, repeat_interval=100)
+    proc.dispatcher.disconnect("127.0.0.1")
+
+    # - a newly met condition is due, and then only again once the repeat interval has passed while it stays met - #
+    assert proc.due_alerts(["temp"], 0) == ["temp"]
+    assert proc.due_alerts(["temp"], 50) == []
+    assert proc.due_alerts(["temp"], 100) == ["temp"]
+
+    # - once cleared, a condition met again is due only after the min alert interval - #
+    assert proc.due_alerts([], 101) == []
+    assert proc.due_alerts(["temp"], 105) == []
+    assert proc.due_alerts([], 106) == []
+    assert proc.due_alerts(["temp"], 110) == ["temp"]
+
+
+def test_procedure_sends_one_alert_per_interval(smtp_server):
+    values = [350] * 5 + [290] * 2 + [400] * 5
+    proc = make_procedure(smtp_server, values=values)
+    proc.start()
+    proc.wait(timeout=10)
+    proc.dispatcher.wait(timeout=10)
+    assert not proc.thread.is_alive()
+
+    # - the condition is met twice, within the min alert interval, so only the first is sent - #
+    assert len(smtp_server.messages) == 1
+    assert "temp = 350" in smtp_server.messages[0][1]
+    assert proc.dispatcher.connections == {}
@@ -0,0 +1,52 @@
+""" Tests of :mod:`spherexlabtools.conditions`. The scalar form used by ConditionSet.check() and the vectorized form
+used by ConditionSet.evaluate() must agree on every supported construct.
+"""
+import os
+import importlib.util
+
+import numpy as np
+import pytest
+
+# - load the conditions module alone, so that the tests do not need the gui dependencies - #
+_path = os.path.join(os.path.dirname(__file__), "..", "spherexlabtools", "conditions.py")
+_spec = importlib.util.spec_from_file_location("conditions", _path)
+conditions = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(conditions)
+
+# - one or more conditions for every whitelisted construct - #
+CONDITIONS = [
+    "a > 1", "a >= 1", "a < 1", "a <= 1", "a == 1", "a != 1", "-1 < a < 2",
+    "a + b > 1", "a - b > 1", "a * b > 1", "a / b > 1", "a ** 2 > 1", "a % 2 > 0.5", "-a > 1", "+a > 1",
+    "a > 1 and b > 1", "a > 1 or b > 1", "not a > 1",
+    "abs(a) > 1", "abs(a - b) > 1", "min(a) > 1", "min(a, b) > 1", "max(a, b, 0) > 1",
+    "rate(a) > 1", "sustained(a > 0, 2)", "sustained(abs(rate(a)) > 1, 2)",
+    "True", "a > 1.5 and True",
+]
+
+SAMPLES = np.array([[-2., 3.], [2., -3.], [0.5, 0.25], [1., 1.], [-1.5, 2.], [4., 0.5], [3., -1.], [-0.5, -0.5]])
+
+
+@pytest.mark.parametrize("expr", CONDITIONS)
+def test_check_evaluate_parity(expr):
+    cs = conditions.ConditionSet({"c": expr})
+    times = np.arange(len(SAMPLES), dtype=np.float64)
+    checked = []
+    for row, t in zip(SAMPLES, times):
+        sample = dict(zip(["a", "b"], row.tolist()))
+        checked.append(len(cs.check(sample, t)) == 1)
+    cs.reset()
+    columns = SAMPLES[:, [["a", "b"].index(ch) for ch in cs.channels]]
+    evaluated = cs.evaluate(columns, times)[:, 0]
+    assert checked == evaluated.tolist()
+
+
+def test_abs_vectorized():
+    cs = conditions.ConditionSet(["abs(a) > 1"])
+    assert cs.check({"a": -2.}) == ["abs(a) > 1"]
+    assert cs.evaluate(np.array([[-2.]])).tolist() == [[True]]
+
+
+@pytest.mark.parametrize("expr", ["a.real > 1", "__import__('os')", "eval('1')", "[a][0] > 1", "sustained(a > 0, b)"])
+def test_rejected(expr):
+    with pytest.raises(conditions.ConditionError):
+        conditions.ConditionSet([expr])
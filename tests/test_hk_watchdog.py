@@ -0,0 +1,172 @@
+""" Tests of the incremental polling of the housekeeping files by
+:class:`KasiHkWatchdog <spherexlabtools.configs.chamberhk_watchdog.procedures.KasiHkWatchdog>` against a local http
+server supporting byte ranges.
+"""
+import re
+import types
+import base64
+import datetime
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("PyQt5")
+pytest.importorskip("pyqtgraph")
+
+from spherexlabtools.configs.chamberhk_watchdog import procedures as hk_procedures
+from spherexlabtools.configs.chamberhk_watchdog.procedures import KasiHkWatchdog
+
+AUTH = ("hk_user", "hk_password")
+RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)$")
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """ Serves the files of the server from memory, honoring single byte ranges unless the server ignores them.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for key, val in (headers or {}).items():
+            self.send_header(key, val)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        expected = "Basic " + base64.b64encode(("%s:%s" % AUTH).encode()).decode()
+        if self.headers.get("Authorization") != expected:
+            self.send(401, headers={"WWW-Authenticate": 'Basic realm="hk"'})
+            return
+        data = self.server.files.get(self.path)
+        if data is None:
+            self.send(404)
+            return
+        range_header = self.headers.get("Range")
+        self.server.log(self.path, range_header)
+        match = RANGE_RE.match(range_header or "")
+        if match is None or self.server.ignore_range:
+            self.send(200, data)
+            return
+        start = int(match.group(1))
+        end = min(int(match.group(2)) if match.group(2) else len(data) - 1, len(data) - 1)
+        if start >= len(data):
+            self.send(416, headers={"Content-Range": "bytes */%d" % len(data)})
+            return
+        self.send(206, data[start:end + 1], {"Content-Range": "bytes %d-%d/%d" % (start, end, len(data))})
+
+
+class HkServer(ThreadingHTTPServer):
+    """ Local housekeeping export keeping the range header of every request.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), RangeHandler)
+        self.url = "http://127.0.0.1:%d/" % self.server_address[1]
+        self.files = {}
+        self.ignore_range = False
+        self.lock = threading.Lock()
+        self.requests = []
+
+    def log(self, path, range_header):
+        with self.lock:
+            self.requests.append((path, range_header))
+
+    def ranges(self, path):
+        with self.lock:
+            return [r for p, r in self.requests if p == path]
+
+
+@pytest.fixture
+def hk_server():
+    server = HkServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def watchdog(hk_server):
+    cfg = {"instance_name": "KasiHkWatchdog", "hw": [], "records": {}}
+    exp = types.SimpleNamespace(headless=True)
+    proc = KasiHkWatchdog(cfg, exp, hk_url=hk_server.url, hk_auth=AUTH, fetch_workers=4,
+                          check_values=["no_activity_count"], address="alerts@lab.test", password=None, smtp_dict={},
+                          query_period=0)
+    proc.startup()
+    yield proc
+    proc.executor.shutdown(wait=True)
+    proc.session.close()
+    proc.dispatcher.stop()
+    proc.dispatcher.wait(timeout=5)
+
+
+def path(key, day):
+    kind = "temperature" if key in KasiHkWatchdog._temp_lengths else "pressure"
+    return "/%s/%s/%s/%s.txt" % (kind, day, day, key)
+
+
+def test_fetch_length_ranges(hk_server, watchdog):
+    key = "ls218_1"
+    p = path(key, "20260101")
+    url = watchdog.channel_url(key, "20260101")
+    assert url == hk_server.url.rstrip("/") + p
+
+    # - the first request of a file only asks for its first byte - #
+    hk_server.files[p] = b"a" * 100
+    assert watchdog.fetch_length(key, url) == 100
+    assert hk_server.ranges(p) == ["bytes=0-0"]
+
+    # - appended bytes are requested from the previous length - #
+    hk_server.files[p] += b"b" * 20
+    assert watchdog.fetch_length(key, url) == 120
+    assert hk_server.ranges(p)[-1] == "bytes=100-"
+
+    # - no new data: 416 with the unchanged total - #
+    assert watchdog.fetch_length(key, url) == 120
+    assert hk_server.ranges(p)[-1] == "bytes=120-"
+
+    # - a file rewritten shorter: 416 with a smaller total, from which the following request starts - #
+    hk_server.files[p] = b"c" * 30
+    assert watchdog.fetch_length(key, url) == 30
+    hk_server.files[p] += b"d" * 5
+    assert watchdog.fetch_length(key, url) == 35
+    assert hk_server.ranges(p)[-2:] == ["bytes=120-", "bytes=30-"]
+
+    # - a server ignoring the range returns the whole file - #
+    hk_server.ignore_range = True
+    hk_server.files[p] += b"e" * 10
+    assert watchdog.fetch_length(key, url) == 45
+
+
+def test_offsets_reset_at_midnight(hk_server, watchdog, monkeypatch):
+    days = ["20260101", "20260102"]
+    for day in days:
+        for key in watchdog.lengths.keys():
+            hk_server.files[path(key, day)] = b"x" * (10 if day == days[0] else 4)
+
+    now = [datetime.datetime(2026, 1, 1, 23, 59, 50)]
+    monkeypatch.setattr(hk_procedures, "datetime", types.SimpleNamespace(now=lambda: now[0]))
+
+    # - two polls on the first day, the second of which sees no activity - #
+    assert watchdog.get() == {"no_activity_count": 0}
+    assert watchdog.get() == {"no_activity_count": 1}
+    assert all(length == 10 for length in watchdog.offsets.values())
+
+    # - after midnight every channel is probed again from the start of the new day's file - #
+    now[0] = datetime.datetime(2026, 1, 2, 0, 0, 5)
+    watchdog.get()
+    assert watchdog.today == days[1]
+    assert all(length == 4 for length in watchdog.offsets.values())
+    for key in watchdog.lengths.keys():
+        assert hk_server.ranges(path(key, days[0])) == ["bytes=0-0", "bytes=10-"]
+        assert hk_server.ranges(path(key, days[1])) == ["bytes=0-0"]
@@ -0,0 +1,94 @@
+""" Tests of the buffered acquisition of :class:`LockinLogging <spherexlabtools.configs.spectral_cal.procedures.LockinLogging>`
+against the :class:`SimulatedSR830 <spherexlabtools.instruments.srs.SimulatedSR830>`.
+"""
+import time
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pymeasure")
+pytest.importorskip("pyqtgraph")
+
+from spherexlabtools.bus import RecordBus
+from spherexlabtools.instruments.srs import SimulatedSR830
+from spherexlabtools.configs.spectral_cal.procedures import LockinLogging
+
+RATE = 64
+RUN_TIME = 3.2
+
+
+class SmallBufferSR830(SimulatedSR830):
+    """ Simulated SR830 with a buffer of 2 s at RATE, so that the buffer is restarted within the test.
+    """
+
+    BUFFER_SIZE = 2 * RATE
+
+
+class BlockLockinLogging(LockinLogging):
+    """ LockinLogging keeping a copy of every emitted block.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.blocks = []
+
+    def emit(self, record_name, record_data, meta=None, **kwargs):
+        self.blocks.append(pd.DataFrame(record_data))
+
+
+def run_buffered(lockin, block_period):
+    """ Run buffered acquisition for RUN_TIME seconds and return the procedure.
+    """
+    cfg = {"instance_name": "lockin_log", "hw": "lockin", "records": {"lockin": {}}}
+    exp = types.SimpleNamespace(headless=True, viewers={}, recorders={}, bus=RecordBus())
+    hw = types.SimpleNamespace(lockin=types.SimpleNamespace(sr830=lockin))
+    proc = BlockLockinLogging(cfg, exp, {}, {}, hw=hw, buffered=True, buffer_rate=RATE, block_period=block_period)
+    proc.start()
+    time.sleep(RUN_TIME)
+    proc.stop()
+    proc.wait(timeout=5)
+    assert not proc.thread.is_alive()
+    return proc
+
+
+def buffer_runs(blocks):
+    """ Split the timestamps of the emitted blocks into the runs of consecutive buffer samples.
+    """
+    ts = pd.concat(blocks)["timestamp"].to_numpy().astype("datetime64[ns]").astype(np.int64) / 1e9
+    breaks = np.flatnonzero(np.abs(np.diff(ts) - 1 / RATE) > 1e-6) + 1
+    return np.split(ts, breaks)
+
+
+def test_blocks_are_contiguous():
+    lockin = SimulatedSR830(x=1e-3, y=0, noise=1e-6, seed=0)
+    proc = run_buffered(lockin, block_period=0.5)
+    assert RUN_TIME / 0.5 - 2 <= len(proc.blocks) <= RUN_TIME / 0.5 + 1
+    data = pd.concat(proc.blocks)
+    assert list(data.columns) == ["timestamp", "x", "y"]
+    assert np.allclose(data["x"], 1e-3, atol=1e-5)
+
+    # - no restart within the run, so every sample follows the previous one by one sample period - #
+    runs = buffer_runs(proc.blocks)
+    assert len(runs) == 1
+    assert len(runs[0]) >= (RUN_TIME - 1) * RATE
+    assert lockin.buffer_start_time is None
+
+
+def test_block_period_is_clamped_and_buffer_restarts():
+    lockin = SmallBufferSR830(seed=0)
+    proc = run_buffered(lockin, block_period=10)
+
+    # - a 10 s block period is reduced to a quarter of the 2 s buffer, so several blocks are emitted - #
+    assert len(proc.blocks) >= 4
+    assert max(len(b) for b in proc.blocks) < lockin.BUFFER_SIZE // 2
+
+    # - the buffer is restarted before it fills: each run is contiguous, never full, and the runs follow each other
+    # with a gap of less than a block period - #
+    runs = buffer_runs(proc.blocks)
+    assert len(runs) >= 2
+    for run in runs:
+        assert len(run) < lockin.BUFFER_SIZE
+    for prev, run in zip(runs[:-1], runs[1:]):
+        assert 0 < run[0] - prev[-1] < 0.25 * lockin.BUFFER_SIZE / RATE